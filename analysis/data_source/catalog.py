@@ -0,0 +1,436 @@
+"""
+Persistent, incrementally updated catalog of GuideLLM result files.
+
+``discover_runs`` walks the whole results tree on every call and
+``extract_time_ranges``/``load_runs`` re-open every JSON.  A
+:class:`RunCatalog` indexes each report once into a SQLite table next to
+the results (``.run-catalog.sqlite``): run label, instance, benchmark time
+window, request counts, size/mtime (to detect changes) and the location of
+its *sidecar* -- a Parquet copy of the per-request frame -- plus one
+mergeable latency sketch per metric (``transform.sketch.DDSketch``).
+Later queries filter runs by label, experiment and date in SQL, loading a
+subset only touches the sidecars of the selected files, and percentile
+tables and gating verdicts are answered by merging sketches without
+loading requests at all::
+
+    catalog = RunCatalog("_in")
+    catalog.update()                            # only new/changed files are parsed
+    catalog.runs(label="autoscaling-test-*", since=datetime(2026, 3, 1))
+    GUIDELLM_RESULTS = catalog.run_configs(experiment="experiment-01-*")
+    TIME_RANGES = catalog.time_ranges(experiment="experiment-01-*")
+    requests_df, summary_df = catalog.load_runs(experiment="experiment-01-*")
+    catalog.latency_percentiles(experiment="experiment-01-*")
+"""
+
+import hashlib
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from data_source.dataset import RequestDataset
+from data_source.guidellm import (
+    compact_requests,
+    compute_gating_verdicts_from_sketches,
+    compute_latency_sketches,
+    concat_requests,
+    default_run_label,
+    latency_percentiles_from_sketches,
+    load_report,
+    is_report,
+    requests_to_dataframe,
+    results_files,
+)
+from transform.matrix import as_local_datetime64
+from transform.sketch import DDSketch
+
+CATALOG_DB = ".run-catalog.sqlite"
+SIDECAR_DIR = ".run-catalog"
+# Sidecar rows are sorted by SIDECAR_SORT and written in row groups of this
+# size, so the min/max statistics of each group let ``RequestDataset``
+# skip groups for status and time-range filters.
+SIDECAR_SORT = ["status", "request_start_time"]
+SIDECAR_ROW_GROUP = 16_384
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,   -- relative to the catalog root
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    experiment  TEXT NOT NULL,
+    run_dir     TEXT NOT NULL,
+    run         TEXT NOT NULL,
+    instance    INTEGER NOT NULL DEFAULT 0,
+    start_time  REAL,
+    end_time    REAL,
+    benchmarks  INTEGER NOT NULL,
+    successful  INTEGER NOT NULL,
+    incomplete  INTEGER NOT NULL,
+    errored     INTEGER NOT NULL,
+    total       INTEGER NOT NULL,
+    sidecar     TEXT,
+    indexed_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_run ON files (run);
+CREATE INDEX IF NOT EXISTS files_experiment ON files (experiment);
+CREATE INDEX IF NOT EXISTS files_start ON files (start_time);
+CREATE TABLE IF NOT EXISTS sketches (
+    path        TEXT NOT NULL,
+    metric      TEXT NOT NULL,
+    sketch      TEXT NOT NULL,      -- DDSketch.to_json()
+    PRIMARY KEY (path, metric)
+);
+CREATE TABLE IF NOT EXISTS skipped (
+    path        TEXT PRIMARY KEY,   -- JSON files that are not GuideLLM reports
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL
+);
+"""
+
+
+def _report_stats(report: dict) -> dict:
+    """Time window and request counts of a report (what ``benchmark_summary`` sums up)."""
+    starts, ends = [], []
+    counts = {"successful": 0, "incomplete": 0, "errored": 0, "total": 0}
+    for bm in report.get("benchmarks", []):
+        sm = bm.get("scheduler_metrics", {})
+        if sm.get("measure_start_time") is not None:
+            starts.append(sm["measure_start_time"])
+        if sm.get("measure_end_time") is not None:
+            ends.append(sm["measure_end_time"])
+        for key in counts:
+            counts[key] += int(sm.get("requests_made", {}).get(key, 0))
+    return {
+        "start_time": min(starts) if starts else None,
+        "end_time": max(ends) if ends else None,
+        "benchmarks": len(report.get("benchmarks", [])),
+        **counts,
+    }
+
+
+class RunCatalog:
+    """SQLite index of the GuideLLM reports under *root*.
+
+    Parameters
+    ----------
+    root
+        Results tree, e.g. ``_in`` (one directory per synced PVC) or a
+        single ``_in/<pvc>``.
+    json_glob, group_by, label_fn
+        Same meaning as in ``discover_runs``.
+    experiment_fn
+        ``(relative_path: Path) -> str``; defaults to the first path
+        component (the PVC directory when *root* is ``_in``).
+    sketch_accuracy
+        Relative accuracy of the per-file latency sketches.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        *,
+        json_glob: str = "*.json",
+        group_by: str = "parent_parent",
+        label_fn: Optional[Callable[[Path], str]] = None,
+        experiment_fn: Optional[Callable[[Path], str]] = None,
+        db_path: Optional[Union[str, Path]] = None,
+        sketch_accuracy: float = 0.01,
+    ):
+        self.root = Path(root)
+        self.json_glob = json_glob
+        self.group_by = group_by
+        self.label_fn = label_fn or default_run_label
+        self.experiment_fn = experiment_fn or (lambda rel: rel.parts[0] if len(rel.parts) > 1 else "")
+        self.db_path = Path(db_path) if db_path else self.root / CATALOG_DB
+        self.sketch_accuracy = sketch_accuracy
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "RunCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    # -- indexing -----------------------------------------------------------
+
+    def _run_dir(self, rel: Path) -> Path:
+        return rel.parent if self.group_by == "parent" else rel.parent.parent
+
+    def update(self, verbose: bool = True) -> Dict[str, int]:
+        """Index new and changed files, drop vanished ones.
+
+        Unchanged files (same size and mtime) are not opened.  The file list
+        comes from ``results_files`` (the sync manifest when there is one,
+        never ``report.py`` output).  Indexing a file
+        also writes its sidecar and its latency sketches, so later queries
+        never need the JSON again.  JSON files that are not GuideLLM reports
+        (no ``benchmarks`` list) are left out, counted as ``skipped`` and
+        recorded with their size and mtime, so they are not opened again
+        while unchanged either.
+        """
+        files = results_files(self.root, self.json_glob)
+        known = {row["path"]: (row["size"], row["mtime"]) for row in self._conn.execute("SELECT path, size, mtime FROM files")}
+        sketched = {row[0] for row in self._conn.execute("SELECT DISTINCT path FROM sketches")}
+        not_reports = {row["path"]: (row["size"], row["mtime"]) for row in self._conn.execute("SELECT path, size, mtime FROM skipped")}
+
+        seen, skipped, added, updated, failed = set(), set(), 0, 0, 0
+        with self._conn:
+            for path in files:
+                rel = path.relative_to(self.root)
+                key = rel.as_posix()
+                st = path.stat()
+                if known.get(key) == (st.st_size, st.st_mtime) and key in sketched:
+                    seen.add(key)
+                    continue
+                if not_reports.get(key) == (st.st_size, st.st_mtime):
+                    skipped.add(key)
+                    continue
+                try:
+                    report = load_report(path)
+                except (ValueError, OSError):
+                    # Possibly still being written: keep any previous entry.
+                    seen.add(key)
+                    failed += 1
+                    continue
+                if not is_report(report):
+                    skipped.add(key)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO skipped (path, size, mtime) VALUES (?, ?, ?)", (key, st.st_size, st.st_mtime),
+                    )
+                    continue
+                seen.add(key)
+                stats = _report_stats(report)
+                requests_df = requests_to_dataframe(report)
+                run_dir = self._run_dir(rel)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime, experiment, run_dir, run, start_time, end_time,"
+                    " benchmarks, successful, incomplete, errored, total, sidecar, indexed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, st.st_size, st.st_mtime, self.experiment_fn(rel), run_dir.as_posix(),
+                     self.label_fn(self.root / run_dir), stats["start_time"], stats["end_time"], stats["benchmarks"],
+                     stats["successful"], stats["incomplete"], stats["errored"], stats["total"],
+                     self._write_sidecar(key, requests_df), time.time()),
+                )
+                self._conn.execute("DELETE FROM sketches WHERE path = ?", (key,))
+                self._conn.executemany(
+                    "INSERT INTO sketches (path, metric, sketch) VALUES (?, ?, ?)",
+                    [(key, metric, sketch.to_json())
+                     for metric, sketch in compute_latency_sketches(requests_df, self.sketch_accuracy).items()],
+                )
+                if key in known:
+                    updated += 1
+                else:
+                    added += 1
+
+            removed = [k for k in known if k not in seen]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in removed])
+            self._conn.executemany("DELETE FROM sketches WHERE path = ?", [(k,) for k in removed])
+            self._conn.executemany("DELETE FROM skipped WHERE path = ?", [(k,) for k in not_reports if k not in skipped])
+            if added or updated or removed:
+                self._renumber_instances()
+
+        counts = {
+            "files": len(seen), "added": added, "updated": updated, "removed": len(removed),
+            "skipped": len(skipped), "failed": failed,
+        }
+        if verbose:
+            print(f"[catalog] {counts}")
+        return counts
+
+    def _renumber_instances(self) -> None:
+        """``instance`` = position of the file in its run, ordered by path (as in ``load_runs``)."""
+        rows = self._conn.execute("SELECT path, run_dir FROM files ORDER BY run_dir, path").fetchall()
+        instance, previous = 0, None
+        updates = []
+        for row in rows:
+            instance = instance + 1 if row["run_dir"] == previous else 0
+            previous = row["run_dir"]
+            updates.append((instance, row["path"]))
+        self._conn.executemany("UPDATE files SET instance = ? WHERE path = ?", updates)
+
+    # -- queries ------------------------------------------------------------
+
+    def files(
+        self,
+        label: Optional[str] = None,
+        experiment: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> pd.DataFrame:
+        """One row per indexed file matching the filters.
+
+        *label* and *experiment* accept glob patterns; *since*/*until* bound
+        the benchmark start time (naive local datetimes, like ``TIME_RANGES``).
+        """
+        clauses, params = [], []
+        for column, pattern in (("run", label), ("experiment", experiment)):
+            if pattern is not None:
+                clauses.append(f"{column} GLOB ?")
+                params.append(pattern)
+        if since is not None:
+            clauses.append("start_time >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("start_time < ?")
+            params.append(until.timestamp())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return pd.read_sql_query(f"SELECT * FROM files {where} ORDER BY run_dir, path", self._conn, params=params)
+
+    def runs(self, **filters) -> pd.DataFrame:
+        """One row per run: ``run | experiment | run_dir | instances | start | end | counts...``."""
+        df = self.files(**filters)
+        if df.empty:
+            return pd.DataFrame(columns=[
+                "run", "experiment", "run_dir", "instances", "start", "end", "duration_s",
+                "successful", "incomplete", "errored", "total",
+            ])
+        out = df.groupby("run_dir", sort=True).agg(
+            run=("run", "first"),
+            experiment=("experiment", "first"),
+            instances=("path", "size"),
+            start_time=("start_time", "min"),
+            end_time=("end_time", "max"),
+            successful=("successful", "sum"),
+            incomplete=("incomplete", "sum"),
+            errored=("errored", "sum"),
+            total=("total", "sum"),
+        ).reset_index()
+        out["duration_s"] = out["end_time"] - out["start_time"]
+        # Reports without scheduler timestamps have no window: NaT.
+        out["start"] = as_local_datetime64(pd.to_numeric(out["start_time"]))
+        out["end"] = as_local_datetime64(pd.to_numeric(out["end_time"]))
+        return out[["run", "experiment", "run_dir", "instances", "start", "end", "duration_s",
+                    "successful", "incomplete", "errored", "total"]]
+
+    def run_configs(self, **filters) -> List[Tuple[List[str], str]]:
+        """``discover_runs``-compatible ``([json_path, ...], run_label)`` list."""
+        df = self.files(**filters)
+        return [
+            ([str(self.root / p) for p in group["path"]], group["run"].iloc[0])
+            for _, group in df.groupby("run_dir", sort=True)
+        ]
+
+    def time_ranges(self, pad_seconds: int = 60, **filters) -> List[Tuple[datetime, datetime, str]]:
+        """``extract_time_ranges`` equivalent, answered from the index."""
+        pad = timedelta(seconds=pad_seconds)
+        df = self.files(**filters).dropna(subset=["start_time", "end_time"])
+        windows = df.groupby("run_dir", sort=True).agg(run=("run", "first"), start=("start_time", "min"), end=("end_time", "max"))
+        return [
+            (datetime.fromtimestamp(row.start) - pad, datetime.fromtimestamp(row.end) + pad, row.run)
+            for row in windows.itertuples()
+        ]
+
+    # -- loading ------------------------------------------------------------
+
+    def _sidecar_path(self, key: str) -> Path:
+        return self.root / SIDECAR_DIR / f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.parquet"
+
+    def _write_sidecar(self, key: str, requests_df: pd.DataFrame) -> str:
+        sidecar = self._sidecar_path(key)
+        sidecar.parent.mkdir(exist_ok=True)
+        by = [c for c in SIDECAR_SORT if c in requests_df.columns]
+        if by:
+            requests_df = requests_df.sort_values(by, kind="stable", na_position="last", ignore_index=True)
+        requests_df.to_parquet(sidecar, index=False, row_group_size=SIDECAR_ROW_GROUP)
+        return sidecar.relative_to(self.root).as_posix()
+
+    def requests(self, key: str) -> pd.DataFrame:
+        """Per-request frame of one indexed file, from its sidecar when present.
+
+        Sidecar rows are ordered by status, then request start time.
+        """
+        row = self._conn.execute("SELECT sidecar FROM files WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        if row["sidecar"] and (self.root / row["sidecar"]).exists():
+            return pd.read_parquet(self.root / row["sidecar"])
+
+        df = requests_to_dataframe(load_report(self.root / key))
+        sidecar = self._write_sidecar(key, df)
+        with self._conn:
+            self._conn.execute("UPDATE files SET sidecar = ? WHERE path = ?", (sidecar, key))
+        return pd.read_parquet(self.root / sidecar)
+
+    def load_runs(self, compact: bool = False, **filters) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """``load_runs`` equivalent reading only the selected files' sidecars.
+
+        The summary is built from the index, so it needs no file access.
+        With *compact* each file's frame goes through ``compact_requests``.
+        """
+        df = self.files(**filters)
+        frames = []
+        for row in df.itertuples():
+            reqs = self.requests(row.path)
+            reqs["instance"] = row.instance
+            reqs["run"] = row.run
+            frames.append(compact_requests(reqs) if compact else reqs)
+        requests_df = concat_requests(frames) if frames else pd.DataFrame()
+
+        summary_df = self.runs(**filters)
+        if not summary_df.empty:
+            per_run = df.groupby("run_dir").agg(start_time=("start_time", "min"), end_time=("end_time", "max"))
+            summary_df = summary_df.join(per_run, on="run_dir")[[
+                "start_time", "end_time", "duration_s", "successful", "incomplete", "errored", "total", "instances", "run",
+            ]]
+        return requests_df, summary_df
+
+    def dataset(self, **filters) -> RequestDataset:
+        """Lazy :class:`~data_source.dataset.RequestDataset` over the selected files.
+
+        Missing sidecars are written first; after that nothing is read
+        until the dataset is scanned.
+        """
+        df = self.files(**filters)
+        missing = [row.path for row in df.itertuples() if not row.sidecar or not (self.root / row.sidecar).exists()]
+        for key in missing:
+            self.requests(key)
+        return RequestDataset(self.root, self.files(**filters) if missing else df)
+
+    # -- sketches -----------------------------------------------------------
+
+    def latency_sketches(self, **filters) -> Dict[str, Dict[str, DDSketch]]:
+        """Per-file latency sketches merged per run: ``{run: {metric: DDSketch}}``."""
+        df = self.files(**filters)
+        if df.empty:
+            return {}
+        placeholders = ",".join("?" * len(df))
+        rows = self._conn.execute(
+            f"SELECT path, metric, sketch FROM sketches WHERE path IN ({placeholders})", list(df["path"]),
+        ).fetchall()
+        run_of = dict(zip(df["path"], df["run"]))
+        out: Dict[str, Dict[str, DDSketch]] = {run: {} for run in df["run"].unique()}
+        for row in rows:
+            sketch = DDSketch.from_json(row["sketch"])
+            by_metric = out[run_of[row["path"]]]
+            if row["metric"] in by_metric:
+                by_metric[row["metric"]].merge(sketch)
+            else:
+                by_metric[row["metric"]] = sketch
+        return out
+
+    def latency_percentiles(self, quantiles: Optional[List[float]] = None, **filters) -> pd.DataFrame:
+        """``compute_latency_percentiles`` from the sketches, without loading requests."""
+        return latency_percentiles_from_sketches(self.latency_sketches(**filters), quantiles)
+
+    def error_summary(self, **filters) -> pd.DataFrame:
+        """``compute_error_summary`` from the indexed request counts."""
+        runs = self.files(**filters).groupby("run", sort=False)[["total", "successful", "incomplete", "errored"]].sum()
+        runs["error_pct"] = (runs["errored"] / runs["total"].where(runs["total"] > 0) * 100).fillna(0.0)
+        return runs.reset_index().rename(columns={"run": "Run"})
+
+    def gating_verdicts(self, wva_label: str, baseline_label: str) -> pd.DataFrame:
+        """``compute_gating_verdicts`` from the sketches and indexed counts."""
+        return compute_gating_verdicts_from_sketches(
+            self.latency_sketches(), self.error_summary(), wva_label, baseline_label,
+        )
@@ -0,0 +1,200 @@
+"""
+Lazy, column-projected scans over the run catalog's Parquet sidecars.
+
+``load_runs`` / ``RunCatalog.load_runs`` materialize every column of every
+request of every selected run.  A :class:`RequestDataset` only records what
+a cell asks for -- runs, statuses, a time range, columns -- and hands it to
+a ``pyarrow.dataset`` scan when the data is needed:
+
+- run and experiment filters select sidecar files from the catalog index,
+  so other runs are never opened;
+- status and time-range filters are pushed into the Parquet scan (row
+  groups whose statistics exclude the range are skipped);
+- only the projected columns are decoded.
+
+The result has the usual ``load_runs`` columns (plus ``run`` and
+``instance``), so ``guidellm.compute_latency_percentiles`` and friends run
+on it unchanged::
+
+    catalog = RunCatalog("_in"); catalog.update()
+    ds = catalog.dataset(experiment="experiment-01-*")
+    ttft = (ds.filter(run=["baseline", "wva"], status="successful")
+              .select("ttft_ms")
+              .to_pandas())
+    compute_latency_percentiles(ttft)
+"""
+
+import fnmatch
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from data_source.guidellm import compact_requests
+
+# Always scanned: the guidellm summaries group and filter on them.
+KEY_COLUMNS = ("status",)
+
+TimeBound = Union[datetime, float, int, None]
+
+
+def _as_list(value: Union[str, Iterable[str], None]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _unix_seconds(value: TimeBound) -> Optional[float]:
+    """Naive datetimes are local time, as everywhere in the analysis code."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return pd.Timestamp(value).to_pydatetime().timestamp()
+
+
+class RequestDataset:
+    """Lazy per-request view over a set of sidecar files.
+
+    Built by ``RunCatalog.dataset``; :meth:`filter` and :meth:`select`
+    return narrowed copies and nothing is read until :meth:`to_table`,
+    :meth:`to_pandas` or :meth:`count`.
+
+    Parameters
+    ----------
+    root
+        Catalog root; sidecar paths are relative to it.
+    files
+        ``RunCatalog.files`` rows (``path``, ``sidecar``, ``run``,
+        ``instance``, ``start_time``, ``end_time``).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        files: pd.DataFrame,
+        expression: Optional[ds.Expression] = None,
+        columns: Optional[Sequence[str]] = None,
+    ):
+        self.root = Path(root)
+        self.files = files.reset_index(drop=True)
+        self.expression = expression
+        self.columns = list(columns) if columns is not None else None
+
+    def _replace(self, **changes) -> "RequestDataset":
+        state = {"root": self.root, "files": self.files, "expression": self.expression, "columns": self.columns}
+        state.update(changes)
+        return RequestDataset(**state)
+
+    def __repr__(self) -> str:
+        runs = self.files["run"].unique().tolist()
+        cols = "all" if self.columns is None else ", ".join(self.columns)
+        return (f"RequestDataset({len(self.files)} file(s), runs={runs}, columns=[{cols}], "
+                f"filter={self.expression if self.expression is not None else 'none'})")
+
+    # -- narrowing ----------------------------------------------------------
+
+    def filter(
+        self,
+        run: Union[str, Iterable[str], None] = None,
+        status: Union[str, Iterable[str], None] = None,
+        start: TimeBound = None,
+        end: TimeBound = None,
+        time_col: str = "request_start_time",
+        expression: Optional[ds.Expression] = None,
+    ) -> "RequestDataset":
+        """Narrow to runs (labels or glob patterns), statuses and ``[start, end)``.
+
+        *start*/*end* are naive local datetimes (like ``TIME_RANGES``) or
+        unix seconds and bound *time_col*.  *expression* is any extra
+        ``pyarrow.dataset`` expression, e.g. ``ds.field("output_tokens") > 100``.
+        Filters accumulate across calls.
+        """
+        files = self.files
+        patterns = _as_list(run)
+        if patterns is not None:
+            keep = files["run"].map(lambda label: any(fnmatch.fnmatchcase(label, p) for p in patterns))
+            files = files[keep.astype(bool)]
+
+        lo, hi = _unix_seconds(start), _unix_seconds(end)
+        terms = [] if self.expression is None else [self.expression]
+        statuses = _as_list(status)
+        if statuses is not None:
+            terms.append(ds.field("status").isin(statuses))
+        if lo is not None:
+            terms.append(ds.field(time_col) >= lo)
+        if hi is not None:
+            terms.append(ds.field(time_col) < hi)
+        if expression is not None:
+            terms.append(expression)
+        combined = None
+        for term in terms:
+            combined = term if combined is None else combined & term
+        return self._replace(files=files, expression=combined)
+
+    def select(self, *columns: str) -> "RequestDataset":
+        """Project to *columns* (``run``, ``instance`` and ``status`` are always kept)."""
+        return self._replace(columns=list(dict.fromkeys(columns)))
+
+    # -- scanning -----------------------------------------------------------
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        paths = [str(self.root / p) for p in self.files["sidecar"]]
+        if not paths:
+            return None
+        # Sidecars of different files may disagree on all-null columns
+        # (e.g. ``error_reason`` is null-typed where nothing failed).
+        schemas = [ds.dataset(p, format="parquet").schema for p in paths]
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+        return ds.dataset(paths, schema=schema, format="parquet")
+
+    def _scan_columns(self, schema: pa.Schema) -> Optional[List[str]]:
+        if self.columns is None:
+            return None
+        wanted = [*KEY_COLUMNS, *[c for c in self.columns if c not in ("run", "instance")]]
+        return [c for c in dict.fromkeys(wanted) if c in schema.names]
+
+    def to_table(self) -> pa.Table:
+        """Scan into an Arrow table with dictionary-encoded ``run`` and ``instance`` columns."""
+        dataset = self._dataset()
+        if dataset is None:
+            return pa.table({"run": pa.array([], pa.string()), "instance": pa.array([], pa.int16())})
+        by_path = {str(self.root / row.sidecar): (row.run, row.instance) for row in self.files.itertuples()}
+        columns = self._scan_columns(dataset.schema)
+        scanner = dataset.scanner(columns=columns, filter=self.expression)
+
+        labels = sorted(self.files["run"].unique())
+        batches, run_codes, instances = [], [], []
+        for tagged in scanner.scan_batches():
+            batch = tagged.record_batch
+            if not batch.num_rows:
+                continue
+            run, instance = by_path[tagged.fragment.path]
+            batches.append(batch)
+            run_codes.append(np.full(batch.num_rows, labels.index(run), dtype=np.int32))
+            instances.append(np.full(batch.num_rows, instance, dtype=np.int16))
+        table = pa.Table.from_batches(batches, schema=scanner.projected_schema)
+        run_col = pa.DictionaryArray.from_arrays(
+            pa.array(np.concatenate(run_codes) if run_codes else np.zeros(0, dtype=np.int32)),
+            pa.array(labels, pa.string()),
+        )
+        instance_col = pa.array(np.concatenate(instances) if instances else np.zeros(0, dtype=np.int16))
+        return table.append_column("instance", instance_col).append_column("run", run_col)
+
+    def to_pandas(self, compact: bool = False) -> pd.DataFrame:
+        """Scan into a ``load_runs``-shaped DataFrame (``compact_requests`` schema with *compact*)."""
+        df = self.to_table().to_pandas()
+        if compact:
+            return compact_requests(df)
+        df["run"] = df["run"].astype(str)
+        df["instance"] = df["instance"].astype("int64")
+        return df
+
+    def count(self) -> int:
+        """Number of matching requests (reads only the filter columns)."""
+        dataset = self._dataset()
+        return 0 if dataset is None else dataset.count_rows(filter=self.expression)
@@ -0,0 +1,166 @@
+"""
+GPU energy accounting from DCGM power samples.
+
+Energy is integrated per GPU series with the trapezoidal rule over the raw
+``DCGM_FI_DEV_POWER_USAGE`` samples (native scrape resolution, fetched once
+per run with ``prometheus_archive.fetch_raw_samples``), instead of summing
+1-minute-step samples of the aggregated power query.  Intervals between two
+samples longer than ``max_gap`` (exporter restarts, scrape failures) are not
+interpolated: they are reported as gap time so coverage can be checked.
+
+Joined with the GuideLLM request data, :func:`energy_efficiency` gives
+energy per successful request and per output token, the efficiency metrics
+used to compare autoscaler configurations.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from prometheus_api_client import PrometheusConnect
+
+from data_source.prometheus_archive import fetch_raw_samples
+from utils.utils import duration_to_seconds
+
+POWER_METRIC = "DCGM_FI_DEV_POWER_USAGE"
+# Labels identifying a GPU in DCGM exporter series, in display order.
+GPU_LABELS = ["Hostname", "gpu", "UUID", "modelName", "exported_pod"]
+
+
+def integrate_power(
+    ts_ms: np.ndarray,
+    watts: np.ndarray,
+    start_ms: int,
+    end_ms: int,
+    max_gap_ms: int = 120_000,
+) -> Tuple[float, float, float]:
+    """Trapezoidal energy of one power series over ``[start, end]``.
+
+    The window edges are linearly interpolated inside the sample interval
+    containing them.  Intervals longer than *max_gap_ms*, and the parts of
+    the window before the first or after the last sample, count as gaps.
+
+    Returns
+    -------
+    ``(joules, covered_seconds, gap_seconds)``
+    """
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    watts = np.asarray(watts, dtype=float)
+    finite = np.isfinite(watts)
+    ts_ms, watts = ts_ms[finite], watts[finite]
+    window_s = max(end_ms - start_ms, 0) / 1000.0
+    if ts_ms.size < 2 or window_s == 0:
+        return 0.0, 0.0, window_s
+
+    edges = np.concatenate([[start_ms], ts_ms[(ts_ms > start_ms) & (ts_ms < end_ms)], [end_ms]])
+    # Original sample interval [ts[j], ts[j+1]] containing each new interval.
+    j = np.searchsorted(ts_ms, edges[:-1], side="right") - 1
+    jj = np.clip(j, 0, ts_ms.size - 2)
+    valid = (j >= 0) & (j < ts_ms.size - 1) & ((ts_ms[jj + 1] - ts_ms[jj]) <= max_gap_ms)
+
+    w = np.interp(edges, ts_ms, watts)
+    dt = np.diff(edges) / 1000.0
+    joules = (w[1:] + w[:-1]) / 2.0 * dt
+    return float(joules[valid].sum()), float(dt[valid].sum()), float(dt[~valid].sum())
+
+
+def gpu_energy(
+    _prom: PrometheusConnect,
+    start_time: datetime,
+    end_time: datetime,
+    selector: str,
+    max_gap: str = "2m",
+) -> pd.DataFrame:
+    """Energy of every GPU series matched by *selector* over one window.
+
+    Returns one row per series: the :data:`GPU_LABELS` present,
+    ``energy_wh``, ``avg_power_w`` (over covered time), ``covered_s``,
+    ``gap_s`` and ``samples``.
+    """
+    start_ms, end_ms = round(start_time.timestamp()) * 1000, round(end_time.timestamp()) * 1000
+    max_gap_ms = round(duration_to_seconds(max_gap) * 1000)
+    # One extra interval on each side so the window edges can be interpolated.
+    raw = fetch_raw_samples(_prom, selector, start_ms - max_gap_ms, end_ms + max_gap_ms)
+
+    rows = []
+    for labels, ts, watts in raw:
+        joules, covered, gap = integrate_power(ts, watts, start_ms, end_ms, max_gap_ms)
+        rows.append({
+            **{label: labels.get(label, "") for label in GPU_LABELS},
+            "energy_wh": joules / 3600.0,
+            "avg_power_w": joules / covered if covered > 0 else np.nan,
+            "covered_s": covered,
+            "gap_s": gap,
+            "samples": int(((ts >= start_ms) & (ts <= end_ms)).sum()),
+        })
+    frame = pd.DataFrame(rows, columns=[*GPU_LABELS, "energy_wh", "avg_power_w", "covered_s", "gap_s", "samples"])
+    keep = [c for c in GPU_LABELS if c in frame and frame[c].astype(bool).any()]
+    return frame[[*keep, "energy_wh", "avg_power_w", "covered_s", "gap_s", "samples"]]
+
+
+def energy_by_run(
+    _prom: PrometheusConnect,
+    time_ranges: List[Tuple[datetime, datetime, str]],
+    namespace: str,
+    selector: Optional[str] = None,
+    max_gap: str = "2m",
+) -> pd.DataFrame:
+    """Total GPU energy per run.
+
+    *selector* defaults to the DCGM power of GPUs assigned to pods in
+    *namespace*.
+
+    Returns
+    -------
+    Run | energy_wh | avg_power_w | gpus | gap_s | coverage
+        ``gap_s`` is summed over GPUs; ``coverage`` is the fraction of
+        GPU-seconds in the window backed by samples.
+    """
+    selector = selector or f'{POWER_METRIC}{{exported_namespace=~"{namespace}"}}'
+    rows = []
+    for start_time, end_time, run_label in time_ranges:
+        gpus = gpu_energy(_prom, start_time, end_time, selector, max_gap)
+        window_s = (end_time - start_time).total_seconds()
+        covered = float(gpus["covered_s"].sum())
+        rows.append({
+            "Run": run_label,
+            "energy_wh": float(gpus["energy_wh"].sum()) if not gpus.empty else np.nan,
+            "avg_power_w": float(gpus["energy_wh"].sum()) * 3600.0 / window_s if not gpus.empty and window_s > 0 else np.nan,
+            "gpus": len(gpus),
+            "gap_s": float(gpus["gap_s"].sum()),
+            "coverage": covered / (window_s * len(gpus)) if len(gpus) and window_s > 0 else np.nan,
+        })
+    return pd.DataFrame(rows, columns=["Run", "energy_wh", "avg_power_w", "gpus", "gap_s", "coverage"])
+
+
+def energy_efficiency(energy_df: pd.DataFrame, requests_df: pd.DataFrame) -> pd.DataFrame:
+    """Energy per successful request and per output token, per run.
+
+    Parameters
+    ----------
+    energy_df
+        :func:`energy_by_run` output.
+    requests_df
+        Per-request frame from ``guidellm.load_runs`` (``run``, ``status``,
+        ``output_tokens`` columns).
+
+    Returns
+    -------
+    Run | energy_wh | successful_requests | output_tokens |
+    wh_per_request | j_per_output_token | coverage
+    """
+    ok = requests_df[requests_df["status"] == "successful"]
+    counts = ok.groupby("run").agg(
+        successful_requests=("status", "size"),
+        output_tokens=("output_tokens", "sum"),
+    )
+    out = energy_df.merge(counts, left_on="Run", right_index=True, how="left")
+    out[["successful_requests", "output_tokens"]] = out[["successful_requests", "output_tokens"]].fillna(0)
+    out["wh_per_request"] = np.where(
+        out["successful_requests"] > 0, out["energy_wh"] / out["successful_requests"].where(out["successful_requests"] > 0), np.nan,
+    )
+    out["j_per_output_token"] = np.where(
+        out["output_tokens"] > 0, out["energy_wh"] * 3600.0 / out["output_tokens"].where(out["output_tokens"] > 0), np.nan,
+    )
+    return out[["Run", "energy_wh", "successful_requests", "output_tokens", "wh_per_request", "j_per_output_token", "coverage"]]
@@ -28,7 +28,9 @@ Each ``GenerativeRequestStats`` carries computed fields:
 
 from __future__ import annotations
 
+import fnmatch
 import json
+import logging
 import re
 from datetime import datetime, timezone
 from pathlib import Path
@@ -37,11 +39,88 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 import numpy as np
 import pandas as pd
 
+from transform.matrix import to_local_datetime64
+from transform.sketch import DDSketch
+from transform.steady_state import steady_segments
+from utils.utils import duration_to_seconds
+
+logger = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # Auto-discovery
 # ---------------------------------------------------------------------------
 
+SYNC_MANIFEST = ".sync-manifest.json"
+# Dropped by ``report.py`` into its output directory, which may sit inside
+# the results tree (the Tekton task writes it to the results workspace).
+REPORT_MARKER = ".analysis-report"
+
+
+def synced_files(root: Path, pattern: str) -> Optional[List[Path]]:
+    """Files under *root* matching *pattern* per the nearest sync manifest, if any."""
+    resolved = root.resolve()
+    for base in (resolved, *resolved.parents):
+        manifest = base / SYNC_MANIFEST
+        if manifest.exists():
+            files = json.loads(manifest.read_text()).get("files", {})
+            paths = (base / rel for rel in files)
+            return sorted(
+                root / p.relative_to(resolved) for p in paths
+                if fnmatch.fnmatch(p.name, pattern) and resolved in p.parents and p.exists()
+            )
+    return None
+
+
+def find_files(root: Path, pattern: str) -> List[Path]:
+    """Files under *root* matching *pattern*, skipping hidden files and directories.
+
+    Hidden entries (``.sync-manifest.json``, ``.cache/``, ...) are
+    bookkeeping of the sync and report tools, never GuideLLM output.
+    """
+    root = Path(root)
+    return sorted(
+        p for p in root.rglob(pattern)
+        if not any(part.startswith(".") for part in p.relative_to(root).parts)
+    )
+
+
+def results_files(root: Path, pattern: str) -> List[Path]:
+    """GuideLLM report candidates under *root*.
+
+    The sync manifest's file list when there is one, a walk skipping hidden
+    entries otherwise (:func:`find_files`); files below a directory holding
+    :data:`REPORT_MARKER` (``report.py`` output) are left out either way.
+    """
+    root = Path(root)
+    files = synced_files(root, pattern)
+    if files is None:
+        files = find_files(root, pattern)
+    marked: Dict[Path, bool] = {}
+
+    def in_report_output(path: Path) -> bool:
+        for parent in path.relative_to(root).parents:
+            d = root / parent
+            if d not in marked:
+                marked[d] = (d / REPORT_MARKER).exists()
+            if marked[d]:
+                return True
+        return False
+
+    return [p for p in files if not in_report_output(p)]
+
+
+def is_report(report: Any) -> bool:
+    """Whether a loaded JSON document looks like a GuideLLM report (has a ``benchmarks`` list)."""
+    return isinstance(report, dict) and isinstance(report.get("benchmarks"), list)
+
+
+def default_run_label(run_dir: Path) -> str:
+    """Run directory name with the Tekton ``generateName`` random suffix stripped."""
+    # Strip Tekton generateName random suffix (5 alphanum chars after trailing -)
+    return re.sub(r"-[a-z0-9]{5,6}$", "", run_dir.name)
+
+
 def discover_runs(
     root: Union[str, Path],
     *,
@@ -81,13 +160,19 @@ def discover_runs(
         to using the directory name with a Tekton ``generateName`` random
         suffix stripped (e.g. ``autoscaling-test-wva-abcde`` → ``autoscaling-test-wva``).
 
+    When *root* (or one of its parents) holds the ``.sync-manifest.json``
+    written by ``sync-results.py``, the file list comes from the manifest
+    instead of walking the tree; otherwise hidden files and directories are
+    skipped.  The output directory of ``report.py`` is skipped in both
+    cases (:func:`results_files`).
+
     Returns
     -------
     list of ``([json_path, ...], run_label)``
         Ready to pass directly to :func:`load_runs`.
     """
     root = Path(root)
-    all_jsons = sorted(root.rglob(json_glob))
+    all_jsons = results_files(root, json_glob)
 
     if not all_jsons:
         return []
@@ -97,13 +182,8 @@ def discover_runs(
             return p.parent
         return p.parent.parent  # default: grandparent
 
-    def _default_label(d: Path) -> str:
-        name = d.name
-        # Strip Tekton generateName random suffix (5 alphanum chars after trailing -)
-        return re.sub(r"-[a-z0-9]{5,6}$", "", name)
-
     if label_fn is None:
-        label_fn = _default_label
+        label_fn = default_run_label
 
     groups: Dict[Path, List[str]] = {}
     for p in all_jsons:
@@ -153,7 +233,9 @@ def extract_time_ranges(
         ends: List[float] = []
         for p in paths:
             report = load_report(p)
-            for bm in report.get("benchmarks", []):
+            if not is_report(report):
+                continue
+            for bm in report["benchmarks"]:
                 sm = bm.get("scheduler_metrics", {})
                 s = sm.get("measure_start_time")
                 e = sm.get("measure_end_time")
@@ -262,7 +344,11 @@ def requests_to_dataframe(report: dict) -> pd.DataFrame:
                 "error_detail": str(info["error"]) if info.get("error") else None,
                 "elapsed_s": (end - start) if (start is not None and end is not None) else None,
             })
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=[
+        "benchmark_idx", "status", "request_id", "request_latency_s", "ttft_ms", "itl_ms",
+        "prompt_tokens", "output_tokens", "output_tokens_per_second", "request_start_time",
+        "request_end_time", "error_reason", "error_detail", "elapsed_s",
+    ])
 
 
 def benchmark_summary(report: dict) -> pd.DataFrame:
@@ -291,7 +377,10 @@ def benchmark_summary(report: dict) -> pd.DataFrame:
             "total": rm.get("total", 0),
             "queued_time_avg_s": sm.get("queued_time_avg"),
         })
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=[
+        "benchmark_idx", "start_time", "end_time", "duration_s",
+        "successful", "incomplete", "errored", "total", "queued_time_avg_s",
+    ])
 
 
 # ---------------------------------------------------------------------------
@@ -300,6 +389,7 @@ def benchmark_summary(report: dict) -> pd.DataFrame:
 
 def load_multi_instance_run(
     paths: List[Union[str, Path]],
+    compact: bool = False,
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Load and merge results from concurrent GuideLLM instances of one run.
 
@@ -310,13 +400,17 @@ def load_multi_instance_run(
 
     Per-request metrics (TTFT, E2E, ITL) are self-contained and need no
     adjustment.  Aggregate stats (throughput, duration) are recomputed from
-    the combined request stream.
+    the combined request stream.  JSON files that are not GuideLLM reports
+    (no ``benchmarks`` list) are skipped with a warning.
 
     Parameters
     ----------
     paths
         Paths to the individual ``benchmarks.json`` files (or directories
         containing them) produced by the concurrent instances.
+    compact
+        Apply :func:`compact_requests` (defaults) to each instance before
+        concatenating, so the full-width frame never exists.
 
     Returns
     -------
@@ -330,11 +424,15 @@ def load_multi_instance_run(
     all_reqs: List[pd.DataFrame] = []
     all_summaries: List[pd.DataFrame] = []
 
-    for idx, path in enumerate(paths):
+    for path in paths:
         report = load_report(path)
+        if not is_report(report):
+            logger.warning("skipping %s: not a GuideLLM report (no benchmarks list)", path)
+            continue
+        idx = len(all_reqs)
         req_df = requests_to_dataframe(report)
         req_df["instance"] = idx
-        all_reqs.append(req_df)
+        all_reqs.append(compact_requests(req_df) if compact else req_df)
 
         sum_df = benchmark_summary(report)
         sum_df["instance"] = idx
@@ -343,7 +441,7 @@ def load_multi_instance_run(
     if not all_reqs:
         return pd.DataFrame(), pd.DataFrame()
 
-    requests_df = pd.concat(all_reqs, ignore_index=True)
+    requests_df = concat_requests(all_reqs)
     per_instance_df = pd.concat(all_summaries, ignore_index=True)
 
     overall_start = per_instance_df["start_time"].min()
@@ -356,7 +454,7 @@ def load_multi_instance_run(
         "incomplete": int(per_instance_df["incomplete"].sum()),
         "errored": int(per_instance_df["errored"].sum()),
         "total": int(per_instance_df["total"].sum()),
-        "instances": len(paths),
+        "instances": len(all_reqs),
     }])
 
     return requests_df, summary_df
@@ -364,6 +462,7 @@ def load_multi_instance_run(
 
 def load_runs(
     run_configs: List[Tuple[List[Union[str, Path]], str]],
+    compact: bool = False,
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Load results for multiple runs, each potentially multi-instance.
 
@@ -374,6 +473,10 @@ def load_runs(
         more ``benchmarks.json`` files belonging to the same run (the
         concurrent GuideLLM instances).  For a single-instance run just pass
         a one-element list.
+    compact
+        Return the compact schema of :func:`compact_requests` (categoricals,
+        float32 latencies, no ``error_detail``): several times less memory
+        for experiments with millions of requests.
 
     Returns
     -------
@@ -386,22 +489,156 @@ def load_runs(
     all_summaries: List[pd.DataFrame] = []
 
     for paths, label in run_configs:
-        req_df, sum_df = load_multi_instance_run(paths)
-        req_df["run"] = label
+        req_df, sum_df = load_multi_instance_run(paths, compact=compact)
+        req_df["run"] = pd.Categorical([label] * len(req_df)) if compact else label
         all_reqs.append(req_df)
 
         sum_df["run"] = label
         all_summaries.append(sum_df)
 
-    requests_df = pd.concat(all_reqs, ignore_index=True) if all_reqs else pd.DataFrame()
+    requests_df = concat_requests(all_reqs) if all_reqs else pd.DataFrame()
     summary_df = pd.concat(all_summaries, ignore_index=True) if all_summaries else pd.DataFrame()
     return requests_df, summary_df
 
 
+# ---------------------------------------------------------------------------
+# Compact in-memory representation
+# ---------------------------------------------------------------------------
+
+# Per-request durations/rates: float32 keeps ~7 significant digits, far
+# below measurement noise.  Unix timestamps stay float64 (float32 would
+# round them to ~2 minutes).
+REQUEST_FLOAT32_COLUMNS = ("request_latency_s", "ttft_ms", "itl_ms", "output_tokens_per_second", "elapsed_s")
+REQUEST_TOKEN_COLUMNS = ("prompt_tokens", "output_tokens")
+REQUEST_INDEX_COLUMNS = ("benchmark_idx", "instance")
+REQUEST_CATEGORY_COLUMNS = ("run", "status", "error_reason")
+REQUEST_STATUSES = ["successful", "incomplete", "errored"]
+
+
+def compact_requests(
+    requests_df: pd.DataFrame,
+    keep_error_detail: bool = False,
+    keep_request_id: bool = False,
+    keep_elapsed: bool = False,
+    float32: bool = True,
+) -> pd.DataFrame:
+    """Shrink a per-request frame (see :func:`requests_to_dataframe`).
+
+    - ``run``, ``status``, ``error_reason`` become categoricals;
+    - ``error_detail`` (the full error message, often a long traceback) is
+      dropped unless *keep_error_detail*, in which case it is a categorical
+      too, so repeated messages are stored once;
+    - ``request_id`` (a UUID string, ~44 B/row and unused by the analysis)
+      is dropped unless *keep_request_id*, in which case it becomes a
+      pyarrow string;
+    - ``elapsed_s`` (``request_end_time - request_start_time``) is dropped
+      unless *keep_elapsed*; the functions using it recompute it;
+    - latency and rate columns become float32 unless ``float32=False``;
+    - token counts become ``int16`` or ``int32`` and indices ``int8`` or
+      ``int16``, the smallest holding them (token counts nullable ``Int16``
+      / ``Int32`` when some are missing).
+
+    On a 200k-request frame with 5% errors this goes from ~186 to ~41
+    bytes per row (4.5x); 16 of what is left are the two float64 request
+    timestamps, which need their millisecond precision.
+    Everything in this module works the same on the compact frame.  Use
+    :func:`memory_report` to compare.
+    """
+    df = requests_df
+    drop = (
+        [c for c in ("error_detail",) if not keep_error_detail]
+        + [c for c in ("request_id",) if not keep_request_id]
+        + [c for c in ("elapsed_s",) if not keep_elapsed]
+    )
+    df = df.drop(columns=[c for c in drop if c in df.columns])
+
+    converted: Dict[str, Any] = {}
+    for col in REQUEST_CATEGORY_COLUMNS + (("error_detail",) if keep_error_detail else ()):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = REQUEST_STATUSES if col == "status" else None
+            converted[col] = pd.Categorical(df[col], categories=categories)
+    if float32:
+        for col in REQUEST_FLOAT32_COLUMNS:
+            if col in df.columns:
+                converted[col] = pd.to_numeric(df[col]).astype(np.float32)
+    for col in REQUEST_TOKEN_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col])
+            dtype = _smallest_int(values, (np.int16, np.int32))
+            converted[col] = values.astype(dtype.__name__.capitalize() if values.isna().any() else dtype)
+    for col in REQUEST_INDEX_COLUMNS:
+        if col in df.columns:
+            converted[col] = pd.to_numeric(df[col]).astype(_smallest_int(pd.to_numeric(df[col]), (np.int8, np.int16)))
+    if "request_id" in df.columns:
+        converted["request_id"] = df["request_id"].astype("string[pyarrow]")
+    return df.assign(**converted)
+
+
+def _smallest_int(values: pd.Series, dtypes: Tuple[type, ...]) -> type:
+    """First of *dtypes* holding every value of *values* (the last one otherwise)."""
+    lo, hi = (values.min(), values.max()) if values.notna().any() else (0, 0)
+    for dtype in dtypes[:-1]:
+        if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+            return dtype
+    return dtypes[-1]
+
+
+def elapsed_seconds(requests_df: pd.DataFrame) -> pd.Series:
+    """``elapsed_s`` of *requests_df*, recomputed from the timestamps when compacted away."""
+    if "elapsed_s" in requests_df.columns:
+        return requests_df["elapsed_s"]
+    return (requests_df["request_end_time"] - requests_df["request_start_time"]).rename("elapsed_s")
+
+
+def concat_requests(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """``pd.concat`` that keeps categorical columns categorical.
+
+    Plain ``concat`` falls back to object dtype when the frames' categories
+    differ (every run has its own ``run`` category), undoing
+    :func:`compact_requests`; the categories are unified first.
+    """
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    for col in frames[0].columns if frames else []:
+        dtypes = [f[col].dtype for f in frames if col in f.columns]
+        if len(frames) > 1 and all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            categories = pd.Index(pd.unique(np.concatenate([d.categories.to_numpy(dtype=object) for d in dtypes])))
+            frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) if col in f.columns else f for f in frames]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Deep memory usage per column, largest first, with a ``TOTAL`` row.
+
+    Returns
+    -------
+    column | dtype | bytes | bytes_per_row | share
+    """
+    usage = df.memory_usage(deep=True, index=True)
+    n = max(len(df), 1)
+    out = pd.DataFrame({
+        "column": usage.index.astype(str),
+        "dtype": [str(df[c].dtype) if c in df.columns else "index" for c in usage.index],
+        "bytes": usage.to_numpy(),
+    }).sort_values("bytes", ascending=False, ignore_index=True)
+    total = int(out["bytes"].sum())
+    out["bytes_per_row"] = out["bytes"] / n
+    out["share"] = out["bytes"] / total if total else 0.0
+    out.loc[len(out)] = ["TOTAL", "", total, total / n, 1.0]
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Gateway-level metric computation (primary source for claims/gating)
 # ---------------------------------------------------------------------------
 
+# Latency metrics of the percentile tables: name -> (column, scale).
+LATENCY_METRICS: Dict[str, Tuple[str, float]] = {
+    "TTFT": ("ttft_ms", 1.0),
+    "E2E": ("request_latency_s", 1.0),
+    "ITL": ("itl_ms", 1.0),
+}
+
+
 def compute_latency_percentiles(
     requests_df: pd.DataFrame,
     quantiles: Optional[List[float]] = None,
@@ -419,15 +656,11 @@ def compute_latency_percentiles(
 
     ok = requests_df[requests_df["status"] == "successful"]
 
-    metrics_map = {
-        "TTFT": ("ttft_ms", 1.0),
-        "E2E": ("request_latency_s", 1.0),
-        "ITL": ("itl_ms", 1.0),
-    }
-
     rows: List[Dict[str, Any]] = []
     for run_label, group in ok.groupby("run", sort=False):
-        for metric_name, (col, scale) in metrics_map.items():
+        for metric_name, (col, scale) in LATENCY_METRICS.items():
+            if col not in group:
+                continue  # projected out (``RequestDataset.select``)
             series = group[col].dropna() * scale
             row: Dict[str, Any] = {"Run": run_label, "Metric": metric_name}
             for q in quantiles:
@@ -439,6 +672,41 @@ def compute_latency_percentiles(
     return pd.DataFrame(rows, columns=cols)
 
 
+def compute_latency_sketches(
+    requests_df: pd.DataFrame,
+    relative_accuracy: float = 0.01,
+) -> Dict[str, DDSketch]:
+    """One mergeable sketch per :data:`LATENCY_METRICS` entry (successful requests)."""
+    ok = requests_df[requests_df["status"] == "successful"] if not requests_df.empty else requests_df
+    return {
+        metric_name: DDSketch.from_values(
+            ok[col].dropna().to_numpy(dtype=float) * scale if col in ok else [], relative_accuracy,
+        )
+        for metric_name, (col, scale) in LATENCY_METRICS.items()
+    }
+
+
+def latency_percentiles_from_sketches(
+    sketches: Dict[str, Dict[str, DDSketch]],
+    quantiles: Optional[List[float]] = None,
+) -> pd.DataFrame:
+    """:func:`compute_latency_percentiles` from ``{run: {metric: sketch}}``.
+
+    Quantiles are within the sketches' relative accuracy of the exact
+    order statistics, without the per-request frame.
+    """
+    if quantiles is None:
+        quantiles = [0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99]
+    cols = ["Run", "Metric"] + [f"P{int(q * 100)}" for q in quantiles]
+    rows: List[Dict[str, Any]] = []
+    for run_label, by_metric in sketches.items():
+        for metric_name in LATENCY_METRICS:
+            sketch = by_metric.get(metric_name)
+            values = sketch.quantile(quantiles) if sketch is not None else np.full(len(quantiles), np.nan)
+            rows.append({"Run": run_label, "Metric": metric_name, **dict(zip(cols[2:], values))})
+    return pd.DataFrame(rows, columns=cols)
+
+
 def compute_error_summary(requests_df: pd.DataFrame) -> pd.DataFrame:
     """Per-run error and timeout summary.
 
@@ -459,7 +727,7 @@ def compute_error_summary(requests_df: pd.DataFrame) -> pd.DataFrame:
             "errored": int(errored),
             "error_pct": float(errored / total * 100) if total > 0 else 0.0,
         })
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=["Run", "total", "successful", "incomplete", "errored", "error_pct"])
 
 
 def compute_throughput_summary(
@@ -504,7 +772,9 @@ def compute_throughput_summary(
             "requests_per_second": rps,
             "output_tokens_per_second_avg": otps,
         })
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=[
+        "Run", "total_requests", "duration_s", "requests_per_second", "output_tokens_per_second_avg",
+    ])
 
 
 def compute_gating_verdicts(
@@ -540,6 +810,44 @@ def compute_gating_verdicts(
     wva_err_pct = wva_err / wva_total * 100 if wva_total > 0 else 0.0
     bl_err_pct = bl_err / bl_total * 100 if bl_total > 0 else 0.0
 
+    return _gating_table(wva_ttft, bl_ttft, wva_e2e, bl_e2e, wva_err_pct, bl_err_pct)
+
+
+def compute_gating_verdicts_from_sketches(
+    sketches: Dict[str, Dict[str, DDSketch]],
+    error_summary: pd.DataFrame,
+    wva_label: str,
+    baseline_label: str,
+) -> pd.DataFrame:
+    """:func:`compute_gating_verdicts` from latency sketches and request counts.
+
+    Parameters
+    ----------
+    sketches
+        ``{run: {metric: DDSketch}}`` as built by :func:`compute_latency_sketches`
+        and merged per run.
+    error_summary
+        :func:`compute_error_summary`-shaped frame (``Run``, ``total``,
+        ``errored``).
+    """
+    def _p99(run_label, metric_name):
+        sketch = sketches.get(run_label, {}).get(metric_name)
+        return sketch.quantile(0.99) if sketch is not None else np.nan
+
+    def _err_pct(run_label):
+        row = error_summary[error_summary["Run"] == run_label]
+        total = int(row["total"].sum())
+        return float(row["errored"].sum()) / total * 100 if total > 0 else 0.0
+
+    return _gating_table(
+        _p99(wva_label, "TTFT") / 1000.0, _p99(baseline_label, "TTFT") / 1000.0,
+        _p99(wva_label, "E2E"), _p99(baseline_label, "E2E"),
+        _err_pct(wva_label), _err_pct(baseline_label),
+    )
+
+
+def _gating_table(wva_ttft, bl_ttft, wva_e2e, bl_e2e, wva_err_pct, bl_err_pct) -> pd.DataFrame:
+    """Verdict rows shared by the request-frame and sketch variants."""
     def _pct_change(wva_val, bl_val):
         if np.isnan(wva_val) or np.isnan(bl_val) or bl_val == 0:
             return np.nan
@@ -587,6 +895,149 @@ def compute_gating_verdicts(
     ])
 
 
+# ---------------------------------------------------------------------------
+# Bootstrap confidence intervals for gating verdicts
+# ---------------------------------------------------------------------------
+
+def _bootstrap_quantile_chunk(values: np.ndarray, q: float, size: int, seed) -> np.ndarray:
+    """*size* bootstrap replicates of ``np.quantile(values, q)`` via an index matrix."""
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, values.size, size=(size, values.size))
+    return np.quantile(values[idx], q, axis=1)
+
+
+def bootstrap_quantile(
+    values: np.ndarray,
+    q: float,
+    n_resamples: int = 10_000,
+    method: str = "auto",
+    seed: Optional[int] = 0,
+    chunk_elements: int = 20_000_000,
+    processes: Optional[int] = None,
+) -> np.ndarray:
+    """Bootstrap replicates of the *q* quantile of *values* (linear interpolation).
+
+    Parameters
+    ----------
+    method
+        - ``"resample"``: resample with an index matrix and ``np.quantile``
+          along axis 1, in chunks of at most *chunk_elements* indices
+          (optionally spread over *processes* worker processes).
+        - ``"order"``: draw the two order statistics the quantile
+          interpolates between from their exact bootstrap distribution
+          (Beta-distributed ranks of the sorted sample).  Same distribution
+          as ``"resample"`` at O(n log n + n_resamples) cost, which is what
+          makes 10k resamples of 1M-request runs take well under a second.
+        - ``"auto"``: ``"resample"`` when ``n * n_resamples`` fits in one
+          chunk, ``"order"`` otherwise.
+    """
+    x = np.asarray(values, dtype=float)
+    x = x[~np.isnan(x)]
+    n = x.size
+    if n == 0:
+        return np.full(n_resamples, np.nan)
+    if method == "auto":
+        method = "resample" if n * n_resamples <= chunk_elements else "order"
+
+    if method == "order":
+        rng = np.random.default_rng(seed)
+        xs = np.sort(x)
+        h = (n - 1) * q
+        k = int(np.floor(h))
+        frac = h - k
+        # Uniform order statistics U_(k+1) and U_(k+2) of the resample; the
+        # resample's j-th smallest value is xs[ceil(n * U_(j)) - 1].
+        u1 = rng.beta(k + 1, n - k, size=n_resamples)
+        lo = xs[np.clip(np.ceil(n * u1).astype(np.int64) - 1, 0, n - 1)]
+        if frac == 0 or k + 1 >= n:
+            return lo
+        u2 = u1 + (1 - u1) * rng.beta(1, n - k - 1, size=n_resamples) if n - k - 1 > 0 else u1
+        hi = xs[np.clip(np.ceil(n * u2).astype(np.int64) - 1, 0, n - 1)]
+        return lo + frac * (hi - lo)
+
+    if method != "resample":
+        raise ValueError(f"unknown bootstrap method {method!r}")
+    chunk = max(1, min(n_resamples, chunk_elements // n))
+    sizes = [min(chunk, n_resamples - i) for i in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if processes and len(sizes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_bootstrap_quantile_chunk, [x] * len(sizes), [q] * len(sizes), sizes, seeds))
+    else:
+        parts = [_bootstrap_quantile_chunk(x, q, size, sd) for size, sd in zip(sizes, seeds)]
+    return np.concatenate(parts)
+
+
+def compute_gating_verdicts_bootstrap(
+    requests_df: pd.DataFrame,
+    wva_label: str,
+    baseline_label: str,
+    n_resamples: int = 10_000,
+    confidence: float = 0.95,
+    method: str = "auto",
+    seed: Optional[int] = 0,
+    processes: Optional[int] = None,
+) -> pd.DataFrame:
+    """:func:`compute_gating_verdicts` with bootstrap confidence intervals.
+
+    Both runs are resampled independently.  p99 TTFT/E2E deltas use
+    :func:`bootstrap_quantile`; the error-rate difference resamples the
+    error count of each run as ``Binomial(n, p)`` (the exact bootstrap
+    distribution of a proportion).
+
+    The verdict only flips on evidence: ``FAIL`` when the whole interval
+    is above the threshold, ``PASS`` when it is entirely at or below it,
+    ``INCONCLUSIVE`` otherwise.
+
+    Returns
+    -------
+    The :func:`compute_gating_verdicts` columns plus ``ci_low``/``ci_high``
+    (bounds of ``delta_pct``) and ``p_exceed`` (fraction of resamples
+    above the threshold).
+    """
+    point = compute_gating_verdicts(requests_df, wva_label, baseline_label)
+    ok = requests_df[requests_df["status"] == "successful"]
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+
+    def _p99_boot(label, col, scale):
+        values = ok.loc[ok["run"] == label, col].to_numpy(dtype=float) * scale
+        return bootstrap_quantile(values, 0.99, n_resamples, method, rng.integers(2**32), processes=processes)
+
+    def _err_boot(label):
+        run = requests_df[requests_df["run"] == label]
+        total = len(run)
+        if total == 0:
+            return np.zeros(n_resamples)
+        p = float((run["status"] == "errored").sum()) / total
+        return rng.binomial(total, p, size=n_resamples) / total * 100
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deltas = [
+            (_p99_boot(wva_label, "ttft_ms", 1e-3) / _p99_boot(baseline_label, "ttft_ms", 1e-3) - 1) * 100,
+            (_p99_boot(wva_label, "request_latency_s", 1.0) / _p99_boot(baseline_label, "request_latency_s", 1.0) - 1) * 100,
+            _err_boot(wva_label) - _err_boot(baseline_label),
+        ]
+
+    rows = []
+    for (_, row), boot in zip(point.iterrows(), deltas):
+        boot = boot[np.isfinite(boot)]
+        threshold = row["threshold_pct"]
+        if boot.size == 0 or np.isnan(row["delta_pct"]):
+            ci_low = ci_high = p_exceed = np.nan
+            verdict = "NO DATA"
+        else:
+            ci_low, ci_high = np.quantile(boot, [alpha, 1 - alpha])
+            p_exceed = float((boot > threshold).mean())
+            verdict = "FAIL" if ci_low > threshold else "PASS" if ci_high <= threshold else "INCONCLUSIVE"
+        rows.append({**row.to_dict(), "ci_low": ci_low, "ci_high": ci_high, "p_exceed": p_exceed, "verdict": verdict})
+
+    cols = ["metric", "gate", "wva_value", "baseline_value", "delta_pct", "ci_low", "ci_high", "p_exceed", "threshold_pct", "verdict"]
+    return pd.DataFrame(rows, columns=cols)
+
+
 # ---------------------------------------------------------------------------
 # Error deep-dive helpers
 # ---------------------------------------------------------------------------
@@ -619,7 +1070,7 @@ def compute_error_breakdown(
         for (status, reason), grp in run_non_ok.groupby(
             ["status", "error_reason"], dropna=False, sort=False
         ):
-            elapsed = grp["elapsed_s"].dropna()
+            elapsed = elapsed_seconds(grp).dropna()
             ttft = grp["ttft_ms"].dropna()
             out_tok = grp["output_tokens"].dropna()
 
@@ -665,6 +1116,7 @@ def compute_non_successful_timing(
         quantiles = [0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99]
 
     non_ok = requests_df[requests_df["status"] != "successful"]
+    non_ok = non_ok.assign(elapsed_s=elapsed_seconds(non_ok))
 
     metrics_map = {
         "Elapsed (s)": "elapsed_s",
@@ -721,3 +1173,405 @@ def compute_error_timeline(
         .reset_index(name="count")
     )
     return grouped.sort_values(["run", "time_bin", "status"]).reset_index(drop=True)
+
+
+# ---------------------------------------------------------------------------
+# Notebook tables
+# ---------------------------------------------------------------------------
+
+def run_config_files(run_configs: List[Tuple[List[Union[str, Path]], str]]) -> List[Path]:
+    """Every results file of *run_configs* (the inputs of :func:`gateway_tables`)."""
+    return [Path(p) for paths, _ in run_configs for p in paths]
+
+
+def gateway_tables(
+    run_configs: List[Tuple[List[Union[str, Path]], str]],
+    wva_label: Optional[str] = None,
+    compact: bool = False,
+    bin_seconds: int = 60,
+) -> Dict[str, Optional[pd.DataFrame]]:
+    """All gateway-level tables of the notebook from one load of *run_configs*.
+
+    Meant to be called through ``ArtifactStore.with_inputs`` with
+    :func:`run_config_files`, so the reports are re-read only when one of
+    them changes.
+
+    Parameters
+    ----------
+    wva_label
+        Run compared against the first other run in the gating verdicts;
+        the last run when absent or not among the runs.
+
+    Returns
+    -------
+    ``requests``, ``summary``, ``latency``, ``errors``, ``error_breakdown``,
+    ``non_ok_timing``, ``error_timeline``, ``throughput`` and ``gating``
+    (``None`` with fewer than two runs).  Empty frames without runs.
+    """
+    requests_df, summary_df = load_runs(run_configs, compact=compact)
+    if requests_df.empty:
+        return {"requests": requests_df, "summary": summary_df, "gating": None}
+
+    runs = requests_df["run"].unique().tolist()
+    gating = None
+    if len(runs) >= 2:
+        wva = wva_label if wva_label in runs else runs[-1]
+        baseline = [r for r in runs if r != wva][0]
+        gating = compute_gating_verdicts(requests_df, wva_label=wva, baseline_label=baseline)
+
+    return {
+        "requests": requests_df,
+        "summary": summary_df,
+        "latency": compute_latency_percentiles(requests_df),
+        "errors": compute_error_summary(requests_df),
+        "error_breakdown": compute_error_breakdown(requests_df),
+        "non_ok_timing": compute_non_successful_timing(requests_df),
+        "error_timeline": compute_error_timeline(requests_df, bin_seconds=bin_seconds),
+        "throughput": compute_throughput_summary(requests_df, summary_df),
+        "gating": gating,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Gateway-level latency percentiles over time
+# ---------------------------------------------------------------------------
+
+def _segment_quantiles(keys: np.ndarray, values: np.ndarray, quantiles: List[float], n_segments: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Linear-interpolation quantiles of *values* per integer segment key.
+
+    One ``lexsort`` orders values within segments; every quantile is then
+    index arithmetic on the segment offsets.  Returns ``(counts,
+    (n_segments, n_quantiles) array)`` with NaN for empty segments.
+    """
+    order = np.lexsort((values, keys))
+    v = values[order]
+    counts = np.bincount(keys, minlength=n_segments)
+    starts = np.cumsum(counts) - counts
+    out = np.full((n_segments, len(quantiles)), np.nan)
+    has = counts > 0
+    last = starts + np.maximum(counts - 1, 0)
+    for j, q in enumerate(quantiles):
+        h = (counts[has] - 1) * q
+        lo = np.floor(h).astype(np.int64)
+        idx = starts[has] + lo
+        nxt = np.minimum(idx + 1, last[has])
+        out[has, j] = v[idx] + (h - lo) * (v[nxt] - v[idx])
+    return counts, out
+
+
+def compute_latency_timeseries(
+    requests_df: pd.DataFrame,
+    window: str = "1m",
+    step: Optional[str] = None,
+    quantiles: Optional[List[float]] = None,
+    metrics: Optional[List[str]] = None,
+    time_col: str = "request_end_time",
+    min_count: int = 1,
+    max_windows_per_request: int = 60,
+) -> pd.DataFrame:
+    """Percentiles of successful-request latencies per time window and run.
+
+    The client-side counterpart of ``prometheus.get_histogram_quantiles``:
+    each row is labelled with the *end* of its window (like a PromQL
+    evaluation timestamp) as a naive local datetime, and requests are
+    placed by completion time (*time_col*), when the server-side histograms
+    observe them too.
+
+    Parameters
+    ----------
+    window
+        Window length (``"1m"``, ``"30s"``...).
+    step
+        Distance between window ends; defaults to *window* (fixed bins).
+        A smaller step gives sliding windows and must divide *window*.
+        Every request is copied into each of the ``window / step`` windows
+        it falls in, so memory and time grow with that ratio; it is capped
+        at *max_windows_per_request*.
+    metrics
+        Subset of :data:`LATENCY_METRICS` names (default all).
+    min_count
+        Windows with fewer requests are dropped.
+    max_windows_per_request
+        Largest accepted ``window / step``.  At the default 60 a run of
+        1M requests sorts 60M values per metric (~1 GB of keys and values);
+        raise it knowingly, or use a coarser step.
+
+    Returns
+    -------
+    run | metric | timestamp | count | P10 | P25 | P50 | P75 | P90 | P99
+        Filter on ``run``/``metric`` and pass to
+        ``plotting.candlestick.candlestick_over_time_with_scaling``.
+    """
+    if quantiles is None:
+        quantiles = [0.10, 0.25, 0.50, 0.75, 0.90, 0.99]
+    metrics = list(metrics or LATENCY_METRICS)
+    q_cols = [f"P{format(q * 100, 'g')}" for q in quantiles]
+    cols = ["run", "metric", "timestamp", "count", *q_cols]
+
+    window_s = duration_to_seconds(window)
+    step_s = duration_to_seconds(step) if step else window_s
+    per_window = int(round(window_s / step_s))
+    if per_window < 1 or not np.isclose(per_window * step_s, window_s):
+        raise ValueError(f"step {step!r} must divide window {window!r}")
+    if per_window > max_windows_per_request:
+        raise ValueError(
+            f"window {window!r} / step {step!r} = {per_window} windows per request exceeds "
+            f"max_windows_per_request={max_windows_per_request}"
+        )
+
+    ok = requests_df[requests_df["status"] == "successful"]
+    frames: List[pd.DataFrame] = []
+    for run_label, group in ok.groupby("run", sort=False):
+        for metric_name in metrics:
+            col, scale = LATENCY_METRICS[metric_name]
+            sub = group[[time_col, col]].dropna()
+            if sub.empty:
+                continue
+            t = sub[time_col].to_numpy(dtype=float)
+            v = sub[col].to_numpy(dtype=float) * scale
+            t0 = np.floor(t.min() / step_s) * step_s
+            # Index of the first window end at or after each request.
+            first = np.maximum(np.ceil((t - t0) / step_s).astype(np.int64) - 1, 0)
+            n_segments = int(first.max()) + per_window
+            # A request falls in per_window consecutive (sliding) windows.
+            keys = (first[:, None] + np.arange(per_window)).ravel()
+            counts, values = _segment_quantiles(keys, np.repeat(v, per_window), quantiles, n_segments)
+
+            keep = counts >= max(min_count, 1)
+            ends = t0 + (np.flatnonzero(keep) + 1) * step_s
+            frame = pd.DataFrame(values[keep], columns=q_cols)
+            frame.insert(0, "count", counts[keep])
+            frame.insert(0, "timestamp", to_local_datetime64(ends))
+            frame.insert(0, "metric", metric_name)
+            frame.insert(0, "run", run_label)
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    return pd.concat(frames, ignore_index=True)[cols]
+
+
+# ---------------------------------------------------------------------------
+# Steady-state measurement windows
+# ---------------------------------------------------------------------------
+
+def detect_steady_windows(
+    requests_df: pd.DataFrame,
+    bin: str = "10s",
+    min_duration: str = "1m",
+    penalty: float = 3.0,
+    per_stage: bool = True,
+) -> pd.DataFrame:
+    """Steady-state measurement windows per run (and per load stage).
+
+    Successful requests are binned by completion time into throughput
+    (requests/s) and median TTFT series; ``transform.steady_state``
+    splits them at mean shifts (load steps, saturation), trims warm-up and
+    drain from each segment and drops ramps.
+
+    Parameters
+    ----------
+    per_stage
+        Return every steady segment; otherwise one window per run from the
+        first steady start to the last steady end.
+
+    Returns
+    -------
+    run | stage | start | end | duration_s | requests | throughput_rps | ttft_p50_ms
+        *start*/*end* are naive local datetimes, like ``TIME_RANGES``.
+    """
+    bin_s = duration_to_seconds(bin)
+    min_bins = max(int(np.ceil(duration_to_seconds(min_duration) / bin_s)), 2)
+    cols = ["run", "stage", "start", "end", "duration_s", "requests", "throughput_rps", "ttft_p50_ms"]
+
+    ok = requests_df[requests_df["status"] == "successful"]
+    rows: List[Dict[str, Any]] = []
+    for run_label, group in ok.groupby("run", sort=False):
+        group = group.dropna(subset=["request_end_time"])
+        if group.empty:
+            continue
+        t = group["request_end_time"].to_numpy(dtype=float)
+        t0 = np.floor(t.min() / bin_s) * bin_s
+        keys = np.floor((t - t0) / bin_s).astype(np.int64)
+        n_bins = int(keys.max()) + 1
+        throughput = np.bincount(keys, minlength=n_bins) / bin_s
+        ttft = group["ttft_ms"].to_numpy(dtype=float)
+        has_ttft = ~np.isnan(ttft)
+        _, ttft_p50 = _segment_quantiles(keys[has_ttft], ttft[has_ttft], [0.5], n_bins)
+
+        segments = steady_segments([throughput, ttft_p50[:, 0]], min_size=min_bins, penalty=penalty)
+        if segments and not per_stage:
+            segments = [(segments[0][0], segments[-1][1])]
+        for stage, (a, b) in enumerate(segments):
+            lo, hi = t0 + a * bin_s, t0 + b * bin_s
+            in_window = (t >= lo) & (t < hi)
+            rows.append({
+                "run": run_label,
+                "stage": stage,
+                "start": datetime.fromtimestamp(lo),
+                "end": datetime.fromtimestamp(hi),
+                "duration_s": hi - lo,
+                "requests": int(in_window.sum()),
+                "throughput_rps": float(in_window.sum() / (hi - lo)),
+                "ttft_p50_ms": float(np.nanmedian(ttft[in_window])) if in_window.any() else np.nan,
+            })
+    return pd.DataFrame(rows, columns=cols)
+
+
+def steady_time_ranges(windows: pd.DataFrame) -> List[Tuple[datetime, datetime, str]]:
+    """``TIME_RANGES`` from :func:`detect_steady_windows` output.
+
+    Runs with several stages get one range per stage, labelled
+    ``"<run> [stage N]"``.
+    """
+    stages = windows.groupby("run")["stage"].transform("size")
+    return [
+        (pd.Timestamp(row.start).to_pydatetime(), pd.Timestamp(row.end).to_pydatetime(),
+         row.run if n == 1 else f"{row.run} [stage {row.stage}]")
+        for row, n in zip(windows.itertuples(), stages)
+    ]
+
+
+def trim_to_windows(requests_df: pd.DataFrame, windows: pd.DataFrame, time_col: str = "request_end_time") -> pd.DataFrame:
+    """Requests of every run restricted to its steady windows, with a ``stage`` column.
+
+    The result can be fed to every ``compute_*`` function of this module.
+    """
+    frames = []
+    for row in windows.itertuples():
+        lo, hi = pd.Timestamp(row.start).to_pydatetime().timestamp(), pd.Timestamp(row.end).to_pydatetime().timestamp()
+        t = requests_df[time_col]
+        sel = requests_df[(requests_df["run"] == row.run) & (t >= lo) & (t < hi)]
+        frames.append(sel.assign(stage=row.stage))
+    if not frames:
+        return requests_df.iloc[0:0].assign(stage=pd.Series(dtype=int))
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------------------------------------------------------------------------
+# Stepped-load segmentation
+# ---------------------------------------------------------------------------
+
+def infer_load_steps(requests_df: pd.DataFrame, min_step: str = "30s") -> pd.DataFrame:
+    """Load steps of multi-instance runs from the instances' active windows.
+
+    The stepped-load pipeline starts GuideLLM instances with staggered
+    delays, so the offered load changes whenever an instance starts or
+    stops.  Each instance is active from its first request start to its
+    last request end; step boundaries are those start/stop times (closer
+    than *min_step* ones are merged) and every step records how many
+    instances were active and the mean number of in-flight requests.
+
+    Returns
+    -------
+    run | step | start | end | duration_s | active_instances | mean_concurrency
+        *start*/*end* are naive local datetimes.
+    """
+    cols = ["run", "step", "start", "end", "duration_s", "active_instances", "mean_concurrency"]
+    min_step_s = duration_to_seconds(min_step)
+    rows: List[Dict[str, Any]] = []
+    for run_label, group in requests_df.groupby("run", sort=False):
+        group = group.dropna(subset=["request_start_time", "request_end_time"])
+        if group.empty:
+            continue
+        by_instance = group.groupby("instance")
+        inst_start = by_instance["request_start_time"].min().to_numpy(dtype=float)
+        inst_end = by_instance["request_end_time"].max().to_numpy(dtype=float)
+
+        edges = np.unique(np.concatenate([inst_start, inst_end]))
+        merged = [edges[0]]
+        for e in edges[1:]:
+            if e - merged[-1] >= min_step_s:
+                merged.append(e)
+        merged[-1] = edges[-1]
+        edges = np.asarray(merged)
+        if edges.size < 2:
+            continue
+        lo, hi = edges[:-1], edges[1:]
+        mid = (lo + hi) / 2
+        active = ((inst_start[None, :] <= mid[:, None]) & (inst_end[None, :] >= mid[:, None])).sum(axis=1)
+
+        # Mean in-flight requests: total request-seconds overlapping each step.
+        rs = group["request_start_time"].to_numpy(dtype=float)
+        re_ = group["request_end_time"].to_numpy(dtype=float)
+        concurrency = np.array([
+            np.clip(np.minimum(re_, b) - np.maximum(rs, a), 0, None).sum() for a, b in zip(lo, hi)
+        ]) / (hi - lo)
+
+        step = 0
+        for a, b, n, c in zip(lo, hi, active, concurrency):
+            if n == 0:
+                continue
+            rows.append({
+                "run": run_label,
+                "step": step,
+                "start": datetime.fromtimestamp(a),
+                "end": datetime.fromtimestamp(b),
+                "duration_s": b - a,
+                "active_instances": int(n),
+                "mean_concurrency": float(c),
+            })
+            step += 1
+    return pd.DataFrame(rows, columns=cols)
+
+
+def tag_load_steps(requests_df: pd.DataFrame, steps: pd.DataFrame, time_col: str = "request_start_time") -> pd.DataFrame:
+    """Copy of *requests_df* with the ``step`` each request arrived in (-1 outside steps)."""
+    out = requests_df.copy()
+    out["step"] = -1
+    for run_label, run_steps in steps.groupby("run", sort=False):
+        mask = (out["run"] == run_label).to_numpy()
+        t = out.loc[mask, time_col].to_numpy(dtype=float)
+        starts = np.array([pd.Timestamp(x).to_pydatetime().timestamp() for x in run_steps["start"]])
+        ends = np.array([pd.Timestamp(x).to_pydatetime().timestamp() for x in run_steps["end"]])
+        idx = np.searchsorted(starts, t, side="right") - 1
+        inside = (idx >= 0) & (t < ends[np.clip(idx, 0, None)])
+        out.loc[mask, "step"] = np.where(inside, run_steps["step"].to_numpy()[np.clip(idx, 0, None)], -1)
+    return out
+
+
+def compute_step_summary(
+    requests_df: pd.DataFrame,
+    steps: pd.DataFrame,
+    quantiles: Optional[List[float]] = None,
+) -> pd.DataFrame:
+    """Throughput, errors and latency percentiles per load step.
+
+    *requests_df* is tagged with :func:`tag_load_steps` when it has no
+    ``step`` column.  Requests are attributed to the step they arrived in;
+    throughput counts successful completions inside the step window.
+
+    Returns
+    -------
+    The :func:`infer_load_steps` columns plus ``requests | errored |
+    error_pct | throughput_rps | output_tokens_per_second`` and one
+    ``<metric> P<q>`` column per :data:`LATENCY_METRICS` entry and quantile.
+    """
+    if quantiles is None:
+        quantiles = [0.50, 0.90, 0.99]
+    if "step" not in requests_df.columns:
+        requests_df = tag_load_steps(requests_df, steps)
+    tagged = requests_df[requests_df["step"] >= 0]
+
+    rows: List[Dict[str, Any]] = []
+    for row in steps.itertuples(index=False):
+        reqs = tagged[(tagged["run"] == row.run) & (tagged["step"] == row.step)]
+        ok = reqs[reqs["status"] == "successful"]
+        lo = pd.Timestamp(row.start).to_pydatetime().timestamp()
+        hi = pd.Timestamp(row.end).to_pydatetime().timestamp()
+        run_ok = requests_df[(requests_df["run"] == row.run) & (requests_df["status"] == "successful")]
+        done = run_ok[(run_ok["request_end_time"] >= lo) & (run_ok["request_end_time"] < hi)]
+        entry: Dict[str, Any] = {
+            **row._asdict(),
+            "requests": len(reqs),
+            "errored": int((reqs["status"] == "errored").sum()),
+            "error_pct": float((reqs["status"] == "errored").mean() * 100) if len(reqs) else 0.0,
+            "throughput_rps": len(done) / row.duration_s if row.duration_s > 0 else np.nan,
+            "output_tokens_per_second": float(done["output_tokens"].sum()) / row.duration_s if row.duration_s > 0 else np.nan,
+        }
+        for metric_name, (col, scale) in LATENCY_METRICS.items():
+            series = ok[col].dropna() * scale
+            for q in quantiles:
+                entry[f"{metric_name} P{format(q * 100, 'g')}"] = float(series.quantile(q)) if not series.empty else np.nan
+        rows.append(entry)
+    return pd.DataFrame(rows)
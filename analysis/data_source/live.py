@@ -0,0 +1,439 @@
+"""
+Live, incremental monitoring of an in-progress benchmark run.
+
+Everything else in ``analysis/`` runs after a run has finished.  A
+:class:`LiveRunMonitor` instead tails Prometheus while the run is going:
+each :meth:`~LiveRunMonitor.poll` only asks for the steps after the last
+one already fetched (:class:`IncrementalRangeQuery`), folds them into
+rolling state (per-step histogram deltas in a sliding window, error rate,
+replica timeline) and appends the new points to a plotly figure, so
+history is never recomputed.  GuideLLM JSON files appearing in a local
+directory (e.g. synced with ``fetch-results.sh``) are picked up as they
+land and turned into client-side rolling statistics over the same window
+and step grid.
+
+In a notebook::
+
+    monitor = LiveRunMonitor(prom, datetime.now() - timedelta(minutes=10), MODEL_NAME, NAMESPACE, VARIANT_NAME)
+    display(monitor.figure())
+    monitor.run(interval_s=30, max_error_pct=5)
+"""
+
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from prometheus_api_client import PrometheusConnect
+
+from data_source.guidellm import load_report, requests_to_dataframe
+from data_source.recording_rules import aggregated_query
+from transform.histogram import HistogramAccumulator, HistogramDistribution, parse_le
+from transform.matrix import matrix_to_frame, to_local_datetime64, total_over_series
+from transform.promql import labels_key
+from utils.utils import duration_to_seconds
+
+
+class IncrementalRangeQuery:
+    """A range query that only fetches the steps it has not seen yet.
+
+    The evaluation grid stays ``start + k * step``, so concatenated polls
+    are identical to one range query over the whole period.  A poll that
+    covers more than *max_points* steps (the first one, when *start_time*
+    is far back, or after a long pause) is split into several requests,
+    like ``PromQuerySession`` does, to stay under Prometheus' per-series
+    point limit.
+    """
+
+    def __init__(
+        self, _prom: PrometheusConnect, query: str, start_time: datetime, step: str = "15s", delay: str = "30s",
+        max_points: int = 11000,
+    ):
+        self._prom = _prom
+        self.query = query
+        self.step_s = duration_to_seconds(step)
+        self.delay_s = duration_to_seconds(delay)
+        self.max_points = max_points
+        self.next_ts = round(start_time.timestamp())
+
+    def poll(self, now: Optional[datetime] = None) -> list:
+        """Raw ``matrix`` result for the new steps (``[]`` when there are none)."""
+        now_ts = (now or datetime.now()).timestamp() - self.delay_s
+        steps = int((now_ts - self.next_ts) // self.step_s)
+        if steps < 0:
+            return []
+        merged: Dict[tuple, dict] = {}
+        for first in range(0, steps + 1, self.max_points):
+            chunk_start = self.next_ts + first * self.step_s
+            chunk_end = self.next_ts + min(first + self.max_points - 1, steps) * self.step_s
+            result = self._prom.custom_query_range(
+                query=self.query,
+                start_time=datetime.fromtimestamp(chunk_start),
+                end_time=datetime.fromtimestamp(chunk_end),
+                step=f"{self.step_s:g}s",
+            )
+            for series in result or []:
+                entry = merged.setdefault(labels_key(series.get("metric", {})), {"metric": series.get("metric", {}), "values": []})
+                entry["values"].extend(series.get("values") or [])
+        self.next_ts += (steps + 1) * self.step_s
+        return list(merged.values())
+
+
+def rolling_request_stats(
+    requests: pd.DataFrame,
+    start_ts: float,
+    step_s: float,
+    window_s: float,
+    quantiles=(0.5, 0.9, 0.99),
+    values_scale_func: Callable[[float], float] = lambda x: x,
+) -> pd.DataFrame:
+    """Client-side rolling statistics of GuideLLM requests on a step grid.
+
+    Requests are placed at their ``request_end_time``; each step
+    ``t = start + k * step`` (up to the last completion) summarises the
+    left-open window ``(t - window, t]``, like a Prometheus range function.
+
+    Returns
+    -------
+    DataFrame with ``timestamp`` (naive local), ``requests`` (completed in
+    the window, any status), ``rps`` (successful requests per second),
+    ``error_pct`` and one ``P..`` column per quantile of
+    ``request_latency_s`` over successful requests (after
+    *values_scale_func*).
+    """
+    cols = [f"P{format(q * 100, 'g')}" for q in quantiles]
+    columns = ["timestamp", "requests", "rps", "error_pct", *cols]
+    if requests.empty or "request_end_time" not in requests:
+        return pd.DataFrame(columns=columns)
+    df = requests.dropna(subset=["request_end_time"]).sort_values("request_end_time")
+    end = df["request_end_time"].to_numpy(dtype=float)
+    if not end.size or end[-1] < start_ts:
+        return pd.DataFrame(columns=columns)
+    ok = (df["status"] == "successful").to_numpy()
+    errored = (df["status"] == "errored").to_numpy()
+    latency = pd.to_numeric(df["request_latency_s"], errors="coerce").to_numpy(dtype=float)
+
+    grid = start_ts + step_s * np.arange(int((end[-1] - start_ts) // step_s) + 2)
+    left = np.searchsorted(end, grid - window_s, side="right")
+    right = np.searchsorted(end, grid, side="right")
+    ok_cum = np.r_[0, np.cumsum(ok)]
+    err_cum = np.r_[0, np.cumsum(errored)]
+    count = right - left
+    n_ok = ok_cum[right] - ok_cum[left]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error_pct = np.where(count > 0, (err_cum[right] - err_cum[left]) / count * 100, np.nan)
+
+    values = np.full((grid.size, len(quantiles)), np.nan)
+    for k, (lo, hi) in enumerate(zip(left, right)):
+        window = latency[lo:hi][ok[lo:hi]]
+        window = window[~np.isnan(window)]
+        if window.size:
+            values[k] = [values_scale_func(v) for v in np.quantile(window, quantiles)]
+
+    out = pd.DataFrame({
+        "timestamp": to_local_datetime64(grid),
+        "requests": count,
+        "rps": n_ok / window_s,
+        "error_pct": error_pct,
+        **{col: values[:, i] for i, col in enumerate(cols)},
+    })
+    return out[count > 0].reset_index(drop=True)
+
+
+class LiveRunMonitor:
+    """Rolling latency percentiles, error rate and replicas of a running benchmark.
+
+    Parameters
+    ----------
+    start_time
+        Beginning of the run (or of the part to monitor).
+    histogram_metric
+        ``vllm:*`` histogram whose rolling percentiles are tracked.
+    window
+        Length of the sliding window for the rolling percentiles.
+    values_scale_func
+        Applied to latency values for display (e.g. seconds → ms).
+    guidellm_dir
+        Directory searched (recursively) for GuideLLM JSON reports; their
+        requests feed :attr:`client`, rolling statistics over *window*.
+    recorded_series
+        Recorded-series mode of the request-rate queries (see
+        ``data_source.recording_rules.aggregated_query``).  ``"auto"`` is
+        decided once, at the first poll after the probe window (the first
+        5 minutes of the run) has passed; earlier polls use the raw
+        expression, which the recorded series only precompute.
+    """
+
+    quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(
+        self,
+        _prom: PrometheusConnect,
+        start_time: datetime,
+        model_name: str,
+        namespace: str,
+        variant_name: str = ".*",
+        histogram_metric: str = "vllm:e2e_request_latency_seconds",
+        step: str = "15s",
+        window: str = "5m",
+        values_scale_func: Callable[[float], float] = lambda x: x,
+        guidellm_dir: Optional[Union[str, Path]] = None,
+        recorded_series: str = "off",
+    ):
+        self.values_scale_func = values_scale_func
+        self.start_ts = round(start_time.timestamp())
+        self.step_s = duration_to_seconds(step)
+        self.window_s = duration_to_seconds(window)
+        self.window_steps = max(int(duration_to_seconds(window) // duration_to_seconds(step)), 1)
+        self.guidellm_dir = Path(guidellm_dir) if guidellm_dir else None
+        self._prom = _prom
+        self._start_time = start_time
+        self._selector = {"model_name": model_name, "namespace": namespace}
+        self._recorded_pending = recorded_series == "auto"
+        replica_sel = f'{{variant_name=~"{variant_name}", exported_namespace=~"{namespace}"}}'
+
+        # Raw per-pod counters: step-to-step deltas are taken locally, since
+        # ``increase(...[step])`` sees a single sample per window.
+        self._histogram = IncrementalRangeQuery(
+            _prom, f'{histogram_metric}_bucket{{model_name="{model_name}",namespace="{namespace}"}}', start_time, step,
+        )
+        self._series = {
+            "total_rate": IncrementalRangeQuery(
+                _prom, self._rate_query("request_success_rate", start_time, "off" if self._recorded_pending else recorded_series),
+                start_time, step,
+            ),
+            "error_rate": IncrementalRangeQuery(
+                _prom, self._rate_query("request_error_rate", start_time, "off" if self._recorded_pending else recorded_series),
+                start_time, step,
+            ),
+            "current_replicas": IncrementalRangeQuery(_prom, f"sum(wva_current_replicas{replica_sel})", start_time, step),
+            "desired_replicas": IncrementalRangeQuery(_prom, f"sum(wva_desired_replicas{replica_sel})", start_time, step),
+        }
+
+        self.total = HistogramAccumulator()
+        self._window: Deque[np.ndarray] = deque()
+        self._window_counts: Optional[np.ndarray] = None
+        self._upper_bounds: Optional[np.ndarray] = None
+        self._last_counters: Optional[pd.Series] = None
+        self.latency = pd.DataFrame(columns=["timestamp", *self._quantile_cols()])
+        self.timeline = pd.DataFrame(columns=["timestamp", *self._series, "error_pct"])
+        self._guidellm_mtimes: Dict[Path, float] = {}
+        self._guidellm: Dict[Path, pd.DataFrame] = {}
+        self.client = pd.DataFrame(columns=["timestamp", "requests", "rps", "error_pct", *self._quantile_cols()])
+        self._figure: Optional[go.Figure] = None
+
+    def _quantile_cols(self) -> List[str]:
+        return [f"P{format(q * 100, 'g')}" for q in self.quantiles]
+
+    def _rate_query(self, rule_key: str, end_time: datetime, recorded_series: str) -> str:
+        return aggregated_query(self._prom, rule_key, self._selector, self._start_time, end_time, recorded_series=recorded_series)
+
+    def _resolve_recorded_series(self, now: Optional[datetime]) -> None:
+        """Settle ``recorded_series="auto"`` once its probe window is in the past.
+
+        ``aggregated_query`` only picks the recorded series when they have
+        samples at both ends of the window, so probing a window reaching
+        into the future would always fall back to the raw expression.
+        """
+        total_rate = self._series["total_rate"]
+        probe_end = (now or datetime.now()) - timedelta(seconds=total_rate.delay_s)
+        if probe_end < self._start_time + timedelta(minutes=5):
+            return
+        total_rate.query = self._rate_query("request_success_rate", probe_end, "auto")
+        self._series["error_rate"].query = self._rate_query("request_error_rate", probe_end, "auto")
+        self._recorded_pending = False
+
+    # -- incremental updates ------------------------------------------------
+
+    def _counter_steps(self, result: list) -> Iterator[Tuple[pd.Timestamp, np.ndarray, np.ndarray]]:
+        """Per-step increases of the bucket counters, summed over pods.
+
+        The last counter values are carried across polls, so the first step
+        of a poll is differenced against the previous poll; counter resets
+        restart from the new value as in ``increase()``.
+        """
+        frame = matrix_to_frame(result)
+        if frame.empty:
+            return
+        series_labels = [c for c in frame.columns if c not in ("timestamp", "value")]
+        wide = frame.pivot_table(index="timestamp", columns=series_labels, values="value", aggfunc="last")
+        if self._last_counters is not None:
+            wide = pd.concat([self._last_counters.to_frame().T.reindex(columns=wide.columns), wide])
+        wide = wide.ffill()
+        deltas = wide.diff()
+        deltas = deltas.where(deltas >= 0, wide).iloc[1:]
+        self._last_counters = wide.iloc[-1].combine_first(self._last_counters) if self._last_counters is not None else wide.iloc[-1]
+
+        per_le = deltas.T.groupby(level="le").sum(min_count=1).T
+        uppers = np.asarray([parse_le(le) for le in per_le.columns])
+        order = np.argsort(uppers)
+        for timestamp, row in zip(per_le.index, per_le.to_numpy()[:, order]):
+            yield timestamp, uppers[order], row
+
+    def _add_histogram_step(self, timestamp: pd.Timestamp, uppers: np.ndarray, cum: np.ndarray) -> Optional[dict]:
+        self.total.add_step(timestamp.timestamp(), uppers, cum)
+        if self._upper_bounds is None:
+            self._upper_bounds = np.asarray(uppers, dtype=float)
+            self._window_counts = np.zeros(len(uppers))
+        deltas = np.diff(np.maximum.accumulate(np.nan_to_num(np.asarray(cum, dtype=float))), prepend=0.0)
+        self._window.append(deltas)
+        self._window_counts += deltas
+        if len(self._window) > self.window_steps:
+            self._window_counts -= self._window.popleft()
+        dist = HistogramDistribution(self._upper_bounds, self._window_counts)
+        if dist.total <= 0:
+            return None
+        values = [self.values_scale_func(v) for v in dist.quantile(list(self.quantiles))]
+        return {"timestamp": timestamp, **dict(zip(self._quantile_cols(), values))}
+
+    def poll(self, now: Optional[datetime] = None) -> Dict[str, pd.DataFrame]:
+        """Fetch and fold in everything new; returns only the new rows.
+
+        ``"requests"`` holds the GuideLLM requests of new or changed files
+        and ``"client"`` the recomputed :attr:`client` statistics (empty
+        when no file changed).
+        """
+        if self._recorded_pending:
+            self._resolve_recorded_series(now)
+        latency_rows = [
+            row for row in (self._add_histogram_step(ts, uppers, cum) for ts, uppers, cum in self._counter_steps(self._histogram.poll(now)))
+            if row is not None
+        ]
+        new_latency = pd.DataFrame(latency_rows, columns=self.latency.columns)
+
+        new_timeline = None
+        for name, query in self._series.items():
+            frame = total_over_series(matrix_to_frame(query.poll(now))).rename(columns={"value": name})
+            new_timeline = frame if new_timeline is None else new_timeline.merge(frame, on="timestamp", how="outer")
+        new_timeline = new_timeline.reindex(columns=self.timeline.columns).astype({name: float for name in self._series})
+        total = new_timeline["total_rate"].where(new_timeline["total_rate"] > 0)
+        new_timeline["error_pct"] = (new_timeline["error_rate"].fillna(0) / total * 100).fillna(0.0)
+
+        self.latency = pd.concat([self.latency, new_latency], ignore_index=True) if not new_latency.empty else self.latency
+        self.timeline = pd.concat([self.timeline, new_timeline], ignore_index=True) if not new_timeline.empty else self.timeline
+        new_requests = self.poll_guidellm()
+        self._extend_figure(new_latency, new_timeline)
+        return {
+            "latency": new_latency,
+            "timeline": new_timeline,
+            "requests": new_requests,
+            "client": self.client if not new_requests.empty else self.client.iloc[:0],
+        }
+
+    def poll_guidellm(self) -> pd.DataFrame:
+        """Load GuideLLM reports that appeared or changed since the last poll.
+
+        When any did, :attr:`client` is recomputed from all requests loaded
+        so far: a rewritten report can change any part of the history, and
+        the cost only depends on the number of requests, not of polls.
+        """
+        if self.guidellm_dir is None or not self.guidellm_dir.exists():
+            return pd.DataFrame()
+        changed = []
+        for path in sorted(self.guidellm_dir.rglob("*.json")):
+            mtime = path.stat().st_mtime
+            if self._guidellm_mtimes.get(path) == mtime:
+                continue
+            try:
+                df = requests_to_dataframe(load_report(path))
+            except (ValueError, OSError):
+                continue  # still being written
+            df["instance"] = path.stem
+            self._guidellm_mtimes[path] = mtime
+            self._guidellm[path] = df
+            changed.append(df)
+        if not changed:
+            return pd.DataFrame()
+        self.client = rolling_request_stats(
+            self.requests(), self.start_ts, self.step_s, self.window_s, self.quantiles, self.values_scale_func,
+        )
+        return pd.concat(changed, ignore_index=True)
+
+    def requests(self) -> pd.DataFrame:
+        """All GuideLLM requests loaded so far."""
+        return pd.concat(self._guidellm.values(), ignore_index=True) if self._guidellm else pd.DataFrame()
+
+    # -- checks -------------------------------------------------------------
+
+    def check(self, max_error_pct: Optional[float] = None, max_latency: Optional[Tuple[str, float]] = None) -> List[str]:
+        """Threshold violations in the latest point, e.g. ``max_latency=("P99", 30_000)``."""
+        problems = []
+        if max_error_pct is not None and not self.timeline.empty:
+            err = self.timeline["error_pct"].iloc[-1]
+            if err > max_error_pct:
+                problems.append(f"error rate {err:.1f}% > {max_error_pct}%")
+        if max_latency is not None and not self.latency.empty:
+            col, limit = max_latency
+            value = self.latency[col].iloc[-1]
+            if value > limit:
+                problems.append(f"rolling {col} {value:.1f} > {limit}")
+        return problems
+
+    def run(
+        self,
+        interval_s: float = 30,
+        duration: Optional[str] = None,
+        max_error_pct: Optional[float] = None,
+        max_latency: Optional[Tuple[str, float]] = None,
+        stop_on_violation: bool = False,
+    ) -> None:
+        """Poll every *interval_s* until *duration* elapses or Ctrl+C / interrupt."""
+        deadline = time.time() + duration_to_seconds(duration) if duration else None
+        try:
+            while deadline is None or time.time() < deadline:
+                self.poll()
+                problems = self.check(max_error_pct, max_latency)
+                for p in problems:
+                    print(f"[{datetime.now():%H:%M:%S}] WARNING: {p}")
+                if problems and stop_on_violation:
+                    return
+                time.sleep(interval_s)
+        except KeyboardInterrupt:
+            pass
+
+    # -- figure -------------------------------------------------------------
+
+    def figure(self, title: str = "Live run", yaxis_title: str = "Latency") -> go.Figure:
+        """Figure updated in place by every :meth:`poll` (a ``FigureWidget`` when available)."""
+        colors = plotly.colors.qualitative.G10
+        fig = make_subplots(
+            rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05,
+            subplot_titles=(f"Rolling latency ({self.window_steps} steps)", "Error rate", "Replicas"),
+        )
+        for i, col in enumerate(self._quantile_cols()):
+            fig.add_trace(go.Scatter(x=self.latency["timestamp"], y=self.latency[col], name=col, line=dict(color=colors[i])), row=1, col=1)
+        fig.add_trace(go.Scatter(x=self.timeline["timestamp"], y=self.timeline["error_pct"], name="error %", line=dict(color=colors[4])), row=2, col=1)
+        for i, name in enumerate(("current_replicas", "desired_replicas")):
+            fig.add_trace(go.Scatter(
+                x=self.timeline["timestamp"], y=self.timeline[name], name=name.replace("_", " "),
+                line=dict(color=colors[5 + i], shape="hv", dash="dot" if i else None),
+            ), row=3, col=1)
+        fig.update_yaxes(title_text=yaxis_title, row=1, col=1)
+        fig.update_yaxes(title_text="%", row=2, col=1)
+        fig.update_yaxes(title_text="replicas", row=3, col=1)
+        fig.update_layout(title=title, template="plotly_white", height=800)
+        try:
+            self._figure = go.FigureWidget(fig)
+        except Exception:
+            # FigureWidget needs ipywidgets; a plain figure still gets updated.
+            self._figure = fig
+        return self._figure
+
+    def _extend_figure(self, new_latency: pd.DataFrame, new_timeline: pd.DataFrame) -> None:
+        if self._figure is None:
+            return
+        columns = [(new_latency, col) for col in self._quantile_cols()] + [
+            (new_timeline, "error_pct"), (new_timeline, "current_replicas"), (new_timeline, "desired_replicas"),
+        ]
+        with self._figure.batch_update():
+            for trace, (frame, col) in zip(self._figure.data, columns):
+                if frame.empty:
+                    continue
+                trace.x = tuple(trace.x if trace.x is not None else ()) + tuple(frame["timestamp"])
+                trace.y = tuple(trace.y if trace.y is not None else ()) + tuple(frame[col])
@@ -26,67 +26,93 @@ import numpy as np
 import pandas as pd
 from prometheus_api_client import PrometheusConnect
 
+from data_source.energy import integrate_power
+from data_source.prometheus_archive import fetch_raw_samples
+from data_source.recording_rules import aggregated_query, histogram_rule
+from transform.bucket_matrix import BucketMatrix
+from transform.histogram import HistogramDistribution
+from transform.matrix import decode_values_raw, matrix_to_frame, select_series, to_local_datetime64, total_over_series, varying_labels
 from transform.sampling import samples_generator_flat
+from utils.utils import duration_to_seconds
 
 
-def quantile_over_time_for_gauge(prom: PrometheusConnect, metric_query, p, start_time, end_time):
-    return float(
-        prom.custom_query_range(
-            """
-            quantile_over_time(
-              {p},
-              ({metric})[30m:]
-            )
-            """.format(p=p, metric=metric_query),
-            start_time=start_time,
-            end_time=end_time,
-            step="1m",
-        )[0]["values"][-1][1]
+def query_range_frame(
+    _prom: PrometheusConnect,
+    query: str,
+    start_time: datetime,
+    end_time: datetime,
+    step: str = "15s",
+    labels: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Run a range query and keep *every* returned series.
+
+    Returns a long-form DataFrame ``(timestamp, <labels...>, value)`` (see
+    ``transform.matrix.matrix_to_frame``), so a single query can serve all
+    variants/accelerators/namespaces and callers filter with
+    ``transform.matrix.select_series``.
+    """
+    result = _prom.custom_query_range(
+        query=query, start_time=start_time, end_time=end_time, step=step,
     )
+    return matrix_to_frame(result, labels=labels)
+
+
+def _single_series_last_value(frame: pd.DataFrame, query: str) -> float:
+    """Last value of a one-series frame; fail loudly instead of picking one series."""
+    if frame.empty:
+        raise ValueError(f"no data for query: {query}")
+    keys = varying_labels(frame)
+    if keys:
+        n = frame.groupby(keys).ngroups
+        raise ValueError(
+            f"query returned {n} series (varying {keys}); aggregate it or use gauge_over_time_by_series(): {query}"
+        )
+    return float(frame["value"].iloc[-1])
 
 
-def avg_over_time_for_gauge(prom: PrometheusConnect, metric_query, start_time, end_time):
-    return float(
-        prom.custom_query_range(
-            """
-            avg_over_time(
-              ({metric})[30m:]
+def gauge_over_time_by_series(
+    prom: PrometheusConnect,
+    func: str,
+    metric_query: str,
+    start_time: datetime,
+    end_time: datetime,
+    p: Optional[float] = None,
+) -> pd.DataFrame:
+    """Evaluate ``<func>_over_time((metric_query)[30m:])`` for every series.
+
+    Returns one row per series with its label columns and the ``value`` at
+    the end of the window.
+    """
+    param = f"{p},\n              " if p is not None else ""
+    query = """
+            {func}_over_time(
+              {param}({metric})[30m:]
             )
-            """.format(metric=metric_query),
-            start_time=start_time,
-            end_time=end_time,
-            step="1m",
-        )[0]["values"][-1][1]
-    )
+            """.format(func=func, param=param, metric=metric_query)
+    frame = query_range_frame(prom, query, start_time, end_time, step="1m")
+    if frame.empty:
+        return frame
+    keys = [c for c in frame.columns if c not in ("timestamp", "value")]
+    return frame.drop_duplicates(subset=keys, keep="last").reset_index(drop=True) if keys else frame.tail(1)
+
+
+def quantile_over_time_for_gauge(prom: PrometheusConnect, metric_query, p, start_time, end_time):
+    frame = gauge_over_time_by_series(prom, "quantile", metric_query, start_time, end_time, p=p)
+    return _single_series_last_value(frame, metric_query)
+
+
+def avg_over_time_for_gauge(prom: PrometheusConnect, metric_query, start_time, end_time):
+    frame = gauge_over_time_by_series(prom, "avg", metric_query, start_time, end_time)
+    return _single_series_last_value(frame, metric_query)
 
 
 def stddev_over_time_for_gauge(prom: PrometheusConnect, metric_query, start_time, end_time):
-    return float(
-        prom.custom_query_range(
-            """
-            stddev_over_time(
-              ({metric})[30m:]
-            )
-            """.format(metric=metric_query),
-            start_time=start_time,
-            end_time=end_time,
-            step="1m",
-        )[0]["values"][-1][1]
-    )
+    frame = gauge_over_time_by_series(prom, "stddev", metric_query, start_time, end_time)
+    return _single_series_last_value(frame, metric_query)
 
 def sum_over_time_for_gauge(prom: PrometheusConnect, metrics_query, start_time, end_time):
-    return float(
-        prom.custom_query_range(
-            """
-                sum_over_time(
-                    ({metric})[30m:]
-                )
-            """.format(metric=metrics_query),
-            start_time=start_time,
-            end_time=end_time,
-            step="1m",
-        )[0]["values"][-1][1]
-    )
+    frame = gauge_over_time_by_series(prom, "sum", metrics_query, start_time, end_time)
+    return _single_series_last_value(frame, metrics_query)
 
 def histogram_quantile_over_time_for(prom: PrometheusConnect, metric, p, start_time, end_time, model_name, namespace):
     """Single-pass histogram quantile over the full [start, end] window.
@@ -133,8 +159,37 @@ def get_histograms_p_tables_by_run(prom, time_ranges, metrics, model_name, names
             rows.append(row)
     return pd.DataFrame(rows, columns=["Run", "Metric", "P10", "P25", "P50", "P75", "P90", "P95", "P99"])
 
-def get_gauge_p_tables_by_run(prom, time_ranges, gauge_metrics) -> pd.DataFrame:
+def power_query_energy_wh(prom: PrometheusConnect, power_query: str, start_time: datetime, end_time: datetime, step: str = "15s", max_gap: str = "2m") -> float:
+    """Energy (Wh) of a power query (W) over the window, trapezoidal per returned series.
+
+    The query is evaluated on the *step* grid, so the integral is over the
+    instant values Prometheus returns at each step (the latest sample within
+    the look-back), not over the raw samples: power changes between steps
+    are missed when *step* is coarser than the scrape interval.  For
+    scrape-resolution energy use ``data_source.energy.energy_by_run``.
+    """
+    result = prom.custom_query_range(query=power_query, start_time=start_time, end_time=end_time, step=step)
+    if not result:
+        return np.nan
+    start_ms, end_ms = round(start_time.timestamp()) * 1000, round(end_time.timestamp()) * 1000
+    max_gap_ms = round(duration_to_seconds(max_gap) * 1000)
+    joules = 0.0
+    for series in result:
+        seconds, watts = decode_values_raw(series.get("values"))
+        joules += integrate_power(np.round(seconds * 1000).astype(np.int64), watts, start_ms, end_ms, max_gap_ms)[0]
+    return joules / 3600.0
+
+
+def get_gauge_p_tables_by_run(prom, time_ranges, gauge_metrics, energy: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Avg/Stddev/percentile rows per run and gauge, plus an Energy row.
+
+    The Energy row comes from *energy* (``data_source.energy.energy_by_run``
+    output) when given; otherwise ``gauge_metrics["Power"]`` is integrated
+    with the trapezoidal rule on a 15s query grid
+    (:func:`power_query_energy_wh`).
+    """
     quantiles = [0.1, 0.25, 0.5, 0.75, 0.90, 0.95, 0.99]
+    energy_wh = dict(zip(energy["Run"], energy["energy_wh"])) if energy is not None else {}
 
     rows = []
     for start_time, end_time, run_name in time_ranges:
@@ -164,18 +219,13 @@ def get_gauge_p_tables_by_run(prom, time_ranges, gauge_metrics) -> pd.DataFrame:
                     row[col] = np.nan
 
             rows.append(row)
-        rows.append({
-            "Run": run_name,
-            "Metric": "Energy",
-            "Sum": sum(
-                map(lambda x: float(x[1]),
-                    prom.custom_query_range(
-                        gauge_metrics["Power"],
-                        start_time=start_time,
-                        end_time=end_time,
-                        step="1m", # With the step fixed to 1m, we can consider values have unit Wmin
-                    )[0]["values"])) / 60 # W * min / 60 [min/h] = Wh
-        })
+        if run_name in energy_wh:
+            run_energy = energy_wh[run_name]
+        elif "Power" in gauge_metrics:
+            run_energy = power_query_energy_wh(prom, gauge_metrics["Power"], start_time, end_time)
+        else:
+            run_energy = np.nan
+        rows.append({"Run": run_name, "Metric": "Energy", "Sum": run_energy})
 
     return pd.DataFrame(
         rows,
@@ -195,28 +245,50 @@ def get_gauge_p_tables_by_run(prom, time_ranges, gauge_metrics) -> pd.DataFrame:
         ],
     )
 
-def get_histogram_quantiles(_prom: PrometheusConnect, start_time, end_time, metric_name, model_name, namespace, values_scale_func, quantiles: List[Tuple[float, str, str]]) -> Union[pd.DataFrame, None]:
+def _apply_scale(values: np.ndarray, values_scale_func) -> np.ndarray:
+    """Apply a per-value scale function, on the whole array when it supports it."""
+    try:
+        out = np.asarray(values_scale_func(values), dtype=float)
+        if out.shape == values.shape:
+            return out
+    except Exception:
+        pass
+    return np.fromiter(map(values_scale_func, values), dtype=float, count=len(values))
+
+
+def get_histogram_quantiles(_prom: PrometheusConnect, start_time, end_time, metric_name, model_name, namespace, values_scale_func, quantiles: List[Tuple[float, str, str]], by: Optional[List[str]] = None, recorded_series: str = "off") -> Union[pd.DataFrame, None]:
+    """Quantile time series of a ``vllm:*`` histogram.
+
+    Returns ``timestamp, P10, ...`` columns.  With *by* (e.g.
+    ``["pod"]``), buckets are aggregated ``by (le, <by...>)`` and the label
+    columns are kept, so one query per quantile covers every series.
+    Recorded bucket rates are used when *recorded_series* allows it (see
+    ``data_source.recording_rules.aggregated_query``) and they keep every
+    *by* label.
+    """
+    by = list(by or [])
+    rule_key = histogram_rule(metric_name)
+    selector = {"model_name": model_name, "namespace": namespace}
+
+    def buckets(interval):
+        if rule_key is None:
+            return f'sum by({", ".join(["le", *by])}) (rate({metric_name}_bucket{{model_name="{model_name}",namespace="{namespace}"}}[{interval}]))'
+        return aggregated_query(_prom, rule_key, selector, start_time, end_time, by=["le", *by], interval=interval,
+                                recorded_series=recorded_series)
+
     queries = {
-        f"P{format(p * 100, 'g')}": (
-            f'histogram_quantile({p}, sum by(le) (rate({metric_name}_bucket{{model_name="{model_name}",namespace="{namespace}"}}[{interval}])))',
-            step_value,
-        )
+        f"P{format(p * 100, 'g')}": (f"histogram_quantile({p}, {buckets(interval)})", step_value)
         for p, interval, step_value in quantiles
     }
+    keys = ["timestamp", *by]
 
     data = {}
     for name, q in queries.items():
         query, query_step = q
-        result = _prom.custom_query_range(
-            query=query,
-            start_time=start_time,
-            end_time=end_time,
-            step=query_step,
-        )
-        if result:
-            timestamps = [datetime.fromtimestamp(float(v[0])) for v in result[0]["values"]]
-            values = [values_scale_func(float(v[1])) for v in result[0]["values"]]
-            data[name] = pd.DataFrame({"timestamp": timestamps, name: values})
+        frame = query_range_frame(_prom, query, start_time, end_time, step=query_step, labels=by)
+        if not frame.empty:
+            frame[name] = _apply_scale(frame.pop("value").to_numpy(), values_scale_func)
+            data[name] = frame
 
     # Merge all dataframes
     df = pd.DataFrame()
@@ -225,13 +297,98 @@ def get_histogram_quantiles(_prom: PrometheusConnect, start_time, end_time, metr
             if df.empty:
                 df = d
             else:
-                df = df.merge(d, on="timestamp", how="outer")
+                df = df.merge(d, on=keys, how="outer")
 
     if df.empty:
-        expected_cols = ["timestamp"] + [f"P{format(p * 100, 'g')}" for p, _, _ in quantiles]
+        expected_cols = keys + [f"P{format(p * 100, 'g')}" for p, _, _ in quantiles]
         return pd.DataFrame(columns=expected_cols)
 
-    return df.sort_values("timestamp").reset_index(drop=True)
+    return df.sort_values([*by, "timestamp"]).reset_index(drop=True)
+
+def get_bucket_matrix(
+    _prom: PrometheusConnect,
+    start_time: datetime,
+    end_time: datetime,
+    metric_name: str,
+    model_name: str,
+    namespace: str,
+    pad: str = "10m",
+) -> BucketMatrix:
+    """Raw ``<metric_name>_bucket`` counters of one run at native resolution.
+
+    *pad* of extra history before *start_time* gives ``rate()`` windows
+    up to that length full coverage at the first step.
+    """
+    pad_ms = round(duration_to_seconds(pad) * 1000)
+    selector = f'{metric_name}_bucket{{model_name="{model_name}",namespace="{namespace}"}}'
+    raw = fetch_raw_samples(
+        _prom, selector, round(start_time.timestamp()) * 1000 - pad_ms, round(end_time.timestamp()) * 1000,
+    )
+    return BucketMatrix.from_raw_series(raw)
+
+
+def bucket_matrices_by_run(
+    _prom: PrometheusConnect,
+    time_ranges: List[Tuple[datetime, datetime, str]],
+    metric_name: str,
+    model_name: str,
+    namespace: str,
+    pad: str = "10m",
+) -> Dict[str, BucketMatrix]:
+    """:func:`get_bucket_matrix` for every run, keyed by run label."""
+    return {
+        run_label: get_bucket_matrix(_prom, start_time, end_time, metric_name, model_name, namespace, pad)
+        for start_time, end_time, run_label in time_ranges
+    }
+
+
+def histogram_quantiles_from_buckets(
+    buckets: BucketMatrix,
+    start_time: datetime,
+    end_time: datetime,
+    values_scale_func,
+    quantiles: List[Tuple[float, str, str]],
+    by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Local equivalent of :func:`get_histogram_quantiles` on a :class:`BucketMatrix`.
+
+    Same ``(p, rate_interval, step)`` tuples and output frame, computed
+    without querying Prometheus, so intervals and steps can be changed
+    interactively.
+    """
+    by = list(by or [])
+    keys = ["timestamp", *by]
+    start_ms, end_ms = round(start_time.timestamp()) * 1000, round(end_time.timestamp()) * 1000
+
+    df = pd.DataFrame()
+    for p, interval, step_value in quantiles:
+        name = f"P{format(p * 100, 'g')}"
+        eval_ts, by_group = buckets.histogram_quantile(
+            p, round(duration_to_seconds(interval) * 1000), round(duration_to_seconds(step_value) * 1000),
+            start_ms, end_ms, by,
+        )
+        _, rates = buckets.rate(
+            round(duration_to_seconds(interval) * 1000), round(duration_to_seconds(step_value) * 1000),
+            start_ms, end_ms, by,
+        )
+        timestamps = to_local_datetime64(eval_ts / 1000)
+        frames = []
+        for group, values in by_group.items():
+            present = ~np.isnan(rates[group]).all(axis=1)
+            frame = pd.DataFrame({"timestamp": timestamps[present]})
+            for label in by:
+                frame[label] = dict(group).get(label, "")
+            frame[name] = _apply_scale(values[present], values_scale_func)
+            frames.append(frame)
+        if not frames:
+            continue
+        d = pd.concat(frames, ignore_index=True)
+        df = d if df.empty else df.merge(d, on=keys, how="outer")
+
+    if df.empty:
+        return pd.DataFrame(columns=keys + [f"P{format(p * 100, 'g')}" for p, _, _ in quantiles])
+    return df.sort_values([*by, "timestamp"]).reset_index(drop=True)
+
 
 def get_scaling_events(
     _prom: PrometheusConnect,
@@ -239,33 +396,34 @@ def get_scaling_events(
     end_time: datetime,
     variant_name: str,
     accelerator_type: str = ".*",
+    by: Optional[List[str]] = None,
 ) -> pd.DataFrame:
     """Detect scale-out and scale-in events from ``wva_current_replicas``.
 
     Returns a DataFrame indexed by timestamp with ``scale_out`` and
-    ``scale_in`` columns (NaN where no event occurred).
+    ``scale_in`` columns (NaN where no event occurred).  Every matching
+    series is kept: with *by* (e.g. ``["variant_name"]``) replicas are
+    aggregated ``max by (...)`` and the label columns are added; without it,
+    any label that differs between the returned series is added instead.
     """
     labels = f'variant_name=~"{variant_name}", accelerator_type=~"{accelerator_type}"'
     base = f'wva_current_replicas{{{labels}}}'
+    if by:
+        base = f'max by ({", ".join(by)}) ({base})'
 
     scale_out_query = f'{base} and (delta({base}[30s]) > 0)'
-    scale_out = _prom.custom_query_range(query=scale_out_query, start_time=start_time, end_time=end_time, step="15s")
-    if not scale_out:
-        scale_out = [{"values": []}]
-    scale_out_ts = [datetime.fromtimestamp(float(v[0])) for v in scale_out[0]["values"]]
-    scale_out_vals = [float(v[1]) for v in scale_out[0]["values"]]
-
+    scale_out = query_range_frame(_prom, scale_out_query, start_time, end_time, step="15s")
     scale_in_query = f'{base} and (delta({base}[30s]) < 0)'
-    scale_in = _prom.custom_query_range(query=scale_in_query, start_time=start_time, end_time=end_time, step="15s")
-    if not scale_in:
-        scale_in = [{"values": []}]
-    scale_in_ts = [datetime.fromtimestamp(float(v[0])) for v in scale_in[0]["values"]]
-    scale_in_vals = [float(v[1]) for v in scale_in[0]["values"]]
+    scale_in = query_range_frame(_prom, scale_in_query, start_time, end_time, step="15s")
 
-    series_out = pd.Series(data=scale_out_vals, index=scale_out_ts, name="scale_out", dtype=float) if scale_out_ts else pd.Series(name="scale_out", dtype=float)
-    series_in = pd.Series(data=scale_in_vals, index=scale_in_ts, name="scale_in", dtype=float) if scale_in_ts else pd.Series(name="scale_in", dtype=float)
+    keys = list(by) if by else varying_labels(pd.concat([scale_out, scale_in], ignore_index=True))
+    series_out = scale_out.reindex(columns=["timestamp", *keys, "value"]).rename(columns={"value": "scale_out"})
+    series_in = scale_in.reindex(columns=["timestamp", *keys, "value"]).rename(columns={"value": "scale_in"})
 
-    df = pd.concat([series_out, series_in], axis=1)
+    df = pd.merge(series_out, series_in, on=["timestamp", *keys], how="outer")
+    df["scale_out"] = df["scale_out"].astype(float)
+    df["scale_in"] = df["scale_in"].astype(float)
+    df = df.set_index("timestamp")
     df.index.name = "timestamp"
     df = df.sort_index()
     return df
@@ -284,7 +442,19 @@ def compare_runs_quantiles_for_metric(
         p50_step: str = "1m",
         p50_rate_interval: str = "1m",
         values_scale_func: callable = lambda x: x,
+        replica_contexts: Optional[Dict[str, "RunReplicaContext"]] = None,
+        bucket_matrices: Optional[Dict[str, BucketMatrix]] = None,
+        recorded_series: str = "off",
 ) -> dict:
+    """Candlestick quantiles plus scaling events for every run.
+
+    With *replica_contexts* (see :func:`replica_contexts`) scaling events
+    are derived from the already-fetched replica series instead of two
+    extra queries per run.  With *bucket_matrices* (see
+    :func:`bucket_matrices_by_run`) quantiles are computed locally, so
+    changing the steps or rate intervals does not query Prometheus again.
+    *recorded_series* is passed to :func:`get_histogram_quantiles`.
+    """
     results = {}
     quantiles = [
         (0.10, iqr_rate_interval, iqr_step),
@@ -294,23 +464,32 @@ def compare_runs_quantiles_for_metric(
         (0.90, iqr_rate_interval, iqr_step),
     ]
     for start_time, end_time, run_label in time_ranges:
-        df = get_histogram_quantiles(
-            _prom=_prom,
-            start_time=start_time,
-            end_time=end_time,
-            metric_name=metric_name,
-            model_name=model_name,
-            namespace=namespace,
-            values_scale_func=values_scale_func,
-            quantiles=quantiles,
-        )
-        scaling_events = get_scaling_events(
-            _prom=_prom,
-            start_time=start_time,
-            end_time=end_time,
-            variant_name=variant_name,
-            accelerator_type=accelerator_type,
-        )
+        if bucket_matrices and run_label in bucket_matrices:
+            df = histogram_quantiles_from_buckets(
+                bucket_matrices[run_label], start_time, end_time, values_scale_func, quantiles,
+            )
+        else:
+            df = get_histogram_quantiles(
+                _prom=_prom,
+                start_time=start_time,
+                end_time=end_time,
+                metric_name=metric_name,
+                model_name=model_name,
+                namespace=namespace,
+                values_scale_func=values_scale_func,
+                quantiles=quantiles,
+                recorded_series=recorded_series,
+            )
+        if replica_contexts and run_label in replica_contexts:
+            scaling_events = replica_contexts[run_label].scaling_events()
+        else:
+            scaling_events = get_scaling_events(
+                _prom=_prom,
+                start_time=start_time,
+                end_time=end_time,
+                variant_name=variant_name,
+                accelerator_type=accelerator_type,
+            )
         results[run_label] = (df, scaling_events)
     return results
 
@@ -320,8 +499,20 @@ def custom_query_range_by_run(
         query: str,
         step: str = "15s",
         samples_generator = samples_generator_flat
-) -> pd.DataFrame:
-    df = pd.DataFrame(columns=["run", "value"])
+) -> Union[pd.DataFrame, Dict[str, HistogramDistribution]]:
+    """Run *query* for every run window and collect its samples.
+
+    With a flat samples generator the result is a long-form DataFrame
+    (``run``, ``value``) for ``violin_plot_by_run``.  With a generator
+    that builds a :class:`HistogramDistribution` (marked
+    ``returns_distribution``, e.g. ``samples_generator_histogram_distribution``)
+    the result is a ``{run_label: HistogramDistribution}`` dict instead.
+    The type only depends on the generator: runs whose query fails are
+    left out, so it is an empty frame or an empty dict when all of them do.
+    """
+    as_distributions = getattr(samples_generator, "returns_distribution", False)
+    frames: List[pd.DataFrame] = []
+    distributions: Dict[str, HistogramDistribution] = {}
     for i, run in enumerate(time_ranges, start=1):
         start, end, run_label = run
 
@@ -333,11 +524,57 @@ def custom_query_range_by_run(
             print(f"[{run_label}] query failed: {e}")
             continue
 
-        samples: List[float] = samples_generator(results)
-        if samples:
-            df_run = pd.DataFrame({"run": run_label, "value": samples})
-            df = pd.concat([df, df_run], ignore_index=True)
-    return df
+        samples = samples_generator(results)
+        if isinstance(samples, HistogramDistribution) != as_distributions:
+            raise TypeError(
+                f"{getattr(samples_generator, '__name__', samples_generator)!r} returned "
+                f"{type(samples).__name__}; generators building HistogramDistribution "
+                "must set returns_distribution = True"
+            )
+        if as_distributions:
+            distributions[run_label] = samples
+        elif len(samples):
+            frames.append(pd.DataFrame({"run": run_label, "value": np.asarray(samples, dtype=float)}))
+    if as_distributions:
+        return distributions
+    if not frames:
+        return pd.DataFrame({"run": pd.Series(dtype=str), "value": pd.Series(dtype=float)})
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_run_series(
+    _prom: PrometheusConnect,
+    time_ranges: List[Tuple[datetime, datetime, str]],
+    queries: Dict[str, str],
+    step: str = "15s",
+) -> Dict[str, pd.DataFrame]:
+    """Range-query every ``{name: promql}`` over every run window.
+
+    Returns ``{name: frame}`` of long-form frames with a ``run`` column in
+    front, ready for ``transform.align.join_series_asof``::
+
+        series = get_run_series(prom, time_ranges, {
+            "replicas": f'wva_current_replicas{{variant_name="{variant}"}}',
+            "kv_cache": f'vllm:kv_cache_usage_perc{{namespace="{ns}"}}',
+            "waiting": f'sum(vllm:num_requests_waiting{{namespace="{ns}"}})',
+        })
+    """
+    out: Dict[str, pd.DataFrame] = {}
+    for name, query in queries.items():
+        frames = []
+        for start, end, run_label in time_ranges:
+            try:
+                frame = query_range_frame(_prom, query, start, end, step)
+            except Exception as e:
+                print(f"[{run_label}] {name} query failed: {e}")
+                continue
+            if not frame.empty:
+                frame.insert(0, "run", run_label)
+                frames.append(frame)
+        out[name] = (
+            pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["run", "timestamp", "value"])
+        )
+    return out
 
 
 # ---------------------------------------------------------------------------
@@ -350,16 +587,16 @@ def _query_range_ts(
     start_time: datetime,
     end_time: datetime,
     step: str = "15s",
+    match: Optional[Dict[str, str]] = None,
 ) -> pd.DataFrame:
-    """Run a range query and return a two-column DataFrame (timestamp, value)."""
-    result = _prom.custom_query_range(
-        query=query, start_time=start_time, end_time=end_time, step=step,
-    )
-    if not result:
-        return pd.DataFrame(columns=["timestamp", "value"])
-    ts = [datetime.fromtimestamp(float(v[0])) for v in result[0]["values"]]
-    vals = [float(v[1]) for v in result[0]["values"]]
-    return pd.DataFrame({"timestamp": ts, "value": vals})
+    """Run a range query and return a two-column DataFrame (timestamp, value).
+
+    *match* filters the returned series by exact label values.  If several
+    series remain, the labels that tell them apart are kept as extra
+    columns (nothing is silently dropped).
+    """
+    frame = query_range_frame(_prom, query, start_time, end_time, step)
+    return select_series(frame, **(match or {}))
 
 
 def get_replica_time_series(
@@ -370,11 +607,141 @@ def get_replica_time_series(
     namespace: str,
     step: str = "15s",
 ) -> pd.DataFrame:
-    """Return the raw ``wva_current_replicas`` time series as (timestamp, replicas)."""
+    """Return the raw ``wva_current_replicas`` time series as (timestamp, replicas).
+
+    When the selector matches several series (e.g. one per accelerator),
+    the distinguishing label columns are included.
+    """
     query = f'wva_current_replicas{{variant_name=~"{variant_name}", exported_namespace=~"{namespace}"}}'
     return _query_range_ts(_prom, query, start_time, end_time, step)
 
 
+def get_step_replicas(
+    _prom: PrometheusConnect,
+    steps: pd.DataFrame,
+    variant_name: str,
+    namespace: str,
+    step: str = "15s",
+) -> pd.DataFrame:
+    """Join load steps with the replica counts observed during each of them.
+
+    *steps* is ``guidellm.infer_load_steps`` (or ``compute_step_summary``)
+    output.  One replica query is issued per run, over the span of its
+    steps; series of several accelerators are summed.
+
+    Returns *steps* plus ``replicas_min``, ``replicas_mean``,
+    ``replicas_max`` and ``replicas_end`` (count at the end of the step).
+    """
+    out = steps.copy()
+    for col in ("replicas_min", "replicas_mean", "replicas_max", "replicas_end"):
+        out[col] = np.nan
+    for run_label, run_steps in steps.groupby("run", sort=False):
+        start_time = pd.Timestamp(run_steps["start"].min()).to_pydatetime()
+        end_time = pd.Timestamp(run_steps["end"].max()).to_pydatetime()
+        replicas = total_over_series(get_replica_time_series(_prom, start_time, end_time, variant_name, namespace, step))
+        if replicas.empty:
+            continue
+        ts = replicas["timestamp"].to_numpy(dtype="datetime64[ns]")
+        values = replicas["value"].to_numpy(dtype=float)
+        for idx, row in run_steps.iterrows():
+            inside = (ts >= np.datetime64(row["start"])) & (ts < np.datetime64(row["end"]))
+            if not inside.any():
+                continue
+            v = values[inside]
+            out.loc[idx, ["replicas_min", "replicas_mean", "replicas_max", "replicas_end"]] = [
+                np.nanmin(v), np.nanmean(v), np.nanmax(v), v[-1],
+            ]
+    return out
+
+
+def gap_windows_from_frame(
+    merged: pd.DataFrame,
+    by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Vectorized detection of ``value_desired > value_current`` windows.
+
+    *merged* holds ``timestamp``, ``value_desired`` and ``value_current``
+    (plus the *by* label columns when several variants are present).  The
+    boolean gap mask is run-length encoded with NumPy: a window opens on a
+    False→True transition and closes on the next True→False transition of
+    the same group.  Windows still open at the end of a group get
+    ``ready_time=NaT`` and ``duration_seconds=NaN``.
+
+    Returns one row per window with columns
+    ``[*by, trigger_time, ready_time, duration_seconds]``.
+    """
+    by = list(by or [])
+    cols = [*by, "trigger_time", "ready_time", "duration_seconds"]
+    if merged.empty:
+        return pd.DataFrame(columns=cols)
+
+    df = merged.sort_values([*by, "timestamp"], kind="stable").reset_index(drop=True)
+    if by:
+        group = df.groupby(by, sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        group = np.zeros(len(df), dtype=np.int64)
+    gap = (df["value_desired"] > df["value_current"]).to_numpy()
+
+    first_of_group = np.ones(len(df), dtype=bool)
+    first_of_group[1:] = group[1:] != group[:-1]
+    prev_gap = np.zeros(len(df), dtype=bool)
+    prev_gap[1:] = gap[:-1]
+    prev_gap &= ~first_of_group
+
+    opens = np.flatnonzero(gap & ~prev_gap)
+    closes = np.flatnonzero(~gap & prev_gap)
+    if not opens.size:
+        return pd.DataFrame(columns=cols)
+
+    # The first close after an open is its matching close when it belongs
+    # to the same group; otherwise the window is still open at group end.
+    pos = np.searchsorted(closes, opens, side="right")
+    has_close = pos < closes.size
+    close_idx = closes[np.minimum(pos, closes.size - 1)] if closes.size else np.zeros_like(opens)
+    has_close &= group[close_idx] == group[opens]
+
+    ts = df["timestamp"].to_numpy()
+    trigger = ts[opens]
+    ready = np.where(has_close, ts[close_idx], np.datetime64("NaT"))
+    out = df.loc[opens, by].reset_index(drop=True) if by else pd.DataFrame(index=range(opens.size))
+    out["trigger_time"] = pd.to_datetime(trigger)
+    out["ready_time"] = pd.to_datetime(ready)
+    out["duration_seconds"] = (out["ready_time"] - out["trigger_time"]).dt.total_seconds()
+    return out[cols]
+
+
+def _gap_window_series(
+    _prom: PrometheusConnect,
+    start_time: datetime,
+    end_time: datetime,
+    variant_name: str,
+    namespace: str,
+    step: str = "15s",
+    by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Desired and current replicas aligned per timestamp (and *by* labels)."""
+    selector = f'{{variant_name=~"{variant_name}", exported_namespace=~"{namespace}"}}'
+    if by:
+        grouping = ", ".join(by)
+        desired_q = f"max by ({grouping}) (wva_desired_replicas{selector})"
+        current_q = f"max by ({grouping}) (wva_current_replicas{selector})"
+        desired = query_range_frame(_prom, desired_q, start_time, end_time, step, labels=by)
+        current = query_range_frame(_prom, current_q, start_time, end_time, step, labels=by)
+    else:
+        desired = total_over_series(query_range_frame(_prom, f"wva_desired_replicas{selector}", start_time, end_time, step))
+        current = total_over_series(query_range_frame(_prom, f"wva_current_replicas{selector}", start_time, end_time, step))
+
+    if desired.empty or current.empty:
+        return pd.DataFrame(columns=["timestamp", *(by or []), "value_desired", "value_current"])
+    return pd.merge_asof(
+        desired.sort_values("timestamp"),
+        current.sort_values("timestamp"),
+        on="timestamp",
+        by=by or None,
+        suffixes=("_desired", "_current"),
+    )
+
+
 def get_gap_window_durations(
     _prom: PrometheusConnect,
     start_time: datetime,
@@ -382,57 +749,213 @@ def get_gap_window_durations(
     variant_name: str,
     namespace: str,
     step: str = "15s",
+    by: Optional[List[str]] = None,
 ) -> pd.DataFrame:
     """Measure gap-window durations (time from scale-up trigger to ready).
 
     Detects windows where ``wva_desired_replicas > wva_current_replicas``
     and returns each window as a row with columns:
     ``trigger_time``, ``ready_time``, ``duration_seconds``.
+
+    Pass *by* (e.g. ``["variant_name", "accelerator_type"]``) to detect the
+    windows of every matching variant from a single pair of queries; the
+    label columns are then prepended to the output.
     """
-    desired_q = f'wva_desired_replicas{{variant_name=~"{variant_name}", exported_namespace=~"{namespace}"}}'
-    current_q = f'wva_current_replicas{{variant_name=~"{variant_name}", exported_namespace=~"{namespace}"}}'
+    merged = _gap_window_series(_prom, start_time, end_time, variant_name, namespace, step, by)
+    return gap_windows_from_frame(merged, by=by)
 
-    desired = _query_range_ts(_prom, desired_q, start_time, end_time, step)
-    current = _query_range_ts(_prom, current_q, start_time, end_time, step)
 
-    if desired.empty or current.empty:
-        return pd.DataFrame(columns=["trigger_time", "ready_time", "duration_seconds"])
+# ---------------------------------------------------------------------------
+# Replica analytics computed locally from one series fetch per run
+# ---------------------------------------------------------------------------
 
-    merged = pd.merge_asof(
-        desired.sort_values("timestamp"),
-        current.sort_values("timestamp"),
-        on="timestamp",
-        suffixes=("_desired", "_current"),
-    )
+def scaling_events_from_series(
+    replicas: pd.DataFrame,
+    step: str = "15s",
+    lookback: str = "30s",
+) -> pd.DataFrame:
+    """Local equivalent of ``x and (delta(x[lookback]) > 0)`` / ``< 0``.
+
+    *replicas* is a ``(timestamp, value)`` frame, nominally sampled every
+    *step* (informational only).  Like PromQL, each sample is compared
+    over the time range ``(t - lookback, t]`` rather than a fixed number of
+    rows back, so missing samples do not shift the events.  ``delta()`` is
+    the last minus the first sample of the range, extrapolated to the
+    range edges; the extrapolation factor is positive, so only the sign of
+    the raw difference matters here.  Ranges holding fewer than two
+    samples yield no result, as in PromQL.  Output matches
+    :func:`get_scaling_events`.
+    """
+    if replicas.empty:
+        df = pd.DataFrame(columns=["scale_out", "scale_in"], dtype=float)
+        df.index.name = "timestamp"
+        return df
+    series = replicas.sort_values("timestamp").set_index("timestamp")["value"].astype(float)
+    t = series.index.to_numpy("datetime64[ns]").astype("int64")
+    v = series.to_numpy()
+    window = int(duration_to_seconds(lookback) * 1e9)
+    first = np.searchsorted(t, t - window, side="right")
+    has_range = first < np.arange(len(t))
+    delta = np.where(has_range, v - v[np.minimum(first, len(v) - 1)], np.nan)
+    df = pd.DataFrame({
+        "scale_out": series.where(delta > 0),
+        "scale_in": series.where(delta < 0),
+    })
+    df = df.dropna(how="all")
+    df.index.name = "timestamp"
+    return df
 
-    merged["gap"] = merged["value_desired"] > merged["value_current"]
-
-    windows: List[Dict] = []
-    trigger_ts: Optional[datetime] = None
-
-    for _, row in merged.iterrows():
-        if row["gap"] and trigger_ts is None:
-            trigger_ts = row["timestamp"]
-        elif not row["gap"] and trigger_ts is not None:
-            ready_ts = row["timestamp"]
-            dur = (ready_ts - trigger_ts).total_seconds()
-            windows.append({
-                "trigger_time": trigger_ts,
-                "ready_time": ready_ts,
-                "duration_seconds": dur,
-            })
-            trigger_ts = None
-
-    if trigger_ts is not None:
-        windows.append({
-            "trigger_time": trigger_ts,
-            "ready_time": pd.NaT,
-            "duration_seconds": np.nan,
-        })
 
-    if not windows:
-        return pd.DataFrame(columns=["trigger_time", "ready_time", "duration_seconds"])
-    return pd.DataFrame(windows)
+def replica_seconds_from_series(
+    replicas: pd.DataFrame,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> float:
+    """Trapezoidal integral of a ``(timestamp, value)`` replica series.
+
+    With *start_time*/*end_time* the first and last samples are held out
+    to the window edges, so the result covers the whole window even when
+    the series starts late or ends early.
+    """
+    if replicas.empty:
+        return np.nan
+    cur = replicas.sort_values("timestamp")
+    t = cur["timestamp"].to_numpy("datetime64[ns]").astype("int64") / 1e9
+    v = cur["value"].to_numpy(dtype=float)
+    if start_time is not None and pd.Timestamp(start_time).value / 1e9 < t[0]:
+        t, v = np.concatenate([[pd.Timestamp(start_time).value / 1e9], t]), np.concatenate([[v[0]], v])
+    if end_time is not None and pd.Timestamp(end_time).value / 1e9 > t[-1]:
+        t, v = np.concatenate([t, [pd.Timestamp(end_time).value / 1e9]]), np.concatenate([v, [v[-1]]])
+    if len(t) < 2:
+        return np.nan
+    return float(np.sum((v[1:] + v[:-1]) / 2 * np.diff(t)))
+
+
+class RunReplicaContext:
+    """Replica series of one run, fetched once and shared by every helper.
+
+    ``wva_current_replicas`` and ``wva_desired_replicas`` are each queried
+    a single time (lazily, on first use) and every replica-derived metric --
+    scaling events, gap windows, replica-time integral, average/peak
+    replicas -- is computed locally from them.  Pass the contexts returned
+    by :func:`replica_contexts` to ``compare_runs_quantiles_for_metric``,
+    ``get_cost_efficiency_table``, ``get_gap_window_table`` and
+    ``compute_gating_verdicts`` to avoid re-querying the same series.
+    """
+
+    def __init__(
+        self,
+        _prom: PrometheusConnect,
+        start_time: datetime,
+        end_time: datetime,
+        variant_name: str,
+        namespace: str,
+        accelerator_type: str = ".*",
+        step: str = "15s",
+        run_label: str = "",
+    ):
+        self._prom = _prom
+        self.start_time = start_time
+        self.end_time = end_time
+        self.variant_name = variant_name
+        self.namespace = namespace
+        self.accelerator_type = accelerator_type
+        self.step = step
+        self.run_label = run_label
+        self._current: Optional[pd.DataFrame] = None
+        self._desired: Optional[pd.DataFrame] = None
+
+    def _selector(self) -> str:
+        return (
+            f'{{variant_name=~"{self.variant_name}", exported_namespace=~"{self.namespace}", '
+            f'accelerator_type=~"{self.accelerator_type}"}}'
+        )
+
+    def _fetch(self, metric: str) -> pd.DataFrame:
+        frame = query_range_frame(
+            self._prom, f"{metric}{self._selector()}", self.start_time, self.end_time, self.step,
+        )
+        return total_over_series(frame)
+
+    def _planning(self) -> bool:
+        # A data_source.query_session.PromQuerySession in planning mode only
+        # records queries and returns empty results: do not cache those.
+        return bool(getattr(self._prom, "planning", False))
+
+    @property
+    def current(self) -> pd.DataFrame:
+        """Total ``wva_current_replicas`` as (timestamp, value)."""
+        if self._current is None:
+            if self._planning():
+                return self._fetch("wva_current_replicas")
+            self._current = self._fetch("wva_current_replicas")
+        return self._current
+
+    @property
+    def desired(self) -> pd.DataFrame:
+        """Total ``wva_desired_replicas`` as (timestamp, value)."""
+        if self._desired is None:
+            if self._planning():
+                return self._fetch("wva_desired_replicas")
+            self._desired = self._fetch("wva_desired_replicas")
+        return self._desired
+
+    def scaling_events(self, lookback: str = "30s") -> pd.DataFrame:
+        return scaling_events_from_series(self.current, step=self.step, lookback=lookback)
+
+    def gap_windows(self) -> pd.DataFrame:
+        if self.desired.empty or self.current.empty:
+            return pd.DataFrame(columns=["trigger_time", "ready_time", "duration_seconds"])
+        merged = pd.merge_asof(
+            self.desired.sort_values("timestamp"),
+            self.current.sort_values("timestamp"),
+            on="timestamp",
+            suffixes=("_desired", "_current"),
+        )
+        return gap_windows_from_frame(merged)
+
+    def replica_seconds(self) -> float:
+        """Trapezoidal integral of the replica count over the run window."""
+        return replica_seconds_from_series(self.current, self.start_time, self.end_time)
+
+    def avg_replicas(self) -> float:
+        return float(self.current["value"].mean()) if not self.current.empty else np.nan
+
+    def peak_replicas(self) -> float:
+        return float(self.current["value"].max()) if not self.current.empty else np.nan
+
+    def summary(self) -> Dict[str, float]:
+        windows = self.gap_windows()
+        dur = windows["duration_seconds"].dropna()
+        events = self.scaling_events()
+        return {
+            "avg_replicas": self.avg_replicas(),
+            "peak_replicas": self.peak_replicas(),
+            "replica_hours": self.replica_seconds() / 3600,
+            "scale_out_steps": int(events["scale_out"].notna().sum()),
+            "scale_in_steps": int(events["scale_in"].notna().sum()),
+            "scale_up_events": len(windows),
+            "total_gap_seconds": float(dur.sum()) if not dur.empty else np.nan,
+        }
+
+
+def replica_contexts(
+    _prom: PrometheusConnect,
+    time_ranges: List[Tuple[datetime, datetime, str]],
+    variant_name: str,
+    namespace: str,
+    accelerator_type: str = ".*",
+    step: str = "15s",
+) -> Dict[str, RunReplicaContext]:
+    """Build one :class:`RunReplicaContext` per run, keyed by run label."""
+    return {
+        run_label: RunReplicaContext(
+            _prom, start_time, end_time,
+            variant_name=variant_name, namespace=namespace,
+            accelerator_type=accelerator_type, step=step, run_label=run_label,
+        )
+        for start_time, end_time, run_label in time_ranges
+    }
 
 
 def get_request_error_rate(
@@ -442,6 +965,7 @@ def get_request_error_rate(
     model_name: str,
     namespace: str,
     step: str = "1m",
+    recorded_series: str = "off",
 ) -> pd.DataFrame:
     """Return the fraction of non-successful requests over time.
 
@@ -450,12 +974,15 @@ def get_request_error_rate(
     valid completions.  Only ``abort`` (and any other non-standard reasons)
     are counted as errors.
 
+    *recorded_series* selects the recorded rates (see
+    ``data_source.recording_rules.aggregated_query``).
+
     Returns DataFrame with columns: timestamp, total_rate, error_rate, error_pct.
     """
-    labels = f'model_name="{model_name}", namespace="{namespace}"'
+    selector = {"model_name": model_name, "namespace": namespace}
 
-    total_q = f'sum(rate(vllm:request_success_total{{{labels}}}[1m]))'
-    error_q = f'sum(rate(vllm:request_success_total{{{labels}, finished_reason!~"stop|length"}}[1m]))'
+    total_q = aggregated_query(_prom, "request_success_rate", selector, start_time, end_time, recorded_series=recorded_series)
+    error_q = aggregated_query(_prom, "request_error_rate", selector, start_time, end_time, recorded_series=recorded_series)
 
     total_df = _query_range_ts(_prom, total_q, start_time, end_time, step)
     error_df = _query_range_ts(_prom, error_q, start_time, end_time, step)
@@ -489,11 +1016,12 @@ def get_tokens_per_second(
     model_name: str,
     namespace: str,
     step: str = "1m",
+    recorded_series: str = "off",
 ) -> pd.DataFrame:
     """Return generated tokens/sec over time."""
-    query = (
-        f'sum(rate(vllm:generation_tokens_total'
-        f'{{model_name="{model_name}", namespace="{namespace}"}}[1m]))'
+    query = aggregated_query(
+        _prom, "generation_tokens_rate", {"model_name": model_name, "namespace": namespace}, start_time, end_time,
+        recorded_series=recorded_series,
     )
     return _query_range_ts(_prom, query, start_time, end_time, step)
 
@@ -505,13 +1033,17 @@ def get_idle_gpu_time_pct(
     model_name: str,
     namespace: str,
     step: str = "15s",
+    recorded_series: str = "off",
 ) -> float:
     """Fraction of time samples where all replicas have zero running requests.
 
     Returns a value in [0, 1].  A value of 0.3 means 30 % of the time window
     had GPUs sitting completely idle while pods were Ready.
     """
-    query = f'sum(vllm:num_requests_running{{model_name="{model_name}", namespace="{namespace}"}})'
+    query = aggregated_query(
+        _prom, "requests_running", {"model_name": model_name, "namespace": namespace}, start_time, end_time,
+        recorded_series=recorded_series,
+    )
     df = _query_range_ts(_prom, query, start_time, end_time, step)
     if df.empty:
         return np.nan
@@ -526,12 +1058,18 @@ def get_cost_efficiency_metrics(
     namespace: str,
     variant_name: str,
     gpus_per_replica: int = 1,
+    replicas: Optional[RunReplicaContext] = None,
+    recorded_series: str = "off",
 ) -> Dict[str, float]:
     """Compute cost-efficiency metrics for a single run.
 
+    *replicas* reuses an already-fetched replica series for this run;
+    *recorded_series* applies to the idle-time and tokens/s queries.
+
     Returns a dict with:
       - ``total_requests``: successful requests in the window
-      - ``gpu_hours``: integral of replica count (area under the curve)
+      - ``gpu_hours``: trapezoidal integral of the replica count over the
+        window (see :func:`replica_seconds_from_series`) times *gpus_per_replica*
       - ``requests_per_gpu_hour``
       - ``replica_minutes_per_1k_requests``
       - ``avg_replicas``: mean replica count
@@ -541,34 +1079,35 @@ def get_cost_efficiency_metrics(
       - ``tokens_per_sec_avg``: mean generated tokens/s
     """
     duration_seconds = (end_time - start_time).total_seconds()
-    duration_minutes = duration_seconds / 60
-    duration_hours = duration_seconds / 3600
 
     # Total successful requests
     labels = f'model_name="{model_name}", namespace="{namespace}"'
     total_req_q = f'sum(increase(vllm:request_success_total{{{labels}}}[{int(duration_seconds)}s]))'
     try:
-        result = _prom.custom_query_range(
-            query=total_req_q, start_time=end_time - timedelta(seconds=30),
+        result = total_over_series(query_range_frame(
+            _prom, total_req_q, start_time=end_time - timedelta(seconds=30),
             end_time=end_time, step="30s",
-        )
-        total_requests = float(result[0]["values"][-1][1]) if result else 0.0
+        ))
+        total_requests = float(result["value"].iloc[-1]) if not result.empty else 0.0
     except Exception:
         total_requests = 0.0
 
     # Replica count time series for GPU-hours
-    replica_ts = get_replica_time_series(
-        _prom, start_time, end_time,
-        variant_name=variant_name, namespace=namespace, step="15s",
-    )
+    if replicas is not None:
+        replica_ts = replicas.current
+    else:
+        replica_ts = total_over_series(get_replica_time_series(
+            _prom, start_time, end_time,
+            variant_name=variant_name, namespace=namespace, step="15s",
+        ))
     if replica_ts.empty:
         avg_replicas = np.nan
         peak_replicas = np.nan
-        gpu_hours = np.nan
     else:
         avg_replicas = float(replica_ts["value"].mean())
         peak_replicas = float(replica_ts["value"].max())
-        gpu_hours = avg_replicas * gpus_per_replica * duration_hours
+    replica_seconds = replica_seconds_from_series(replica_ts, start_time, end_time)
+    gpu_hours = replica_seconds * gpus_per_replica / 3600
 
     avg_peak_ratio = avg_replicas / peak_replicas if peak_replicas and peak_replicas > 0 else np.nan
 
@@ -578,14 +1117,14 @@ def get_cost_efficiency_metrics(
     )
 
     replica_minutes_per_1k = (
-        (avg_replicas * duration_minutes) / (total_requests / 1000)
+        (replica_seconds / 60) / (total_requests / 1000)
         if total_requests > 0 else np.nan
     )
 
-    idle_pct = get_idle_gpu_time_pct(_prom, start_time, end_time, model_name, namespace)
+    idle_pct = get_idle_gpu_time_pct(_prom, start_time, end_time, model_name, namespace, recorded_series=recorded_series)
 
     # Mean tokens/sec
-    tps_df = get_tokens_per_second(_prom, start_time, end_time, model_name, namespace)
+    tps_df = get_tokens_per_second(_prom, start_time, end_time, model_name, namespace, recorded_series=recorded_series)
     tokens_per_sec_avg = float(tps_df["value"].mean()) if not tps_df.empty else np.nan
 
     return {
@@ -608,6 +1147,8 @@ def get_cost_efficiency_table(
     namespace: str,
     variant_name: str,
     gpus_per_replica: int = 1,
+    replica_contexts: Optional[Dict[str, RunReplicaContext]] = None,
+    recorded_series: str = "off",
 ) -> pd.DataFrame:
     """Build a comparison table of cost-efficiency metrics across runs."""
     rows = []
@@ -617,6 +1158,8 @@ def get_cost_efficiency_table(
             model_name=model_name, namespace=namespace,
             variant_name=variant_name,
             gpus_per_replica=gpus_per_replica,
+            replicas=(replica_contexts or {}).get(run_label),
+            recorded_series=recorded_series,
         )
         rows.append({"Run": run_label, **metrics})
     return pd.DataFrame(rows)
@@ -627,26 +1170,49 @@ def get_gap_window_table(
     time_ranges: List[Tuple[datetime, datetime, str]],
     variant_name: str,
     namespace: str,
+    by: Optional[List[str]] = None,
+    replica_contexts: Optional[Dict[str, RunReplicaContext]] = None,
 ) -> pd.DataFrame:
     """Aggregate gap-window statistics per run.
 
     Returns a DataFrame with columns:
     Run, count, mean_seconds, max_seconds, total_seconds.
+    With *by*, one row per run and label combination seen in the replica
+    series is returned, including combinations without any window (0
+    events, like runs without windows in the ungrouped table); a run with
+    no series at all gets a single row with empty labels.
+    Runs present in *replica_contexts* reuse their fetched replica series.
     """
-    rows = []
-    for start_time, end_time, run_label in time_ranges:
-        windows = get_gap_window_durations(
-            _prom, start_time, end_time,
-            variant_name=variant_name, namespace=namespace,
-        )
+    def _stats(windows: pd.DataFrame) -> Dict[str, float]:
         dur = windows["duration_seconds"].dropna()
-        rows.append({
-            "Run": run_label,
+        return {
             "scale_up_events": len(windows),
             "mean_gap_seconds": float(dur.mean()) if not dur.empty else np.nan,
             "max_gap_seconds": float(dur.max()) if not dur.empty else np.nan,
             "total_gap_seconds": float(dur.sum()) if not dur.empty else np.nan,
-        })
+        }
+
+    rows = []
+    for start_time, end_time, run_label in time_ranges:
+        if not by:
+            if replica_contexts and run_label in replica_contexts:
+                windows = replica_contexts[run_label].gap_windows()
+            else:
+                windows = get_gap_window_durations(
+                    _prom, start_time, end_time,
+                    variant_name=variant_name, namespace=namespace,
+                )
+            rows.append({"Run": run_label, **_stats(windows)})
+            continue
+        merged = _gap_window_series(_prom, start_time, end_time, variant_name, namespace, by=by)
+        windows = gap_windows_from_frame(merged, by=by)
+        groups = merged[by].drop_duplicates().sort_values(by)
+        if groups.empty:
+            rows.append({"Run": run_label, **{label: "" for label in by}, **_stats(windows)})
+            continue
+        for key in groups.itertuples(index=False, name=None):
+            mask = (windows[by] == pd.Series(key, index=by)).all(axis=1)
+            rows.append({"Run": run_label, **dict(zip(by, key)), **_stats(windows[mask])})
     return pd.DataFrame(rows)
 
 
@@ -655,12 +1221,13 @@ def get_error_rate_summary(
     time_ranges: List[Tuple[datetime, datetime, str]],
     model_name: str,
     namespace: str,
+    recorded_series: str = "off",
 ) -> pd.DataFrame:
     """Summarize request error rates per run."""
     rows = []
     for start_time, end_time, run_label in time_ranges:
         err_df = get_request_error_rate(
-            _prom, start_time, end_time, model_name, namespace,
+            _prom, start_time, end_time, model_name, namespace, recorded_series=recorded_series,
         )
         if err_df.empty:
             rows.append({"Run": run_label, "avg_error_pct": np.nan, "max_error_pct": np.nan, "total_error_rate": np.nan})
@@ -688,6 +1255,8 @@ def compute_gating_verdicts(
     model_name: str,
     namespace: str,
     variant_name: str,
+    replica_contexts: Optional[Dict[str, RunReplicaContext]] = None,
+    recorded_series: str = "off",
 ) -> pd.DataFrame:
     """Automated pass/fail for gating metrics.
 
@@ -698,6 +1267,8 @@ def compute_gating_verdicts(
       - error rate: must not exceed baseline
       - gap window: measured (no cross-release comparison available here)
       - requests per GPU-hour: regression > 15 % flagged (tracked, not gating)
+
+    *recorded_series* applies to the error-rate and cost-efficiency queries.
     """
     ranges = [wva_range, baseline_range]
     wva_label = wva_range[2]
@@ -734,18 +1305,21 @@ def compute_gating_verdicts(
         bl_e2e_p99 = np.nan
 
     # Error rate
-    err_summary = get_error_rate_summary(_prom, ranges, model_name, namespace)
+    err_summary = get_error_rate_summary(_prom, ranges, model_name, namespace, recorded_series=recorded_series)
     wva_err = err_summary.loc[err_summary["Run"] == wva_label, "overall_error_pct"]
     bl_err = err_summary.loc[err_summary["Run"] == baseline_label, "overall_error_pct"]
     wva_err_val = float(wva_err.iloc[0]) if not wva_err.empty else np.nan
     bl_err_val = float(bl_err.iloc[0]) if not bl_err.empty else np.nan
 
     # Gap window
-    gap_tbl = get_gap_window_table(_prom, [wva_range], variant_name, namespace)
+    gap_tbl = get_gap_window_table(_prom, [wva_range], variant_name, namespace, replica_contexts=replica_contexts)
     total_gap = float(gap_tbl["total_gap_seconds"].iloc[0]) if not gap_tbl.empty else np.nan
 
     # Requests per GPU-hour
-    eff_tbl = get_cost_efficiency_table(_prom, ranges, model_name, namespace, variant_name)
+    eff_tbl = get_cost_efficiency_table(
+        _prom, ranges, model_name, namespace, variant_name,
+        replica_contexts=replica_contexts, recorded_series=recorded_series,
+    )
     wva_rpgh = eff_tbl.loc[eff_tbl["Run"] == wva_label, "requests_per_gpu_hour"]
     bl_rpgh = eff_tbl.loc[eff_tbl["Run"] == baseline_label, "requests_per_gpu_hour"]
     wva_rpgh_val = float(wva_rpgh.iloc[0]) if not wva_rpgh.empty else np.nan
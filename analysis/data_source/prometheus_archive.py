@@ -0,0 +1,291 @@
+"""
+Offline Prometheus archive for repeatable, network-free re-analysis.
+
+:func:`export_archive` pulls the raw samples (native scrape resolution, no
+aggregation) of every series the analysis needs over the benchmark windows
+and writes them to a directory of Parquet files:
+
+- ``series.parquet``: ``series_id, __name__, labels`` (labels as JSON);
+- ``samples.parquet``: ``series_id, t, v`` (``t`` in unix milliseconds),
+  sorted by series then time;
+- ``manifest.json``: time ranges, selectors and export metadata.
+
+:class:`ArchivePrometheus` reads such a directory and answers
+``custom_query_range`` / ``custom_query`` with the PromQL subset of
+``transform.promql``, returning the same result shapes as
+``PrometheusConnect``, so every helper in ``prometheus.py`` works on it::
+
+    export_archive(prom, TIME_RANGES, "archives/p1", analysis_selectors(NAMESPACE))
+    ...
+    prom = ArchivePrometheus("archives/p1")
+    TIME_RANGES = prom.time_ranges()
+"""
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from prometheus_api_client import PrometheusConnect
+
+from transform.matrix import decode_values_raw
+from transform.promql import (
+    Evaluator,
+    RawSeries,
+    format_value,
+    labels_key,
+    match_labels,
+    parse_duration_ms,
+    to_matrix_result,
+    to_vector_result,
+)
+from utils.utils import duration_to_seconds
+
+MANIFEST = "manifest.json"
+SERIES = "series.parquet"
+SAMPLES = "samples.parquet"
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_selectors(namespace: str, model_name: Optional[str] = None) -> List[str]:
+    """Series selectors covering the queries in ``prometheus.py`` for one namespace."""
+    model = f', model_name="{model_name}"' if model_name else ""
+    return [
+        f'{{__name__=~"vllm:.*", namespace="{namespace}"{model}}}',
+        f'{{__name__=~"wva_.*", exported_namespace=~"{namespace}"}}',
+        f'{{__name__=~"DCGM_FI_DEV_.*", exported_namespace=~"{namespace}"}}',
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _merge_windows(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(w) for w in merged]
+
+
+def fetch_raw_samples(
+    _prom: PrometheusConnect, selector: str, start_ms: int, end_ms: int, chunk_ms: int = 3_600_000,
+) -> List[RawSeries]:
+    """Raw samples of *selector* in ``(start, end]`` via range-vector instant queries.
+
+    Returns ``(labels, timestamps_ms, values)`` per series, sorted by time.
+    """
+    parts: Dict[Tuple, Tuple[Dict[str, str], List[np.ndarray], List[np.ndarray]]] = {}
+    t = start_ms
+    while t < end_ms:
+        chunk_end = min(t + chunk_ms, end_ms)
+        result = _prom.custom_query(
+            f"{selector}[{(chunk_end - t) // 1000}s]", params={"time": chunk_end / 1000},
+        )
+        for series in result or []:
+            seconds, values = decode_values_raw(series.get("values"))
+            if not seconds.size:
+                continue
+            labels = series.get("metric", {})
+            entry = parts.setdefault(labels_key(labels), (labels, [], []))
+            entry[1].append(np.round(seconds * 1000).astype(np.int64))
+            entry[2].append(values)
+        t = chunk_end
+
+    out = []
+    for labels, ts, vs in parts.values():
+        ts_all, vs_all = np.concatenate(ts), np.concatenate(vs)
+        # Chunk boundaries may repeat a sample: keep one per timestamp.
+        ts_all, first = np.unique(ts_all, return_index=True)
+        out.append((labels, ts_all, vs_all[first]))
+    return out
+
+
+def export_archive(
+    _prom: PrometheusConnect,
+    time_ranges: List[Tuple[datetime, datetime, str]],
+    path: Union[str, Path],
+    selectors: List[str],
+    pad: str = "35m",
+    chunk: str = "1h",
+) -> Path:
+    """Export raw samples of *selectors* over *time_ranges* to *path*.
+
+    Parameters
+    ----------
+    time_ranges
+        ``extract_time_ranges`` output.
+    selectors
+        Series selectors, e.g. :func:`analysis_selectors`.
+    pad
+        Extra history before each window, so range functions and the
+        ``[30m:]`` subqueries of the gauge helpers have their look-back.
+    chunk
+        Time span fetched per request, bounding response size.
+
+    Returns
+    -------
+    The archive directory.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    pad_ms = round(duration_to_seconds(pad) * 1000)
+    chunk_ms = round(duration_to_seconds(chunk) * 1000)
+    windows = _merge_windows([
+        (round(start.timestamp()) * 1000 - pad_ms, round(end.timestamp()) * 1000)
+        for start, end, _ in time_ranges
+    ])
+
+    collected: Dict[Tuple, Tuple[Dict[str, str], List[np.ndarray], List[np.ndarray]]] = {}
+    for selector in selectors:
+        for start_ms, end_ms in windows:
+            for labels, ts, vs in fetch_raw_samples(_prom, selector, start_ms, end_ms, chunk_ms):
+                entry = collected.setdefault(labels_key(labels), (labels, [], []))
+                entry[1].append(ts)
+                entry[2].append(vs)
+
+    series_rows, sample_frames = [], []
+    for series_id, (labels, ts, vs) in enumerate(collected.values()):
+        ts_all, vs_all = np.concatenate(ts), np.concatenate(vs)
+        ts_all, first = np.unique(ts_all, return_index=True)
+        series_rows.append({
+            "series_id": series_id,
+            "__name__": labels.get("__name__", ""),
+            "labels": json.dumps(labels, sort_keys=True),
+        })
+        sample_frames.append(pd.DataFrame({
+            "series_id": np.full(ts_all.size, series_id, dtype=np.int32),
+            "t": ts_all,
+            "v": vs_all[first],
+        }))
+
+    series = pd.DataFrame(series_rows, columns=["series_id", "__name__", "labels"]).astype({"series_id": np.int32})
+    samples = (
+        pd.concat(sample_frames, ignore_index=True) if sample_frames
+        else pd.DataFrame({"series_id": pd.Series(dtype=np.int32), "t": pd.Series(dtype=np.int64), "v": pd.Series(dtype=float)})
+    )
+    series.to_parquet(path / SERIES, index=False)
+    samples.to_parquet(path / SAMPLES, index=False, row_group_size=1_000_000)
+
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": getattr(_prom, "url", None),
+        "selectors": selectors,
+        "time_ranges": [[s.isoformat(), e.isoformat(), label] for s, e, label in time_ranges],
+        "windows_ms": windows,
+        "series": len(series),
+        "samples": len(samples),
+    }
+    (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    logger.info("%d series, %d samples -> %s", len(series), len(samples), path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Local backend
+# ---------------------------------------------------------------------------
+
+class PrometheusArchive:
+    """Series store over an exported archive, loading samples lazily per series."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        series = pd.read_parquet(self.path / SERIES)
+        self._ids = series["series_id"].to_numpy()
+        self._names = series["__name__"].to_numpy(dtype=object)
+        self._labels = [json.loads(s) for s in series["labels"]]
+        self._samples: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _load(self, ids: List[int]) -> None:
+        missing = [i for i in ids if i not in self._samples]
+        if not missing:
+            return
+        frame = pd.read_parquet(self.path / SAMPLES, filters=[("series_id", "in", missing)])
+        frame = frame.sort_values(["series_id", "t"], kind="stable")
+        sid = frame["series_id"].to_numpy()
+        ts, vs = frame["t"].to_numpy(dtype=np.int64), frame["v"].to_numpy(dtype=float)
+        bounds = np.flatnonzero(np.diff(sid)) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, sid.size]):
+            if hi > lo:
+                self._samples[int(sid[lo])] = (ts[lo:hi], vs[lo:hi])
+        for i in missing:
+            self._samples.setdefault(i, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+
+    def select(self, name: Optional[str], matchers, start_ms: int, end_ms: int) -> List[RawSeries]:
+        candidates = np.flatnonzero(self._names == name) if name is not None else np.arange(self._ids.size)
+        hits = [int(i) for i in candidates if match_labels(self._labels[i], name, matchers)]
+        self._load([int(self._ids[i]) for i in hits])
+        out = []
+        for i in hits:
+            ts, vs = self._samples[int(self._ids[i])]
+            lo, hi = np.searchsorted(ts, start_ms, side="left"), np.searchsorted(ts, end_ms, side="right")
+            if hi > lo:
+                out.append((self._labels[i], ts[lo:hi], vs[lo:hi]))
+        return out
+
+    def label_values(self, label: str) -> List[str]:
+        return sorted({labels[label] for labels in self._labels if label in labels})
+
+
+class ArchivePrometheus:
+    """``PrometheusConnect``-compatible client answering queries from an archive.
+
+    Parameters
+    ----------
+    path
+        Directory written by :func:`export_archive`.
+    lookback
+        Instant-vector look-back delta (Prometheus default ``5m``).
+    subquery_step
+        Step of subqueries without an explicit one (``[30m:]``); Prometheus
+        uses its global evaluation interval.
+    """
+
+    def __init__(self, path: Union[str, Path], lookback: str = "5m", subquery_step: str = "1m"):
+        self.store = PrometheusArchive(path)
+        self.url = f"archive://{self.store.path}"
+        self._evaluator = Evaluator(self.store, parse_duration_ms(lookback), parse_duration_ms(subquery_step))
+
+    def time_ranges(self) -> List[Tuple[datetime, datetime, str]]:
+        """The ``TIME_RANGES`` the archive was exported for."""
+        return [
+            (datetime.fromisoformat(s), datetime.fromisoformat(e), label)
+            for s, e, label in self.store.manifest["time_ranges"]
+        ]
+
+    def check_prometheus_connection(self, params: dict = None) -> bool:
+        return True
+
+    def all_metrics(self, params: dict = None) -> List[str]:
+        return self.store.label_values("__name__")
+
+    def get_label_values(self, label_name: str, params: dict = None) -> List[str]:
+        return self.store.label_values(label_name)
+
+    def custom_query_range(self, query: str, start_time: datetime, end_time: datetime, step, params: dict = None, timeout=None):
+        step_ms = round(duration_to_seconds(step) * 1000)
+        eval_ts, value = self._evaluator.query_range(
+            query, round(start_time.timestamp()) * 1000, round(end_time.timestamp()) * 1000, step_ms,
+        )
+        return to_matrix_result(eval_ts, value)
+
+    def custom_query(self, query: str, params: dict = None, timeout=None):
+        if params and "time" in params:
+            time_ms = round(float(params["time"]) * 1000)
+        else:
+            time_ms = max(end for _, end in self.store.manifest["windows_ms"])
+        value = self._evaluator.query_instant(query, time_ms)
+        if isinstance(value, list):
+            return [
+                {"metric": labels, "values": [[t / 1000, format_value(v)] for t, v in zip(ts.tolist(), vs.tolist())]}
+                for labels, ts, vs in value
+            ]
+        return to_vector_result(time_ms, value)
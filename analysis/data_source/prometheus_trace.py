@@ -0,0 +1,192 @@
+"""
+Per-query cost instrumentation for the Prometheus data source.
+
+:class:`InstrumentedPrometheus` wraps a ``PrometheusConnect`` (or a
+``PromQuerySession``/``ArchivePrometheus``) and records every
+``custom_query_range``/``custom_query`` call: the helper that issued it,
+the PromQL, range, step, number of series and points returned, latency,
+error and, optionally, response size.  Errors are recorded before being re-raised, so
+failures the helpers turn into ``NaN`` cells still show up in
+:meth:`InstrumentedPrometheus.errors`.
+
+Typical use at the top and bottom of a notebook::
+
+    prom = InstrumentedPrometheus(PrometheusConnect(...))
+    ...
+    prom.summary()                 # cost per helper, worst first
+    prom.errors()
+    prom.to_json("query-trace.json")
+"""
+
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+from prometheus_api_client import PrometheusConnect
+
+from utils.utils import duration_to_seconds
+
+# Frames from these files are plumbing, not the helper that asked for data.
+_PLUMBING = ("prometheus_trace.py", "query_session.py")
+
+
+@dataclass
+class QueryRecord:
+    kind: str
+    helper: str
+    caller: str
+    query: str
+    start: Optional[str]
+    end: Optional[str]
+    step_s: Optional[float]
+    series: int
+    points: int
+    bytes: Optional[int]
+    latency_s: float
+    error: Optional[str]
+
+
+def _callers() -> Tuple[str, str]:
+    """``(helper, caller)``: outermost and innermost ``data_source`` function on the stack."""
+    frame = sys._getframe(2)
+    inner, outer = None, None
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        if "/data_source/" in filename and not filename.endswith(_PLUMBING):
+            name = f"{Path(filename).stem}.{frame.f_code.co_name}"
+            inner = inner or name
+            outer = name
+        frame = frame.f_back
+    return outer or "<notebook>", inner or "<notebook>"
+
+
+def _result_size(result, count_bytes: bool) -> Tuple[int, int, Optional[int]]:
+    """``(series, points, bytes)`` of a query result.
+
+    *bytes* is the length of the result's compact JSON encoding, a proxy for
+    the response size (the client only hands back the decoded body); it is
+    ``None`` unless *count_bytes*, since re-encoding costs about as much as
+    decoding did.
+    """
+    if not isinstance(result, list):
+        return 0, 0, (0 if count_bytes else None)
+    series = sum(1 for s in result if isinstance(s, dict))
+    points = sum(len(s.get("values") or []) or int("value" in s) for s in result if isinstance(s, dict))
+    return series, points, (len(json.dumps(result, separators=(",", ":"))) if count_bytes else None)
+
+
+class InstrumentedPrometheus:
+    """``PrometheusConnect`` proxy that records the cost of every query.
+
+    Parameters
+    ----------
+    prom
+        The client to wrap; anything not intercepted is delegated to it.
+    verbose
+        Print each failing query as it happens.
+    count_bytes
+        Record the JSON size of every result in ``bytes``.  Off by default:
+        it re-encodes each response, which on large range queries costs as
+        much as the query's own decoding.
+    """
+
+    def __init__(self, prom: PrometheusConnect, verbose: bool = False, count_bytes: bool = False):
+        self._prom = prom
+        self.verbose = verbose
+        self.count_bytes = count_bytes
+        self.records: List[QueryRecord] = []
+
+    def __getattr__(self, name):
+        return getattr(self._prom, name)
+
+    def _run(self, kind: str, query: str, start: Optional[datetime], end: Optional[datetime], step, call):
+        helper, caller = _callers()
+        t0 = time.perf_counter()
+        error, result = None, None
+        try:
+            result = call()
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if self.verbose:
+                print(f"[{helper}] query failed: {error}\n  {query}")
+            raise
+        finally:
+            series, points, size = _result_size(result, self.count_bytes)
+            self.records.append(QueryRecord(
+                kind=kind,
+                helper=helper,
+                caller=caller,
+                query=" ".join(str(query).split()),
+                start=start.isoformat() if start is not None else None,
+                end=end.isoformat() if end is not None else None,
+                step_s=duration_to_seconds(step) if step is not None else None,
+                series=series,
+                points=points,
+                bytes=size,
+                latency_s=time.perf_counter() - t0,
+                error=error,
+            ))
+
+    # -- PrometheusConnect interface ----------------------------------------
+
+    def custom_query_range(self, query: str, start_time: datetime, end_time: datetime, step, params: dict = None, **kwargs):
+        return self._run(
+            "range", query, start_time, end_time, step,
+            lambda: self._prom.custom_query_range(query=query, start_time=start_time, end_time=end_time, step=step, params=params, **kwargs),
+        )
+
+    def custom_query(self, query: str, params: dict = None, **kwargs):
+        at = datetime.fromtimestamp(float(params["time"])) if params and "time" in params else None
+        return self._run(
+            "instant", query, at, at, None,
+            lambda: self._prom.custom_query(query=query, params=params, **kwargs),
+        )
+
+    # -- reports ------------------------------------------------------------
+
+    def trace(self) -> pd.DataFrame:
+        """One row per recorded query, in issue order (``bytes`` is NaN unless ``count_bytes``)."""
+        df = pd.DataFrame([asdict(r) for r in self.records], columns=list(QueryRecord.__dataclass_fields__))
+        df["bytes"] = pd.to_numeric(df["bytes"], errors="coerce")
+        return df
+
+    def summary(self) -> pd.DataFrame:
+        """Cost per helper, most expensive (total latency) first."""
+        df = self.trace()
+        if df.empty:
+            return pd.DataFrame(columns=["helper", "queries", "errors", "latency_s", "max_latency_s", "series", "points", "bytes"])
+        df["failed"] = df["error"].notna()
+        out = df.groupby("helper").agg(
+            queries=("query", "size"),
+            errors=("failed", "sum"),
+            latency_s=("latency_s", "sum"),
+            max_latency_s=("latency_s", "max"),
+            series=("series", "sum"),
+            points=("points", "sum"),
+            bytes=("bytes", lambda b: b.sum(min_count=1)),
+        )
+        return out.sort_values("latency_s", ascending=False).reset_index()
+
+    def slowest(self, n: int = 10) -> pd.DataFrame:
+        """The *n* slowest individual queries."""
+        return self.trace().nlargest(n, "latency_s").reset_index(drop=True)
+
+    def errors(self) -> pd.DataFrame:
+        """Failed queries, including those the helpers reported as ``NaN``."""
+        df = self.trace()
+        return df[df["error"].notna()].reset_index(drop=True)
+
+    def to_json(self, path: Union[str, Path]) -> Path:
+        """Write the full trace as a JSON list of records."""
+        path = Path(path)
+        path.write_text(json.dumps([asdict(r) for r in self.records], indent=1))
+        return path
+
+    def clear(self) -> None:
+        self.records.clear()
@@ -0,0 +1,256 @@
+"""
+Run-scoped Prometheus query planner that deduplicates PromQL across helpers.
+
+The helpers in ``prometheus.py`` each issue their own queries, so a full
+notebook asks Prometheus for the same ``(query, range, step)`` several
+times (e.g. ``compute_gating_verdicts`` re-runs the error-rate, replica and
+throughput queries the cost-efficiency and gap-window tables already ran).
+
+:class:`PromQuerySession` is a drop-in replacement for ``PrometheusConnect``
+that every helper accepts as ``_prom``/``prom``:
+
+- identical requests are served from cache;
+- a range request whose step is a multiple of an already fetched (or
+  planned) step over a covering, aligned window is answered by
+  sub-sampling that result -- range queries are evaluated independently at
+  each ``start + k * step`` timestamp, so this is exact;
+- in *planning* mode requests are only recorded; :meth:`execute` then
+  coalesces them per query (smallest step, union of overlapping windows)
+  and fetches each group once.
+
+Typical use::
+
+    session = PromQuerySession(prom)
+    session.prefetch(
+        lambda: get_cost_efficiency_table(session, TIME_RANGES, ...),
+        lambda: get_gap_window_table(session, TIME_RANGES, ...),
+        lambda: compute_gating_verdicts(session, ...),
+    )
+    cost_efficiency_df = get_cost_efficiency_table(session, TIME_RANGES, ...)
+    ...
+    session.stats()
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from prometheus_api_client import PrometheusConnect
+
+from utils.utils import duration_to_seconds
+
+
+@dataclass
+class _RangeRequest:
+    query: str
+    start_ms: int
+    end_ms: int
+    step_ms: int
+    params: Tuple = ()
+
+    def points(self) -> int:
+        return (self.end_ms - self.start_ms) // self.step_ms + 1
+
+
+@dataclass
+class _Fetched:
+    start_ms: int
+    end_ms: int
+    step_ms: int
+    result: List[dict] = field(default_factory=list)
+
+    def covers(self, req: _RangeRequest) -> bool:
+        return (
+            self.start_ms <= req.start_ms
+            and req.end_ms <= self.end_ms
+            and req.step_ms % self.step_ms == 0
+            and (req.start_ms - self.start_ms) % self.step_ms == 0
+        )
+
+
+def _to_ms(t: datetime) -> int:
+    # prometheus_api_client sends round(t.timestamp()) seconds
+    return round(t.timestamp()) * 1000
+
+
+def _subsample(result: List[dict], req: _RangeRequest) -> List[dict]:
+    """Keep the points of *result* that a query for *req* would have returned."""
+    out = []
+    for series in result:
+        values = [
+            v for v in series.get("values") or []
+            if req.start_ms <= round(float(v[0]) * 1000) <= req.end_ms
+            and (round(float(v[0]) * 1000) - req.start_ms) % req.step_ms == 0
+        ]
+        if values:
+            out.append({"metric": series.get("metric", {}), "values": values})
+    return out
+
+
+class PromQuerySession:
+    """``PrometheusConnect`` proxy that plans, deduplicates and caches queries.
+
+    Parameters
+    ----------
+    prom
+        The underlying client (``PrometheusConnect`` or any object exposing
+        ``custom_query_range`` / ``custom_query``).
+    max_points
+        Upper bound on points per series for a coalesced fetch (Prometheus
+        rejects range queries above 11 000 points).
+    """
+
+    def __init__(self, prom: PrometheusConnect, max_points: int = 11000):
+        self._prom = prom
+        self.max_points = max_points
+        self.planning = False
+        self._pending_range: List[_RangeRequest] = []
+        self._pending_instant: List[Tuple[str, Tuple]] = []
+        self._range_cache: Dict[Tuple[str, Tuple], List[_Fetched]] = {}
+        self._instant_cache: Dict[Tuple[str, Tuple], List[dict]] = {}
+        self._planned = 0
+        self._requested = 0
+        self._served = 0
+        self._executed = 0
+
+    def __getattr__(self, name):
+        # Everything not intercepted (get_label_values, ...) goes straight through.
+        return getattr(self._prom, name)
+
+    # -- PrometheusConnect interface ----------------------------------------
+
+    def custom_query_range(self, query: str, start_time: datetime, end_time: datetime, step, params: dict = None):
+        step_ms = round(duration_to_seconds(step) * 1000)
+        req = _RangeRequest(str(query), _to_ms(start_time), _to_ms(end_time), step_ms, tuple(sorted((params or {}).items())))
+        if self.planning:
+            self._planned += 1
+            self._pending_range.append(req)
+            return []
+        self._requested += 1
+        cached = self._lookup(req)
+        if cached is not None:
+            self._served += 1
+            return cached
+        self._fetch_range(req.query, req.params, req.start_ms, req.end_ms, req.step_ms)
+        return self._lookup(req)
+
+    def custom_query(self, query: str, params: dict = None):
+        key = (str(query), tuple(sorted((params or {}).items())))
+        if self.planning:
+            self._planned += 1
+            self._pending_instant.append(key)
+            return []
+        self._requested += 1
+        if key in self._instant_cache:
+            self._served += 1
+            return self._instant_cache[key]
+        self._executed += 1
+        result = self._prom.custom_query(query=key[0], params=dict(key[1]) or None)
+        self._instant_cache[key] = result
+        return result
+
+    # -- planning -----------------------------------------------------------
+
+    @contextmanager
+    def planning_mode(self):
+        """Record requests instead of executing them; helpers receive ``[]``."""
+        self.planning = True
+        try:
+            yield self
+        finally:
+            self.planning = False
+
+    def prefetch(self, *calls: Callable[[], object]) -> None:
+        """Dry-run *calls* to collect their queries, then :meth:`execute` them.
+
+        Exceptions raised by a helper while it only sees empty results are
+        expected and ignored.
+        """
+        with self.planning_mode():
+            for call in calls:
+                try:
+                    call()
+                except Exception:
+                    pass
+        self.execute()
+
+    def execute(self) -> None:
+        """Fetch every pending request with the minimum number of queries."""
+        groups: Dict[Tuple[str, Tuple], List[_RangeRequest]] = {}
+        for req in self._pending_range:
+            if self._lookup(req) is None:
+                groups.setdefault((req.query, req.params), []).append(req)
+        self._pending_range = []
+
+        for (query, params), reqs in groups.items():
+            for start_ms, end_ms, step_ms in self._coalesce(reqs):
+                self._fetch_range(query, params, start_ms, end_ms, step_ms)
+
+        pending_instant, self._pending_instant = self._pending_instant, []
+        for query, params in dict.fromkeys(pending_instant):
+            if (query, params) not in self._instant_cache:
+                self._executed += 1
+                self._instant_cache[(query, params)] = self._prom.custom_query(query=query, params=dict(params) or None)
+
+    def _coalesce(self, reqs: List[_RangeRequest]) -> List[Tuple[int, int, int]]:
+        """Greedily merge requests of one query into as few fetches as possible.
+
+        A request joins a fetch when its step is a multiple of the fetch
+        step, its start is on the fetch grid and its window overlaps (or
+        touches) the fetch window without exceeding ``max_points``.
+        """
+        fetches: List[List[int]] = []
+        for req in sorted(reqs, key=lambda r: (r.step_ms, r.start_ms)):
+            for f in fetches:
+                start_ms, end_ms, step_ms = f
+                if req.step_ms % step_ms or (req.start_ms - start_ms) % step_ms:
+                    continue
+                if req.start_ms > end_ms + step_ms or req.end_ms < start_ms - step_ms:
+                    continue
+                new_start, new_end = min(start_ms, req.start_ms), max(end_ms, req.end_ms)
+                if (new_end - new_start) // step_ms + 1 > self.max_points:
+                    continue
+                f[0], f[1] = new_start, new_end
+                break
+            else:
+                fetches.append([req.start_ms, req.end_ms, req.step_ms])
+        return [tuple(f) for f in fetches]
+
+    # -- cache --------------------------------------------------------------
+
+    def _fetch_range(self, query: str, params: Tuple, start_ms: int, end_ms: int, step_ms: int) -> None:
+        self._executed += 1
+        step = f"{step_ms // 1000}s" if step_ms % 1000 == 0 else step_ms / 1000
+        result = self._prom.custom_query_range(
+            query=query,
+            start_time=datetime.fromtimestamp(start_ms / 1000),
+            end_time=datetime.fromtimestamp(end_ms / 1000),
+            step=step,
+            params=dict(params) or None,
+        )
+        self._range_cache.setdefault((query, params), []).append(_Fetched(start_ms, end_ms, step_ms, result or []))
+
+    def _lookup(self, req: _RangeRequest) -> Optional[List[dict]]:
+        for fetched in self._range_cache.get((req.query, req.params), []):
+            if fetched.covers(req):
+                if (fetched.start_ms, fetched.end_ms, fetched.step_ms) == (req.start_ms, req.end_ms, req.step_ms):
+                    return fetched.result
+                return _subsample(fetched.result, req)
+        return None
+
+    def clear(self) -> None:
+        self._range_cache.clear()
+        self._instant_cache.clear()
+
+    def stats(self) -> pd.DataFrame:
+        """Planned, requested and actually executed query counts for this session."""
+        return pd.DataFrame([{
+            "planned": self._planned,
+            "requested": self._requested,
+            "served_from_cache": self._served,
+            "executed": self._executed,
+            "cached_range_queries": sum(len(v) for v in self._range_cache.values()),
+            "cached_instant_queries": len(self._instant_cache),
+        }])
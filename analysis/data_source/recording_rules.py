@@ -0,0 +1,214 @@
+"""
+Prometheus recording rules for the benchmark queries.
+
+The analysis helpers aggregate the same raw series at query time over long
+windows, e.g. ``sum by(le)(rate(vllm:e2e_request_latency_seconds_bucket{...}[1m]))``
+or ``sum(DCGM_FI_DEV_POWER_USAGE{...})``.  The rules below pre-aggregate
+those expressions so the helpers only read a handful of already reduced
+series.
+
+Each :class:`RecordingRule` is the single definition of one expression:
+
+- :func:`prometheus_rule_manifests` renders them as a ``PrometheusRule``
+  for the benchmark namespace (user-workload monitoring only evaluates a
+  namespace's rules against that namespace's series).
+- :func:`aggregated_query` returns the PromQL the helpers in
+  ``prometheus.py`` run: the recorded series when their ``recorded_series``
+  argument allows it (and, in ``"auto"`` mode, the series are present over
+  the queried window), the raw expression otherwise.  The mode is an
+  explicit argument rather than module state, so it is part of every
+  cache key (see ``utils.artifacts``).
+
+GPU power is deliberately not recorded: energy is integrated from the raw
+DCGM samples (``data_source.energy``), which a 1m pre-aggregation would
+coarsen.
+
+Deploy the rules into the namespace the benchmark runs in::
+
+    python data_source/recording_rules.py --namespace <namespace> | oc apply -f -
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import yaml
+from prometheus_api_client import PrometheusConnect
+
+RULE_INTERVAL = "1m"
+
+
+@dataclass(frozen=True)
+class RecordingRule:
+    """``sum by (<by>) (<func>(<metric>{<matchers>}[<interval>]))`` recorded as one series.
+
+    ``func=None`` records a plain sum of a gauge.  ``matchers`` are fixed
+    label matchers baked into the rule (e.g. the error ``finished_reason``
+    filter); per-query selectors are applied to the recorded series.
+    """
+
+    metric: str
+    by: Tuple[str, ...]
+    func: Optional[str] = "rate"
+    matchers: str = ""
+    suffix: str = ""
+
+    @property
+    def record(self) -> str:
+        # Prometheus naming convention: level:metric:operations
+        metric = self.metric.replace(":", "_")
+        if metric.endswith("_total") and self.func:
+            metric = metric[: -len("_total")]
+        op = f"{self.func}{RULE_INTERVAL}" if self.func else "sum"
+        return f"{'_'.join(self.by)}:{metric}{self.suffix}:{op}"
+
+    def inner(self, selector: str = "", interval: str = RULE_INTERVAL) -> str:
+        """The un-aggregated vector, restricted by *selector* and the fixed matchers."""
+        sel = ", ".join(m for m in (selector, self.matchers) if m)
+        vector = f"{self.metric}{{{sel}}}" if sel else self.metric
+        if self.func:
+            vector = f"{self.func}({vector}[{interval}])"
+        return vector
+
+    @property
+    def expr(self) -> str:
+        return f"sum by ({', '.join(self.by)}) ({self.inner()})"
+
+    def covers(self, selector_labels: Sequence[str], by: Sequence[str]) -> bool:
+        """Whether the recorded series keeps every label a query selects or groups on."""
+        return set(selector_labels) <= set(self.by) and set(by) <= set(self.by)
+
+
+_VLLM_BY = ("namespace", "model_name")
+
+RULES: Dict[str, RecordingRule] = {
+    # Histograms: buckets summed per model and le.
+    "e2e_latency": RecordingRule("vllm:e2e_request_latency_seconds_bucket", (*_VLLM_BY, "le")),
+    "ttft": RecordingRule("vllm:time_to_first_token_seconds_bucket", (*_VLLM_BY, "le")),
+    "itl": RecordingRule("vllm:inter_token_latency_seconds_bucket", (*_VLLM_BY, "le")),
+    "queue_time": RecordingRule("vllm:request_queue_time_seconds_bucket", (*_VLLM_BY, "le")),
+    # Counters.
+    "request_success_rate": RecordingRule("vllm:request_success_total", _VLLM_BY),
+    "request_error_rate": RecordingRule(
+        "vllm:request_success_total", _VLLM_BY,
+        matchers='finished_reason!~"stop|length"', suffix="_errors",
+    ),
+    "generation_tokens_rate": RecordingRule("vllm:generation_tokens_total", _VLLM_BY),
+    # Gauges.
+    "requests_running": RecordingRule("vllm:num_requests_running", _VLLM_BY, func=None),
+    "requests_waiting": RecordingRule("vllm:num_requests_waiting", _VLLM_BY, func=None),
+}
+
+
+def histogram_rule(metric_name: str) -> Optional[str]:
+    """Key in :data:`RULES` of the bucket rule for histogram *metric_name* (with or without ``_bucket``)."""
+    bucket = metric_name if metric_name.endswith("_bucket") else f"{metric_name}_bucket"
+    for key, rule in RULES.items():
+        if rule.metric == bucket:
+            return key
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Manifests
+# ---------------------------------------------------------------------------
+
+def prometheus_rule_manifests(namespace: str, name: str = "benchmark-recording-rules") -> List[dict]:
+    """``PrometheusRule`` objects for :data:`RULES`, deployed to *namespace*."""
+    rules = [
+        {"record": rule.record, "expr": rule.expr}
+        for rule in dict((r.record, r) for r in RULES.values()).values()
+    ]
+    return [{
+        "apiVersion": "monitoring.coreos.com/v1",
+        "kind": "PrometheusRule",
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "labels": {"app.kubernetes.io/managed-by": "llm-d-lab"},
+        },
+        "spec": {"groups": [{"name": name, "interval": "30s", "rules": rules}]},
+    }]
+
+
+def prometheus_rule_yaml(**kwargs) -> str:
+    return yaml.safe_dump_all(prometheus_rule_manifests(**kwargs), sort_keys=False, width=200)
+
+
+# ---------------------------------------------------------------------------
+# Query switch
+# ---------------------------------------------------------------------------
+
+RECORDED_SERIES_MODES = ("off", "on", "auto")
+
+# Probe results of "auto" mode, per client, series and window.
+_availability: Dict[Tuple, bool] = {}
+
+
+def _recorded_available(_prom: PrometheusConnect, rule: RecordingRule, selector: str, start_time: datetime, end_time: datetime) -> bool:
+    key = (id(_prom), rule.record, selector, start_time, end_time)
+    if getattr(_prom, "planning", False):
+        # A planning PromQuerySession answers every probe with [].
+        return False
+    if key not in _availability:
+        probe = f"count(last_over_time({rule.record}{{{selector}}}[5m]))"
+        try:
+            _availability[key] = all(
+                _prom.custom_query(probe, params={"time": t.timestamp()})
+                for t in (start_time + timedelta(minutes=5), end_time)
+            )
+        except Exception:
+            _availability[key] = False
+    return _availability[key]
+
+
+def aggregated_query(
+    _prom: PrometheusConnect,
+    rule_key: str,
+    selector: Dict[str, str],
+    start_time: datetime,
+    end_time: datetime,
+    by: Sequence[str] = (),
+    interval: str = RULE_INTERVAL,
+    recorded_series: str = "off",
+) -> str:
+    """PromQL for ``sum by (<by>)`` of rule *rule_key* restricted to *selector*.
+
+    *selector* maps label → exact value.  *recorded_series* is ``"on"``
+    (use the recorded series), ``"auto"`` (only when they have samples at
+    both ends of the window, probed once per window) or ``"off"``.  The
+    recorded series is used only when the mode allows it, the rule keeps
+    every selected/grouped label and *interval* matches the rule's rate
+    window; otherwise the raw expression is returned, so results never
+    silently change.
+    """
+    if recorded_series not in RECORDED_SERIES_MODES:
+        raise ValueError(f"recorded_series must be one of {RECORDED_SERIES_MODES}, got {recorded_series!r}")
+    rule = RULES[rule_key]
+    matchers = ", ".join(f'{k}="{v}"' for k, v in selector.items())
+    grouping = f" by ({', '.join(by)})" if by else ""
+    if (
+        recorded_series != "off"
+        and rule.covers(selector, by)
+        and (rule.func is None or interval == RULE_INTERVAL)
+        and (recorded_series == "on" or _recorded_available(_prom, rule, matchers, start_time, end_time))
+    ):
+        return f"sum{grouping} ({rule.record}{{{matchers}}})"
+    return f"sum{grouping} ({rule.inner(matchers, interval)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the benchmark recording rules as PrometheusRule manifests",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--namespace", required=True, help="Namespace of the vLLM deployments the rules are evaluated in.")
+    parser.add_argument("--name", default="benchmark-recording-rules", help="PrometheusRule name.")
+    args = parser.parse_args()
+    sys.stdout.write(prometheus_rule_yaml(namespace=args.namespace, name=args.name))
+
+
+if __name__ == "__main__":
+    main()
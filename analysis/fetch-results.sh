@@ -86,6 +86,8 @@ mkdir -p "${DEST}"
 
 echo "==> Syncing to ${DEST}/ ..."
 oc rsync "${HELPER_POD}:/data/" "${DEST}/" -n "${NAMESPACE}" --progress
+# A full rsync invalidates the file list kept by sync-results.py.
+rm -f "${DEST}/.sync-manifest.json"
 
 COUNT=$(find "${DEST}" -name "*.json" -type f 2>/dev/null | wc -l | tr -d ' ')
 echo ""
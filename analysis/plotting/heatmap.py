@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly
+
+
+def latency_heatmap_over_time_with_scaling(
+        frame: pd.DataFrame,
+        scaling_events: pd.DataFrame = None,
+        title: str = "Time-To-First-Token (TTFT)",
+        run_label: str = "",
+        yaxis_title: str = "TTFT bucket (le)",
+        yscale: float = 1,
+        y_unit: str = "s",
+        colorscale: str = "Viridis",
+) -> go.Figure:
+    """Heatmap of the per-slice bucket distribution with scaling markers.
+
+    *frame* is the output of ``transform.histogram.histogram_heatmap_frame``
+    (rows: time slices, columns: bucket upper bounds).  The ``+Inf`` column
+    is labelled as ``> last bound``.
+    """
+    colors = plotly.colors.qualitative.G10
+    uppers = np.asarray(frame.columns, dtype=float)
+    finite = uppers[np.isfinite(uppers)]
+    labels = [
+        f"{u * yscale:g}{y_unit}" if np.isfinite(u) else f">{finite[-1] * yscale:g}{y_unit}"
+        for u in uppers
+    ]
+
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(
+        x=frame.index,
+        y=labels,
+        z=frame.to_numpy().T,
+        colorscale=colorscale,
+        colorbar=dict(title="Share", x=1.08),
+        hovertemplate="%{x}<br>le=%{y}<br>%{z:.1%}<extra></extra>",
+    ))
+
+    if scaling_events is not None and not scaling_events.empty:
+        fig.add_trace(go.Scatter(
+            x=scaling_events.index,
+            y=scaling_events["scale_out"],
+            mode="markers",
+            name="Scale Out",
+            marker=dict(size=8, color=colors[4], symbol="triangle-up"),
+            yaxis="y2",
+        ))
+        fig.add_trace(go.Scatter(
+            x=scaling_events.index,
+            y=scaling_events["scale_in"],
+            mode="markers",
+            name="Scale In",
+            marker=dict(size=8, color=colors[5], symbol="triangle-down"),
+            yaxis="y2",
+        ))
+
+    fig.update_layout(
+        title=f"{title} - {run_label}",
+        xaxis_title="Time",
+        yaxis=dict(title=yaxis_title, type="category"),
+        yaxis2=dict(
+            title="Replicas",
+            overlaying="y",
+            side="right",
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+    )
+    return fig
+
+
+def latency_heatmaps_over_time_with_scaling(
+        data: dict,
+        **kwargs,
+) -> dict:
+    """One heatmap per run from ``{run_label: (frame, scaling_events)}``."""
+    return {
+        run_label: latency_heatmap_over_time_with_scaling(
+            frame=frame, scaling_events=scaling_events, run_label=run_label, **kwargs,
+        )
+        for run_label, (frame, scaling_events) in data.items()
+    }
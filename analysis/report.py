@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Headless analysis report for a benchmark experiment.
+
+Runs what ``wva-extract-store.ipynb`` does interactively -- discovery,
+loading, the gateway-level (GuideLLM) and Prometheus tables and the
+figures -- without a notebook, and writes a static ``report.html`` plus a
+machine-readable ``report.json``.
+
+The work is a DAG of stages (see :func:`build_stages`).  Stages whose
+inputs are ready run in parallel on a thread pool, so the Prometheus tables
+are queried concurrently with each other and with the GuideLLM loading.
+Tables and figures are cached under ``<output>/.cache`` (a
+``utils.artifacts.ArtifactStore``) keyed by the stage, the source of its
+function and of the code it calls, the report options and the size/mtime
+of the input files; re-running on the same inputs only re-renders the
+report, adding a run recomputes only what depends on it, and editing a
+table builder recomputes only the stages that use it.
+
+Prometheus is either a live endpoint (``--prometheus-url``, with a bearer
+token) or an offline archive written by ``prometheus_archive.export_archive``
+(``--archive``).  Without either, only the GuideLLM part is produced.
+
+Usage:
+    ./report.py _in/<pvc> --prometheus-url https://localhost:9091 --bearer-token-file token
+    ./report.py _in/<pvc> --archive archives/p1 -o _out/report
+    ./report.py --archive archives/p1                     # Prometheus tables only
+
+The ``analysis-report`` Tekton task (manifests/50-pipelines) runs this as
+the last task of a pipeline, next to the benchmark results on the PVC.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from data_source import guidellm
+from data_source import prometheus as prom_tables
+from plotting.violin_plots import violin_plot_by_run
+from utils.artifacts import ArtifactStore, source_hash
+
+# Same queries as the notebook.
+HISTOGRAM_METRICS = {
+    "ITL": "vllm:inter_token_latency_seconds_bucket",
+    "E2E": "vllm:e2e_request_latency_seconds_bucket",
+    "TTFT": "vllm:time_to_first_token_seconds_bucket",
+}
+
+# Violins draw every point; beyond this many per run the figure only gets heavier.
+VIOLIN_POINTS_PER_RUN = 20_000
+
+
+# ---------------------------------------------------------------------------
+# Stages and their execution
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Stage:
+    """One node of the report DAG.
+
+    *fn* is called with the report config and the results of *deps* as
+    keyword arguments.  Returning ``None`` means "not applicable" (e.g.
+    gating with a single run): the stage and its dependents are skipped,
+    except dependents listing it in *optional*, which get ``None``.
+    ``kind`` is ``"table"`` or ``"figure"`` for report content,
+    ``"frames"`` for a dict of DataFrames (all three cached) and
+    ``"value"`` for intermediate objects (clients, run lists; not cached).
+    """
+
+    name: str
+    fn: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+    kind: str = "value"
+    title: str = ""
+    section: str = ""
+    optional: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageRun:
+    state: str  # ok | cached | skipped | failed
+    seconds: float = 0.0
+    error: Optional[str] = None
+    value: Any = field(default=None, repr=False)
+
+
+def stage_keys(stages: List[Stage], fingerprint: str) -> Dict[str, str]:
+    """Cache key per stage: its name and code, the inputs fingerprint and its dependencies' keys."""
+    by_name = {s.name: s for s in stages}
+    keys: Dict[str, str] = {}
+
+    def key(name: str) -> str:
+        if name not in keys:
+            stage = by_name[name]
+            parts = [name, source_hash(stage.fn), fingerprint, *(key(d) for d in stage.deps)]
+            keys[name] = hashlib.sha1("\0".join(parts).encode()).hexdigest()
+        return keys[name]
+
+    for s in stages:
+        key(s.name)
+    return keys
+
+
+def _run_stage(stage: Stage, config: argparse.Namespace, inputs: Dict[str, Any], store: ArtifactStore, key: str) -> StageRun:
+    t0 = time.monotonic()
+    try:
+        cached = stage.kind != "value"
+        value = store.load(f"report.{stage.name}", key) if cached else None
+        if value is not None:
+            return StageRun("cached", time.monotonic() - t0, value=value)
+        value = stage.fn(config, **inputs)
+        if cached:
+            store.save(f"report.{stage.name}", key, value)
+        return StageRun("ok" if value is not None else "skipped", time.monotonic() - t0, value=value)
+    except Exception as e:
+        return StageRun("failed", time.monotonic() - t0, error=f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+
+
+def run_stages(
+    stages: List[Stage],
+    config: argparse.Namespace,
+    store: ArtifactStore,
+    fingerprint: str,
+    workers: int = 4,
+) -> Dict[str, StageRun]:
+    """Execute *stages* in dependency order, independent ones in parallel."""
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        unknown = [d for d in s.deps if d not in by_name]
+        if unknown:
+            raise ValueError(f"stage {s.name!r} depends on unknown stage(s) {unknown}")
+    keys = stage_keys(stages, fingerprint)
+
+    runs: Dict[str, StageRun] = {}
+    pending = dict(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            progressed = False
+            for name, stage in list(pending.items()):
+                if not all(d in runs for d in stage.deps):
+                    continue
+                del pending[name]
+                progressed = True
+                blocked = [d for d in stage.deps if runs[d].state == "failed"
+                           or (runs[d].state == "skipped" and d not in stage.optional)]
+                if blocked:
+                    runs[name] = StageRun("skipped", error=f"needs {', '.join(blocked)}")
+                    continue
+                inputs = {d: runs[d].value for d in stage.deps}
+                running[pool.submit(_run_stage, stage, config, inputs, store, keys[name])] = stage
+            if progressed and not running:
+                continue
+            if not running:
+                raise RuntimeError(f"dependency cycle among {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                runs[stage.name] = run = future.result()
+                print(f"[report] {stage.name:<22} {run.state:<8} {run.seconds:6.1f}s"
+                      + (f"  {run.error.splitlines()[0]}" if run.error else ""))
+    return runs
+
+
+# ---------------------------------------------------------------------------
+# Stage functions
+# ---------------------------------------------------------------------------
+
+def _run_configs(config):
+    if not config.results:
+        return None
+    return guidellm.discover_runs(config.results) or None
+
+
+def _prometheus(config):
+    if config.archive:
+        from data_source.prometheus_archive import ArchivePrometheus
+        return ArchivePrometheus(config.archive)
+    if config.prometheus_url:
+        from prometheus_api_client import PrometheusConnect
+        token = config.bearer_token
+        if config.bearer_token_file:
+            token = Path(config.bearer_token_file).read_text().strip()
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        return PrometheusConnect(url=config.prometheus_url, disable_ssl=True, headers=headers)
+    return None
+
+
+def _time_ranges(config, run_configs, prom):
+    if run_configs:
+        return guidellm.extract_time_ranges(run_configs)
+    if hasattr(prom, "time_ranges"):
+        return prom.time_ranges()
+    return None
+
+
+def _wva_and_baseline(config, labels: List[str]) -> Optional[Tuple[str, str]]:
+    """``(wva, baseline)`` labels: ``--wva-run``, else the first label containing "wva"."""
+    if len(labels) < 2:
+        return None
+    wva = config.wva_run or next((l for l in labels if "wva" in l.lower()), labels[-1])
+    others = [l for l in labels if l != wva]
+    return (wva, others[0]) if wva in labels and others else None
+
+
+def _gw_load(config, run_configs):
+    requests_df, summary_df = guidellm.load_runs(run_configs, compact=True)
+    return {"requests": requests_df, "summary": summary_df}
+
+
+def _gw_gating(config, gw_load):
+    requests_df = gw_load["requests"]
+    pair = _wva_and_baseline(config, list(dict.fromkeys(requests_df["run"].astype(str))))
+    if pair is None:
+        return None
+    return guidellm.compute_gating_verdicts(requests_df, wva_label=pair[0], baseline_label=pair[1])
+
+
+def _gw_violin(column: str, title: str, unit: str):
+    def build(config, gw_load):
+        ok = gw_load["requests"]
+        ok = ok[ok["status"] == "successful"][["run", column]].dropna()
+        if ok.empty:
+            return None
+        ok = ok.sample(frac=1, random_state=0).groupby("run", observed=True).head(VIOLIN_POINTS_PER_RUN)
+        df = pd.DataFrame({"run": ok["run"].astype(str).to_numpy(), "value": ok[column].to_numpy(dtype=float)})
+        return violin_plot_by_run(
+            df=df, title=f"{title} — Gateway-Level", xtitle="Run",
+            yaxes_config=dict(title=f"{title} ({unit.strip()})", ticksuffix=unit),
+        )
+    return build
+
+
+def _gw_error_timeline(config, gw_load):
+    timeline = guidellm.compute_error_timeline(gw_load["requests"], bin_seconds=60)
+    if timeline.empty:
+        return None
+    fig = px.bar(
+        timeline, x="time_bin", y="count", color="status", facet_row="run", barmode="stack",
+        color_discrete_map={"errored": "#d62728", "incomplete": "#ff7f0e"},
+        title="Non-Successful Requests Over Time (1-min bins)",
+        labels={"time_bin": "Time (UTC)", "count": "Requests"},
+    )
+    fig.update_layout(height=300 * timeline["run"].nunique())
+    return fig
+
+
+def _gauge_metrics(config) -> Dict[str, str]:
+    return {
+        "KV Cache Util.": f'avg(vllm:kv_cache_usage_perc{{namespace="{config.namespace}"}})',
+        "Queued Requests": f'sum(vllm:num_requests_waiting{{model_name="{config.model_name}",namespace="{config.namespace}"}})',
+        "Power": f'sum(DCGM_FI_DEV_POWER_USAGE{{exported_namespace=~"{config.namespace}"}})',
+    }
+
+
+def _prom_gating(config, prom, time_ranges, replicas):
+    pair = _wva_and_baseline(config, [r[2] for r in time_ranges])
+    if pair is None:
+        return None
+    by_label = {r[2]: r for r in time_ranges}
+    return prom_tables.compute_gating_verdicts(
+        prom, wva_range=by_label[pair[0]], baseline_range=by_label[pair[1]],
+        model_name=config.model_name, namespace=config.namespace, variant_name=config.variant_name,
+        replica_contexts=replicas,
+    )
+
+
+def build_stages() -> List[Stage]:
+    gw, pm = "Gateway-level (GuideLLM)", "Prometheus"
+    P = ("prom", "time_ranges")
+    return [
+        Stage("run_configs", _run_configs),
+        Stage("prom", _prometheus),
+        Stage("time_ranges", _time_ranges, ("run_configs", "prom"), optional=("run_configs", "prom")),
+        # GuideLLM
+        Stage("gw_load", _gw_load, ("run_configs",), kind="frames"),
+        Stage("gw_summary", lambda c, gw_load: gw_load["summary"], ("gw_load",), "table", "Run summary", gw),
+        Stage("gw_latency", lambda c, gw_load: guidellm.compute_latency_percentiles(gw_load["requests"]),
+              ("gw_load",), "table", "Latency percentiles (TTFT ms, E2E s, ITL ms)", gw),
+        Stage("gw_throughput", lambda c, gw_load: guidellm.compute_throughput_summary(gw_load["requests"], gw_load["summary"]),
+              ("gw_load",), "table", "Throughput", gw),
+        Stage("gw_errors", lambda c, gw_load: guidellm.compute_error_summary(gw_load["requests"]),
+              ("gw_load",), "table", "Errors", gw),
+        Stage("gw_error_breakdown", lambda c, gw_load: guidellm.compute_error_breakdown(gw_load["requests"]),
+              ("gw_load",), "table", "Error breakdown", gw),
+        Stage("gw_gating", _gw_gating, ("gw_load",), "table", "Gating verdicts", gw),
+        Stage("gw_ttft_violin", _gw_violin("ttft_ms", "Time to First Token", " ms"), ("gw_load",), "figure", "", gw),
+        Stage("gw_e2e_violin", _gw_violin("request_latency_s", "End-to-End Latency", " s"), ("gw_load",), "figure", "", gw),
+        Stage("gw_itl_violin", _gw_violin("itl_ms", "Inter-Token Latency", " ms"), ("gw_load",), "figure", "", gw),
+        Stage("gw_error_timeline", _gw_error_timeline, ("gw_load",), "figure", "", gw),
+        # Prometheus
+        Stage("replicas", lambda c, prom, time_ranges: prom_tables.replica_contexts(
+            prom, time_ranges, c.variant_name, c.namespace), P),
+        Stage("prom_latency", lambda c, prom, time_ranges: prom_tables.get_histograms_p_tables_by_run(
+            prom, time_ranges, HISTOGRAM_METRICS, c.model_name, c.namespace), P, "table", "vLLM latency percentiles (s)", pm),
+        Stage("gauges", lambda c, prom, time_ranges: prom_tables.get_gauge_p_tables_by_run(
+            prom, time_ranges, _gauge_metrics(c)), P, "table", "Gauges", pm),
+        Stage("cost_efficiency", lambda c, prom, time_ranges, replicas: prom_tables.get_cost_efficiency_table(
+            prom, time_ranges, model_name=c.model_name, namespace=c.namespace, variant_name=c.variant_name,
+            gpus_per_replica=c.gpus_per_replica, replica_contexts=replicas),
+            (*P, "replicas"), "table", "Cost efficiency", pm),
+        Stage("gap_windows", lambda c, prom, time_ranges, replicas: prom_tables.get_gap_window_table(
+            prom, time_ranges, variant_name=c.variant_name, namespace=c.namespace, replica_contexts=replicas),
+            (*P, "replicas"), "table", "Scale-up gap windows", pm),
+        Stage("error_rate", lambda c, prom, time_ranges: prom_tables.get_error_rate_summary(
+            prom, time_ranges, model_name=c.model_name, namespace=c.namespace), P, "table", "vLLM error rate", pm),
+        Stage("prom_gating", _prom_gating, (*P, "replicas"), "table", "Gating verdicts", pm),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Inputs fingerprint
+# ---------------------------------------------------------------------------
+
+def inputs_fingerprint(config: argparse.Namespace) -> str:
+    """Hash of the report options and the size/mtime of every input file.
+
+    Hidden files (catalogs, caches, sync manifests) and the output
+    directory, which may live inside the results tree, are left out.
+    """
+    output = config.output.resolve()
+    options = {k: v for k, v in vars(config).items()
+               if k not in ("output", "workers", "no_cache", "strict", "bearer_token", "bearer_token_file", "plotlyjs", "title")}
+    h = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode())
+    for root in (config.results, config.archive):
+        if not root:
+            continue
+        for path in sorted(Path(root).rglob("*")):
+            if (path.is_file() and output not in path.resolve().parents
+                    and not any(part.startswith(".") for part in path.relative_to(root).parts)):
+                st = path.stat()
+                h.update(f"{path.relative_to(root)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+_CSS = """
+body { font-family: system-ui, sans-serif; margin: 2em; color: #222; }
+h1 { margin-bottom: 0; } .meta { color: #666; margin-bottom: 2em; }
+table { border-collapse: collapse; margin: 0.5em 0 2em; font-size: 0.85em; }
+th, td { border: 1px solid #ddd; padding: 0.25em 0.6em; text-align: right; }
+th { background: #f4f4f4; } td:first-child, th:first-child { text-align: left; }
+td.PASS { background: #2d6a2d; color: white; } td.FAIL { background: #8b2020; color: white; }
+td.INCONCLUSIVE, td.MEASURED { background: #4a4a00; color: white; }
+.failed { color: #8b2020; } .skipped { color: #888; }
+"""
+
+
+def _table_html(df: pd.DataFrame) -> str:
+    out = df.to_html(index=False, na_rep="--", float_format=lambda v: f"{v:,.4g}", border=0)
+    for verdict in ("PASS", "FAIL", "INCONCLUSIVE", "MEASURED"):
+        out = out.replace(f"<td>{verdict}</td>", f'<td class="{verdict}">{verdict}</td>')
+    return out
+
+
+def render_html(stages: List[Stage], runs: Dict[str, StageRun], config: argparse.Namespace) -> str:
+    parts = [f"<h1>{html.escape(config.title)}</h1>",
+             f'<p class="meta">Generated {datetime.now():%Y-%m-%d %H:%M:%S} from '
+             f'{html.escape(str(config.results or config.archive))}</p>']
+    plotlyjs: Any = "cdn" if config.plotlyjs == "cdn" else True
+    section = None
+    for stage in stages:
+        run = runs[stage.name]
+        if stage.kind not in ("table", "figure") or run.value is None:
+            continue
+        if stage.section != section:
+            section = stage.section
+            parts.append(f"<h2>{html.escape(section)}</h2>")
+        if stage.kind == "table":
+            parts.append(f"<h3>{html.escape(stage.title)}</h3>")
+            parts.append(_table_html(run.value))
+        else:
+            parts.append(pio.to_html(run.value, full_html=False, include_plotlyjs=plotlyjs))
+            plotlyjs = False
+
+    rows = "".join(
+        f'<tr><td>{s.name}</td><td class="{runs[s.name].state}">{runs[s.name].state}</td>'
+        f"<td>{runs[s.name].seconds:.1f}s</td><td>{html.escape((runs[s.name].error or '').splitlines()[0] if runs[s.name].error else '')}</td></tr>"
+        for s in stages
+    )
+    parts.append(f"<h2>Stages</h2><table><tr><th>stage</th><th>state</th><th>time</th><th>note</th></tr>{rows}</table>")
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(config.title)}</title>"
+            f"<style>{_CSS}</style></head><body>{''.join(parts)}</body></html>")
+
+
+def render_json(stages: List[Stage], runs: Dict[str, StageRun], config: argparse.Namespace) -> dict:
+    tables, figures = {}, {}
+    for stage in stages:
+        value = runs[stage.name].value
+        if stage.kind == "table" and value is not None:
+            tables[stage.name] = {"title": stage.title, "section": stage.section,
+                                  "data": json.loads(value.to_json(orient="records", date_format="iso"))}
+        elif stage.kind == "figure" and value is not None:
+            figures[stage.name] = json.loads(pio.to_json(value))
+    return {
+        "title": config.title,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "results": str(config.results) if config.results else None,
+        "prometheus": config.archive or config.prometheus_url,
+        "stages": {s.name: {"state": runs[s.name].state, "seconds": round(runs[s.name].seconds, 3),
+                            "error": runs[s.name].error} for s in stages},
+        "tables": tables,
+        "figures": figures,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the benchmark analysis report without the notebook",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("results", nargs="?", type=Path, help="GuideLLM results tree (e.g. _in/<pvc>).")
+    parser.add_argument("-o", "--output", type=Path, default=Path("_out/report"))
+    prom = parser.add_mutually_exclusive_group()
+    prom.add_argument("--prometheus-url", help="e.g. https://thanos-querier.openshift-monitoring.svc:9091")
+    prom.add_argument("--archive", help="Offline archive written by prometheus_archive.export_archive.")
+    parser.add_argument("--bearer-token", default=os.environ.get("PROMETHEUS_BEARER_TOKEN"),
+                        help="Defaults to $PROMETHEUS_BEARER_TOKEN.")
+    parser.add_argument("--bearer-token-file", help="Read the token from a file (e.g. a service account token).")
+    parser.add_argument("--model-name", default="Qwen/Qwen3-32B-AWQ")
+    parser.add_argument("--namespace", default="experiment-01")
+    parser.add_argument("--variant-name", default="llm-d-inference-scheduling-llm-d-modelservice-decode")
+    parser.add_argument("--gpus-per-replica", type=int, default=1)
+    parser.add_argument("--wva-run", help="Run label compared against the others (default: first containing 'wva').")
+    parser.add_argument("--title", default="Benchmark analysis report")
+    parser.add_argument("--workers", type=int, default=4, help="Stages run in parallel.")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage.")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero when a stage fails.")
+    parser.add_argument("--plotlyjs", choices=["inline", "cdn"], default="inline",
+                        help="Embed plotly.js (self-contained file) or load it from the CDN.")
+    args = parser.parse_args()
+    if not (args.results or args.archive or args.prometheus_url):
+        parser.error("give a results directory, --prometheus-url or --archive")
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    # Keeps discovery (here and in notebooks) out of report.json and .cache
+    # when the output directory is inside the results tree.
+    (args.output / guidellm.REPORT_MARKER).touch()
+    t0 = time.monotonic()
+    stages = build_stages()
+    runs = run_stages(stages, args, ArtifactStore(args.output / ".cache", enabled=not args.no_cache),
+                      inputs_fingerprint(args), workers=args.workers)
+
+    (args.output / "report.html").write_text(render_html(stages, runs, args))
+    (args.output / "report.json").write_text(json.dumps(render_json(stages, runs, args), default=str))
+    failed = [name for name, run in runs.items() if run.state == "failed"]
+    print(f"==> {args.output / 'report.html'} ({time.monotonic() - t0:.1f}s"
+          + (f", {len(failed)} failed stage(s): {', '.join(failed)})" if failed else ")"))
+    sys.exit(1 if failed and args.strict else 0)
+
+
+if __name__ == "__main__":
+    main()
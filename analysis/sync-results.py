@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Incremental sync of a Tekton PipelineRun PVC to ``_in/<pvc>/``.
+
+Like ``fetch-results.sh`` this mounts the PVC in a temporary busybox pod,
+but instead of a full ``oc rsync`` every time it:
+
+  1. lists the remote files matching ``--pattern`` with size and mtime
+     (``find -name ... -exec stat``, plus ``md5sum`` with ``--checksum``);
+  2. diffs the listing against the local ``.sync-manifest.json`` written by
+     the previous sync;
+  3. streams only new or changed files as one compressed tar through
+     ``oc exec`` (zstd when both the pod and this machine have it, gzip
+     otherwise -- busybox ships gzip only);
+  4. rewrites the manifest, which ``data_source.guidellm.discover_runs``
+     reads instead of walking the tree.
+
+After the first fetch, re-syncing a PVC with hundreds of reports only
+transfers what the pipeline wrote since.
+
+Usage:
+    ./sync-results.py <pvc-name> [-n experiment-01]
+    ./sync-results.py <pvc-name> --pattern '*.json'      # reports only, skip logs
+    ./sync-results.py <pvc-name> --checksum --delete
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Read by data_source.guidellm.discover_runs.
+MANIFEST = ".sync-manifest.json"
+REMOTE_ROOT = "/data"
+
+
+def oc(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(["oc", *args], check=True, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Helper pod
+# ---------------------------------------------------------------------------
+
+def start_helper_pod(name: str, namespace: str, pvc: str, image: str) -> None:
+    overrides = {
+        "spec": {
+            "containers": [{
+                "name": "reader",
+                "image": image,
+                "command": ["sleep", "600"],
+                "volumeMounts": [{"name": "data", "mountPath": REMOTE_ROOT}],
+            }],
+            "volumes": [{"name": "data", "persistentVolumeClaim": {"claimName": pvc}}],
+            "nodeSelector": {"kubernetes.io/arch": "amd64"},
+        }
+    }
+    oc("run", name, f"--image={image}", "--restart=Never", "-n", namespace, f"--overrides={json.dumps(overrides)}",
+       stdout=subprocess.DEVNULL)
+    oc("wait", "--for=condition=Ready", f"pod/{name}", "-n", namespace, "--timeout=120s", stdout=subprocess.DEVNULL)
+
+
+def exec_in_pod(pod: str, namespace: str, script: str, **kwargs) -> subprocess.CompletedProcess:
+    return oc("exec", "-i", pod, "-n", namespace, "--", "sh", "-c", script, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Listing and diffing
+# ---------------------------------------------------------------------------
+
+def find_predicate(patterns: Optional[List[str]]) -> str:
+    """``find`` tests selecting regular files whose name matches one of *patterns*."""
+    if not patterns:
+        return "-type f"
+    names = " -o ".join(f"-name {shlex.quote(p)}" for p in patterns)
+    return f"-type f \\( {names} \\)"
+
+
+def list_remote(pod: str, namespace: str, checksum: bool, patterns: Optional[List[str]] = None) -> Dict[str, dict]:
+    """``{relative_path: {"size", "mtime"[, "md5"]}}`` of the PVC files matching *patterns*.
+
+    The patterns are applied by ``find`` in the pod, so ``--checksum`` only
+    reads the files that are synced, not the whole volume.
+    """
+    out = exec_in_pod(
+        pod, namespace, f"cd {REMOTE_ROOT} && find . {find_predicate(patterns)} -exec stat -c '%s %Y %n' {{}} +",
+        capture_output=True, text=True,
+    ).stdout
+    files = {}
+    for line in out.splitlines():
+        size, mtime, path = line.split(" ", 2)
+        files[path[2:]] = {"size": int(size), "mtime": int(mtime)}
+
+    if checksum and files:
+        out = exec_in_pod(
+            pod, namespace, f"cd {REMOTE_ROOT} && find . {find_predicate(patterns)} -exec md5sum {{}} +",
+            capture_output=True, text=True,
+        ).stdout
+        for line in out.splitlines():
+            digest, path = line.split(None, 1)
+            if path[2:] in files:
+                files[path[2:]]["md5"] = digest
+    return files
+
+
+def load_manifest(dest: Path) -> dict:
+    path = dest / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {"files": {}}
+
+
+def changed_files(remote: Dict[str, dict], local: Dict[str, dict], dest: Path) -> List[str]:
+    """Remote files that are new, differ from the manifest entry, or went missing locally."""
+    changed = []
+    for path, meta in remote.items():
+        known = local.get(path)
+        if known is None or not (dest / path).exists():
+            changed.append(path)
+        elif "md5" in meta and "md5" in known:
+            if meta["md5"] != known["md5"]:
+                changed.append(path)
+        elif (meta["size"], meta["mtime"]) != (known["size"], known["mtime"]):
+            changed.append(path)
+    return sorted(changed)
+
+
+# ---------------------------------------------------------------------------
+# Transfer
+# ---------------------------------------------------------------------------
+
+def pick_compression(pod: str, namespace: str, requested: str) -> str:
+    if requested != "auto":
+        return requested
+    remote = exec_in_pod(pod, namespace, "command -v zstd >/dev/null && echo yes || echo no",
+                         capture_output=True, text=True).stdout.strip()
+    return "zstd" if remote == "yes" and shutil.which("zstd") else "gzip"
+
+
+def transfer(pod: str, namespace: str, paths: List[str], dest: Path, compression: str) -> int:
+    """Stream *paths* as one compressed tar into *dest*; returns bytes received."""
+    compress = "zstd -3 -c" if compression == "zstd" else "gzip -c"
+    proc = subprocess.Popen(
+        ["oc", "exec", "-i", pod, "-n", namespace, "--", "sh", "-c",
+         f"cd {REMOTE_ROOT} && tar cf - -T - | {compress}"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    # The file list goes in on stdin, so no argument length limit applies.
+    file_list = io.BytesIO("".join(f"./{p}\n" for p in paths).encode())
+    threading.Thread(target=_pump, args=(file_list, proc.stdin), daemon=True).start()
+
+    counted = _CountingReader(proc.stdout)
+    if compression == "zstd":
+        decompress = subprocess.Popen(["zstd", "-d", "-c"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        feeder = threading.Thread(target=_pump, args=(counted, decompress.stdin), daemon=True)
+        feeder.start()
+        with tarfile.open(fileobj=decompress.stdout, mode="r|") as tar:
+            tar.extractall(dest, filter="data")
+        feeder.join()
+        decompress.wait()
+    else:
+        with tarfile.open(fileobj=counted, mode="r|gz") as tar:
+            tar.extractall(dest, filter="data")
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, "oc exec tar")
+    return counted.count
+
+
+class _CountingReader:
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.raw.read(n)
+        self.count += len(data)
+        return data
+
+
+def _pump(src, dst) -> None:
+    while chunk := src.read(1 << 20):
+        dst.write(chunk)
+    dst.close()
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def _matches(path: str, patterns: Optional[List[str]]) -> bool:
+    return any(fnmatch.fnmatch(Path(path).name, pat) for pat in patterns)
+
+
+def sync(
+    pvc: str,
+    namespace: str,
+    dest: Path,
+    patterns: Optional[List[str]] = None,
+    checksum: bool = False,
+    delete: bool = False,
+    compression: str = "auto",
+    image: str = "busybox",
+) -> dict:
+    dest.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(dest)
+    pod = f"pvc-reader-{os.getpid()}"
+    t0 = time.monotonic()
+
+    print(f"==> Creating helper pod {pod} for PVC {pvc} in {namespace}...")
+    start_helper_pod(pod, namespace, pvc, image)
+    try:
+        remote = list_remote(pod, namespace, checksum, patterns)
+        todo = changed_files(remote, manifest["files"], dest)
+        print(f"==> {len(remote)} remote file(s), {len(todo)} new or changed")
+
+        received = 0
+        if todo:
+            compression = pick_compression(pod, namespace, compression)
+            size = sum(remote[p]["size"] for p in todo)
+            print(f"==> Transferring {size / 1e6:.1f} MB ({compression})...")
+            received = transfer(pod, namespace, todo, dest, compression)
+            print(f"==> Received {received / 1e6:.1f} MB")
+    finally:
+        print(f"==> Cleaning up helper pod {pod}...")
+        subprocess.run(["oc", "delete", "pod", pod, "-n", namespace, "--ignore-not-found", "--wait=false"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # With --pattern only the matching part of the PVC was listed, so only
+    # matching local files can be judged gone.
+    gone = sorted(p for p in set(manifest["files"]) - set(remote) if not patterns or _matches(p, patterns))
+    if delete:
+        for path in gone:
+            (dest / path).unlink(missing_ok=True)
+        print(f"==> Deleted {len(gone)} local file(s) no longer on the PVC")
+
+    files = dict(manifest["files"])
+    files.update(remote)
+    for path in gone if delete else []:
+        files.pop(path, None)
+    manifest = {
+        "pvc": pvc,
+        "namespace": namespace,
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+        "files": dict(sorted(files.items())),
+    }
+    (dest / MANIFEST).write_text(json.dumps(manifest, indent=1))
+    print(f"==> Done in {time.monotonic() - t0:.1f}s: {dest}/{MANIFEST}")
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Incrementally sync a PipelineRun PVC to the local _in/ directory",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("pvc", help="PVC name (list them with `oc get pvc`).")
+    parser.add_argument("-n", "--namespace", default="experiment-01")
+    parser.add_argument("--dest", type=Path, default=Path(__file__).parent / "_in",
+                        help="Parent directory; files land in <dest>/<pvc>/.")
+    parser.add_argument("--pattern", action="append", help="Only sync files whose name matches (repeatable).")
+    parser.add_argument("--checksum", action="store_true", help="Compare md5 instead of size+mtime.")
+    parser.add_argument("--delete", action="store_true",
+                        help="Remove local files that are gone from the PVC (only those matching --pattern, if given).")
+    parser.add_argument("--compression", choices=["auto", "zstd", "gzip"], default="auto")
+    parser.add_argument("--image", default="busybox", help="Helper pod image (needs zstd for zstd transfers).")
+    args = parser.parse_args()
+
+    try:
+        sync(args.pvc, args.namespace, args.dest / args.pvc, args.pattern, args.checksum, args.delete,
+             args.compression, args.image)
+    except subprocess.CalledProcessError as e:
+        print(f"sync failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print("\nHint: use in the notebook as:")
+    print("  from data_source.guidellm import discover_runs")
+    print(f"  GUIDELLM_RESULTS = discover_runs('{args.dest / args.pvc}')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Modules import each other as ``from transform.x import ...`` (scripts run
+# from ``analysis/``), so put that directory on the path.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
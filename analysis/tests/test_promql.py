@@ -0,0 +1,104 @@
+"""
+Semantics of the local PromQL evaluator.
+
+Expected values are derived by hand from the Prometheus engine rules
+(left-open ``(t - range, t]`` windows, ``extrapolatedRate``, step-aligned
+subqueries).
+"""
+
+import numpy as np
+import pytest
+
+from transform.promql import Evaluator, MemorySeriesStore, parse
+
+S = 1000
+
+
+def _counter(labels, start_s, end_s, every_s, per_s=1.0):
+    ts = np.arange(start_s, end_s + 1, every_s, dtype=np.int64) * S
+    return labels, ts, (ts - ts[0]) / S * per_s
+
+
+@pytest.fixture
+def evaluator():
+    store = MemorySeriesStore([
+        _counter({"__name__": "requests_total", "pod": "a"}, 0, 900, 15),
+        _counter({"__name__": "requests_total", "pod": "b"}, 0, 900, 15, per_s=2.0),
+    ])
+    return Evaluator(store)
+
+
+def _one(vector, **labels):
+    key = tuple(sorted(labels.items()))
+    return vector[key]
+
+
+def test_range_window_is_left_open(evaluator):
+    _, value = evaluator.query_range('count_over_time(requests_total{pod="a"}[1m])', 300 * S, 300 * S, 15 * S)
+    # Samples at 255, 270, 285, 300; the one at 240 sits on the open edge.
+    assert _one(value, pod="a")[0] == 4
+
+
+def test_rate_extrapolates_to_window_edges(evaluator):
+    _, value = evaluator.query_range("rate(requests_total[1m])", 300 * S, 600 * S, 60 * S)
+    np.testing.assert_allclose(_one(value, pod="a"), 1.0)
+    np.testing.assert_allclose(_one(value, pod="b"), 2.0)
+
+
+def test_increase_handles_counter_reset():
+    ts = np.arange(0, 61, 15, dtype=np.int64) * S
+    store = MemorySeriesStore([({"__name__": "c"}, ts, np.array([0.0, 15, 30, 5, 20]))])
+    _, value = Evaluator(store).query_range("increase(c[1m])", 60 * S, 60 * S, S)
+    # Samples 15..60 (45 s, +35 after undoing the reset) extrapolated by the
+    # 15 s gap to the window start: 35 * 60 / 45.
+    np.testing.assert_allclose(value[()][0], 35 * 60 / 45)
+
+
+def test_instant_selector_goes_stale_after_lookback(evaluator):
+    eval_ts, value = evaluator.query_range('requests_total{pod="a"}', 900 * S, 1300 * S, 100 * S)
+    series = _one(value, __name__="requests_total", pod="a")
+    np.testing.assert_array_equal(eval_ts // S, [900, 1000, 1100, 1200, 1300])
+    np.testing.assert_array_equal(series[:3], 900.0)
+    assert np.isnan(series[3:]).all()
+
+
+def test_sum_by_drops_other_labels(evaluator):
+    _, value = evaluator.query_range("sum(rate(requests_total[1m]))", 300 * S, 300 * S, S)
+    np.testing.assert_allclose(value[()], 3.0)
+
+
+@pytest.mark.parametrize("eval_s, first_s", [(300, 60), (290, 60), (330, 120)])
+def test_subquery_grid_starts_at_first_aligned_step(evaluator, eval_s, first_s):
+    # First multiple of the step at or after ``eval - range``, like the
+    # Prometheus engine; a floored start would put one point before it.
+    expr = parse('requests_total{pod="a"}[4m:1m]')
+    (labels, ts, _), = evaluator._matrix(expr, np.array([eval_s * S]))
+    assert ts[0] == first_s * S
+    assert np.all(np.diff(ts) == 60 * S)
+
+
+def test_subquery_honours_offset(evaluator):
+    expr = parse('requests_total{pod="a"}[2m:1m] offset 30s')
+    (_, ts, values), = evaluator._matrix(expr, np.array([330 * S]))
+    # Inner grid 180, 240, 300 evaluated 30 s earlier, reported on the
+    # outer time axis.
+    np.testing.assert_array_equal(ts // S, [210, 270, 330])
+    np.testing.assert_array_equal(values, [180.0, 240.0, 300.0])
+
+
+def test_max_over_subquery_matches_range_query(evaluator):
+    _, value = evaluator.query_range('max_over_time(rate(requests_total{pod="b"}[1m])[5m:1m])', 600 * S, 600 * S, S)
+    np.testing.assert_allclose(_one(value, pod="b"), 2.0)
+
+
+def test_histogram_quantile_interpolates_within_bucket():
+    ts = np.arange(0, 121, 30, dtype=np.int64) * S
+    store = MemorySeriesStore([
+        ({"__name__": "h_bucket", "le": "0.1"}, ts, ts / S * 0.0),
+        ({"__name__": "h_bucket", "le": "0.2"}, ts, ts / S * 1.0),
+        ({"__name__": "h_bucket", "le": "+Inf"}, ts, ts / S * 1.0),
+    ])
+    _, value = Evaluator(store).query_range(
+        "histogram_quantile(0.5, sum by (le) (rate(h_bucket[1m])))", 120 * S, 120 * S, S,
+    )
+    np.testing.assert_allclose(value[()], 0.15)
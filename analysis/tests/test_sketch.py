@@ -0,0 +1,82 @@
+"""DDSketch accuracy, merging and serialization."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transform.sketch import DDSketch, accuracy_report
+
+QUANTILES = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0]
+
+
+def _data(kind: str, n: int = 20_000) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    if kind == "lognormal":
+        return rng.lognormal(mean=0.0, sigma=1.5, size=n)
+    if kind == "exponential":
+        return rng.exponential(scale=2.0, size=n)
+    if kind == "zero_heavy":
+        # 60% zeros (e.g. TTFT of errored requests), the rest lognormal.
+        return np.where(rng.random(n) < 0.6, 0.0, rng.lognormal(mean=-2.0, sigma=1.0, size=n))
+    raise ValueError(kind)
+
+
+@pytest.mark.parametrize("kind", ["lognormal", "exponential", "zero_heavy"])
+@pytest.mark.parametrize("parts", [1, 7])
+def test_quantiles_within_relative_accuracy(kind, parts):
+    report = accuracy_report(_data(kind), QUANTILES, relative_accuracy=0.01, parts=parts)
+    assert report["within_bound"].all(), report[~report["within_bound"]]
+
+
+def test_zero_quantile_matching_exactly_is_within_bound():
+    report = accuracy_report(_data("zero_heavy"), [0.1, 0.5], relative_accuracy=0.01)
+    assert (report["exact_lower"] == 0).all()
+    assert (report["sketch"] == 0).all()
+    assert (report["rel_error_lower"] == 0).all()
+    assert report["within_bound"].all()
+
+
+def test_split_and_merge_equals_single_sketch():
+    values = _data("lognormal")
+    whole = DDSketch.from_values(values)
+    merged = DDSketch.merge_all(DDSketch.from_values(chunk) for chunk in np.array_split(values, 5))
+    assert merged.count == whole.count
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+    np.testing.assert_array_equal(merged.quantile(QUANTILES), whole.quantile(QUANTILES))
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
+
+
+def test_merge_all_of_nothing_is_none():
+    assert DDSketch.merge_all([]) is None
+
+
+@pytest.mark.parametrize("kind", ["lognormal", "exponential", "zero_heavy"])
+def test_json_round_trip(kind):
+    sketch = DDSketch.from_values(_data(kind), relative_accuracy=0.02)
+    restored = DDSketch.from_json(sketch.to_json())
+    assert restored.relative_accuracy == sketch.relative_accuracy
+    assert restored.count == sketch.count
+    assert restored.zero_count == sketch.zero_count
+    assert (restored.min, restored.max) == (sketch.min, sketch.max)
+    np.testing.assert_array_equal(restored.quantile(QUANTILES), sketch.quantile(QUANTILES))
+    # A restored sketch keeps merging like the original.
+    extra = DDSketch.from_values(_data("exponential", 100), relative_accuracy=0.02)
+    np.testing.assert_array_equal(
+        restored.merge(extra).quantile(QUANTILES), sketch.merge(extra).quantile(QUANTILES),
+    )
+
+
+def test_empty_sketch():
+    sketch = DDSketch.from_json(DDSketch().to_json())
+    assert sketch.count == 0
+    assert np.isnan(sketch.quantile(0.5))
+    assert np.isnan(sketch.quantile([0.5, 0.9])).all()
+
+
+def test_nan_is_ignored():
+    sketch = DDSketch.from_values(pd.Series([1.0, np.nan, 2.0, np.nan]))
+    assert sketch.count == 2
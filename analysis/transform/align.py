@@ -0,0 +1,146 @@
+"""
+Time-aligned join of per-request rows with Prometheus series.
+
+GuideLLM requests carry unix-second timestamps while Prometheus frames
+(``transform.matrix.matrix_to_frame``) carry naive *local* datetimes.
+:func:`join_series_asof` projects the requests into the same naive-local
+frame with :func:`transform.matrix.as_local_datetime64`, sorts them once,
+and ``merge_asof``-s every series onto them, so each request gets e.g. the
+replica count, KV-cache utilization and queue depth last scraped before it
+was sent.  :func:`latency_breakdown` then groups latencies by any of those
+columns.
+"""
+
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from transform.matrix import as_local_datetime64
+
+_AGGREGATIONS = ("sum", "mean", "max", "min")
+
+
+def _reduce_series(frame: pd.DataFrame, name: str, how: str, by: Optional[str]) -> pd.DataFrame:
+    """One value per (``by``, timestamp): ``[by,] _t, <name>`` sorted by ``_t``.
+
+    Label columns other than *by* are collapsed with *how* (e.g. replicas
+    summed over accelerators, KV-cache utilization averaged over pods).
+    """
+    if how not in _AGGREGATIONS:
+        raise ValueError(f"how must be one of {_AGGREGATIONS}, got {how!r}")
+    keys = [by] if by and by in frame.columns else []
+    out = frame[[*keys, "timestamp", "value"]].copy()
+    out["_t"] = as_local_datetime64(out.pop("timestamp"))
+    out = out.dropna(subset=["_t"])
+    out = out.groupby([*keys, "_t"], as_index=False, sort=False)["value"].agg(how)
+    return out.rename(columns={"value": name}).sort_values("_t", kind="stable")
+
+
+def join_series_asof(
+    requests_df: pd.DataFrame,
+    series: Dict[str, pd.DataFrame],
+    time_col: str = "request_start_time",
+    by: Optional[str] = "run",
+    tolerance: Optional[str] = "1m",
+    direction: str = "backward",
+    how: Union[str, Dict[str, str]] = "sum",
+) -> pd.DataFrame:
+    """Attach the value of each Prometheus series at every request's time.
+
+    Parameters
+    ----------
+    requests_df
+        Per-request rows (``guidellm.load_runs`` output); *time_col* may be
+        unix seconds, naive local or tz-aware datetimes.
+    series
+        ``{column_name: frame}`` of long-form ``(timestamp, [labels...],
+        value)`` frames, e.g. from ``prometheus.get_run_series``.  Frames
+        with a *by* column are matched per run.
+    by
+        Column matched exactly before the nearest-time match (``None`` to
+        match on time only).
+    tolerance
+        Maximum distance to the matched sample; farther requests get NaN.
+    direction
+        ``merge_asof`` direction: ``"backward"`` takes the last sample at or
+        before the request (what the system looked like when it was sent).
+    how
+        Aggregation over series sharing a timestamp, globally or per column.
+
+    Returns
+    -------
+    *requests_df* in its original order and index, plus one column per series.
+    """
+    out = requests_df.copy()
+    for name in series:
+        out[name] = np.nan
+    if out.empty:
+        return out
+
+    t = as_local_datetime64(out[time_col])
+    valid = np.flatnonzero(~np.isnat(t))
+    # Sorted once; every series is merged onto the same ordering.
+    order = valid[np.argsort(t[valid], kind="stable")]
+    left = pd.DataFrame({"_row": order, "_t": t[order]})
+    use_by = by is not None and by in out.columns
+    if use_by:
+        left[by] = out[by].to_numpy()[order]
+
+    tol = pd.Timedelta(tolerance) if tolerance else None
+    for name, frame in series.items():
+        if frame is None or frame.empty:
+            continue
+        agg = how.get(name, "sum") if isinstance(how, dict) else how
+        right = _reduce_series(frame, name, agg, by if use_by else None)
+        match_by = by if use_by and by in right.columns else None
+        merged = pd.merge_asof(
+            left[["_row", "_t", *([by] if match_by else [])]], right,
+            on="_t", by=match_by, tolerance=tol, direction=direction,
+        )
+        values = np.full(len(out), np.nan)
+        values[merged["_row"].to_numpy()] = merged[name].to_numpy(dtype=float)
+        out[name] = values
+    return out
+
+
+def latency_breakdown(
+    aligned: pd.DataFrame,
+    column: str,
+    metrics: Sequence[str] = ("ttft_ms", "request_latency_s"),
+    bins: Optional[Union[int, Sequence[float]]] = None,
+    quantiles: Optional[List[float]] = None,
+    by: Optional[str] = "run",
+) -> pd.DataFrame:
+    """Latency percentiles grouped by a joined context column.
+
+    ``latency_breakdown(aligned, "replicas")`` gives P50/P90/P99 TTFT and
+    E2E latency for requests sent at each replica count; pass *bins* (as
+    for ``pd.cut``) for continuous columns such as queue depth.  Only
+    successful requests are used.
+
+    Returns
+    -------
+    [by |] <column> | metric | count | P50 | P90 | P99
+    """
+    if quantiles is None:
+        quantiles = [0.5, 0.9, 0.99]
+    df = aligned
+    if "status" in df.columns:
+        df = df[df["status"] == "successful"]
+    df = df.dropna(subset=[column])
+    keys = [by] if by and by in df.columns else []
+    group = pd.cut(df[column], bins) if bins is not None else df[column]
+    frames = []
+    for metric in metrics:
+        if metric not in df.columns:
+            continue
+        grouped = df[metric].groupby([*(df[k] for k in keys), group.rename(column)], observed=True)
+        table = grouped.quantile(quantiles).unstack()
+        table.columns = [f"P{format(q * 100, 'g')}" for q in quantiles]
+        table.insert(0, "count", grouped.count())
+        table.insert(0, "metric", metric)
+        frames.append(table.reset_index())
+    if not frames:
+        return pd.DataFrame(columns=[*keys, column, "metric", "count", *[f"P{format(q * 100, 'g')}" for q in quantiles]])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,171 @@
+"""
+Native-resolution histogram bucket counters with local PromQL functions.
+
+``get_histogram_quantiles`` asks Prometheus for
+``histogram_quantile(p, sum by (le) (rate(<metric>_bucket[interval])))`` at
+a given step, so every change of interval or step is a new round of
+queries.  A :class:`BucketMatrix` holds the raw cumulative ``*_bucket``
+counters instead -- one ``(time × le)`` matrix per series (e.g. per pod) --
+and recomputes ``rate``/``increase`` (with Prometheus' extrapolation and
+counter-reset handling, see ``transform.promql.extrapolated_rate``) and
+``histogram_quantile`` for any interval/step locally.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from transform.histogram import HistogramDistribution, histogram_quantile_matrix, parse_le
+from transform.matrix import decode_values_raw
+from transform.promql import Labels, RawSeries, extrapolated_rate, labels_key
+
+
+class BucketMatrix:
+    """Cumulative bucket counters of one histogram metric.
+
+    Parameters
+    ----------
+    upper_bounds
+        Sorted ``le`` bounds shared by every series (``+Inf`` last).
+    series
+        ``(labels, timestamps_ms, cumulative)`` per series, *labels* without
+        ``le``/``__name__`` and *cumulative* of shape ``(n_samples,
+        n_buckets)``; NaN marks a bucket not scraped at that timestamp.
+    """
+
+    def __init__(self, upper_bounds: Sequence[float], series: List[Tuple[Dict[str, str], np.ndarray, np.ndarray]]):
+        self.upper_bounds = np.asarray(upper_bounds, dtype=float)
+        self.series = series
+        self._cache: Dict[Tuple, Tuple[np.ndarray, Dict[Labels, np.ndarray]]] = {}
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_raw_series(cls, raw: Iterable[RawSeries]) -> "BucketMatrix":
+        """Build from per-``le`` raw series ``(labels, timestamps_ms, values)``."""
+        groups: Dict[Labels, Dict[float, Tuple[np.ndarray, np.ndarray]]] = {}
+        labels_of: Dict[Labels, Dict[str, str]] = {}
+        for labels, ts, values in raw:
+            labels = dict(labels)
+            le = labels.pop("le", None)
+            if le is None:
+                continue
+            labels.pop("__name__", None)
+            key = labels_key(labels)
+            labels_of[key] = labels
+            groups.setdefault(key, {})[parse_le(le)] = (np.asarray(ts, dtype=np.int64), np.asarray(values, dtype=float))
+
+        uppers = np.array(sorted({u for buckets in groups.values() for u in buckets}))
+        series = []
+        for key, buckets in groups.items():
+            ts = np.unique(np.concatenate([t for t, _ in buckets.values()]))
+            cum = np.full((ts.size, uppers.size), np.nan)
+            for upper, (t, v) in buckets.items():
+                cum[np.searchsorted(ts, t), np.searchsorted(uppers, upper)] = v
+            series.append((labels_of[key], ts, cum))
+        return cls(uppers, series)
+
+    @classmethod
+    def from_prometheus(cls, results: List[dict]) -> "BucketMatrix":
+        """Build from a ``matrix`` result of raw ``*_bucket`` samples."""
+        raw = []
+        for s in results or []:
+            seconds, values = decode_values_raw(s.get("values"))
+            raw.append((s.get("metric", {}), np.round(seconds * 1000).astype(np.int64), values))
+        return cls.from_raw_series(raw)
+
+    # -- properties ---------------------------------------------------------
+
+    @property
+    def window(self) -> Tuple[int, int]:
+        """``(first, last)`` sample timestamp in ms."""
+        starts = [ts[0] for _, ts, _ in self.series if ts.size]
+        ends = [ts[-1] for _, ts, _ in self.series if ts.size]
+        return (int(min(starts)), int(max(ends))) if starts else (0, 0)
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __repr__(self) -> str:
+        samples = sum(ts.size for _, ts, _ in self.series)
+        return f"BucketMatrix(series={len(self)}, buckets={self.upper_bounds.size}, samples={samples})"
+
+    # -- PromQL equivalents -------------------------------------------------
+
+    def _grid(self, step_ms: int, start_ms: Optional[int], end_ms: Optional[int]) -> np.ndarray:
+        first, last = self.window
+        start_ms = first if start_ms is None else start_ms
+        end_ms = last if end_ms is None else end_ms
+        return np.arange(start_ms, end_ms + 1, step_ms, dtype=np.int64)
+
+    def rate(
+        self,
+        range_ms: int,
+        step_ms: int,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        by: Sequence[str] = (),
+        func: str = "rate",
+    ) -> Tuple[np.ndarray, Dict[Labels, np.ndarray]]:
+        """``sum by (le, <by>) (<func>(<metric>_bucket[range]))`` on a step grid.
+
+        Returns ``(eval_ts, {group: (n_steps, n_buckets)})``; results are
+        cached per arguments, so sweeping quantiles is free.
+        """
+        if func not in ("rate", "increase"):
+            raise ValueError(f"func must be 'rate' or 'increase', got {func!r}")
+        cache_key = (range_ms, step_ms, start_ms, end_ms, tuple(by), func)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
+
+        eval_ts = self._grid(step_ms, start_ms, end_ms)
+        is_rate = func == "rate"
+        sums: Dict[Labels, np.ndarray] = {}
+        for labels, ts, cum in self.series:
+            if np.isnan(cum).any():
+                res = np.full((eval_ts.size, cum.shape[1]), np.nan)
+                for j in range(cum.shape[1]):
+                    ok = ~np.isnan(cum[:, j])
+                    res[:, j] = extrapolated_rate(ts[ok], cum[ok, j], eval_ts, range_ms, is_rate=is_rate)
+            else:
+                res = extrapolated_rate(ts, cum, eval_ts, range_ms, is_rate=is_rate)
+            group = tuple((k, v) for k, v in labels_key(labels) if k in by)
+            if group in sums:
+                acc = sums[group]
+                sums[group] = np.where(np.isnan(acc), res, np.where(np.isnan(res), acc, acc + res))
+            else:
+                sums[group] = res
+        self._cache[cache_key] = (eval_ts, sums)
+        return eval_ts, sums
+
+    def increase(self, range_ms: int, step_ms: int, start_ms: Optional[int] = None, end_ms: Optional[int] = None, by: Sequence[str] = ()):
+        """Like :meth:`rate` for ``increase``."""
+        return self.rate(range_ms, step_ms, start_ms, end_ms, by, func="increase")
+
+    def histogram_quantile(
+        self,
+        q: float,
+        range_ms: int,
+        step_ms: int,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        by: Sequence[str] = (),
+    ) -> Tuple[np.ndarray, Dict[Labels, np.ndarray]]:
+        """``histogram_quantile(q, sum by (le, <by>) (rate(...[range])))`` per step.
+
+        Steps where a group has no rate at all are NaN.
+        """
+        eval_ts, rates = self.rate(range_ms, step_ms, start_ms, end_ms, by)
+        return eval_ts, {
+            group: histogram_quantile_matrix(q, self.upper_bounds, r.T)
+            for group, r in rates.items()
+        }
+
+    def distribution(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> HistogramDistribution:
+        """Observations in ``(start, end]`` as one distribution (``increase`` over the window)."""
+        first, last = self.window
+        start_ms = first if start_ms is None else start_ms
+        end_ms = last if end_ms is None else end_ms
+        _, increases = self.increase(end_ms - start_ms, max(end_ms - start_ms, 1), end_ms, end_ms)
+        total = np.nansum([inc[0] for inc in increases.values()], axis=0) if increases else np.zeros(self.upper_bounds.size)
+        return HistogramDistribution.from_cumulative(self.upper_bounds, total)
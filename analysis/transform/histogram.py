@@ -0,0 +1,487 @@
+"""
+Exact bucketed distributions built from Prometheus ``*_bucket`` series.
+
+A :class:`HistogramDistribution` keeps only the bucket upper bounds (``le``)
+and the number of observations that fell in each bucket, so it is a few
+hundred bytes per run regardless of how many requests were served.  It
+replaces the synthetic random samples produced by
+``transform.sampling.histogram_to_samples_global``: quantiles follow the
+same linear interpolation as PromQL ``histogram_quantile`` and density
+curves are deterministic.
+
+:class:`HistogramAccumulator` and :func:`histogram_time_slices` build the
+same objects step by step from range results, keeping the per-step bucket
+deltas instead of averaging each bucket's rate over the whole window, so
+latency can also be followed over time (heatmaps around scale-out events).
+"""
+
+import math
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+def parse_le(le: str) -> float:
+    """Convert a Prometheus ``le`` label value into a float upper bound."""
+    return math.inf if le in ("+Inf", "Inf", "inf") else float(le)
+
+
+class HistogramDistribution:
+    """Bucket upper bounds plus per-bucket (non-cumulative) counts.
+
+    Counts do not need to be integers: a distribution built from
+    ``rate()`` results carries counts in events/s summed over steps, which
+    is proportional to the true event count and therefore gives the same
+    quantiles, CDF and mean.
+    """
+
+    def __init__(self, upper_bounds: Iterable[float], counts: Iterable[float]):
+        uppers = np.asarray(list(upper_bounds), dtype=float)
+        counts = np.asarray(list(counts), dtype=float)
+        if uppers.shape != counts.shape:
+            raise ValueError("upper_bounds and counts must have the same length")
+        order = np.argsort(uppers, kind="stable")
+        self.upper_bounds = uppers[order]
+        self.counts = np.clip(np.nan_to_num(counts[order]), 0.0, None)
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_cumulative(
+        cls, upper_bounds: Iterable[float], cumulative: Iterable[float],
+    ) -> "HistogramDistribution":
+        """Build from cumulative bucket counts, as exposed by ``*_bucket``.
+
+        Non-monotonic cumulative counts (which happen with ``rate()`` noise
+        across buckets) are clipped the same way ``histogram_quantile`` does.
+        """
+        uppers = np.asarray(list(upper_bounds), dtype=float)
+        cum = np.nan_to_num(np.asarray(list(cumulative), dtype=float))
+        order = np.argsort(uppers, kind="stable")
+        uppers, cum = uppers[order], np.maximum.accumulate(cum[order]) if cum.size else cum
+        counts = np.diff(cum, prepend=0.0)
+        return cls(uppers, counts)
+
+    @classmethod
+    def from_prometheus(cls, prom_results, scale: float = 1.0) -> "HistogramDistribution":
+        """Build from a ``sum by (le)`` range or instant query result.
+
+        Each ``le`` series is summed over all its points (NaN points are
+        ignored), then de-cumulated into per-bucket counts.  *scale* is
+        applied to every count, e.g. the step in seconds to turn summed
+        ``rate()`` values into event counts.
+        """
+        uppers: List[float] = []
+        totals: List[float] = []
+        for series in prom_results or []:
+            le = series.get("metric", {}).get("le")
+            if le is None:
+                continue
+            values = series.get("values") or ([series["value"]] if "value" in series else [])
+            if not values:
+                continue
+            arr = np.asarray([v[1] for v in values], dtype=float)
+            uppers.append(parse_le(le))
+            totals.append(float(np.nansum(arr)) * scale)
+        return cls.from_cumulative(uppers, totals)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "HistogramDistribution":
+        """Inverse of :meth:`to_frame`."""
+        return cls(df["le"].to_numpy(dtype=float), df["count"].to_numpy(dtype=float))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return a two-column DataFrame (``le``, ``count``) suitable for Parquet."""
+        return pd.DataFrame({"le": self.upper_bounds, "count": self.counts})
+
+    # -- basic properties ---------------------------------------------------
+
+    @property
+    def total(self) -> float:
+        return float(self.counts.sum())
+
+    @property
+    def lower_bounds(self) -> np.ndarray:
+        """Lower edge of every bucket (0 for the first, like ``histogram_quantile``)."""
+        lower = np.concatenate(([0.0], self.upper_bounds[:-1]))
+        if self.upper_bounds.size and self.upper_bounds[0] <= 0:
+            lower[0] = self.upper_bounds[0]
+        return lower
+
+    def _finite_upper_bounds(self) -> np.ndarray:
+        """Upper bounds with the ``+Inf`` bucket collapsed onto the last finite bound."""
+        uppers = self.upper_bounds.copy()
+        finite = uppers[np.isfinite(uppers)]
+        last = finite[-1] if finite.size else 0.0
+        uppers[~np.isfinite(uppers)] = last
+        return uppers
+
+    def __len__(self) -> int:
+        return int(self.upper_bounds.size)
+
+    def __repr__(self) -> str:
+        return f"HistogramDistribution(buckets={len(self)}, total={self.total:g})"
+
+    # -- statistics ---------------------------------------------------------
+
+    def quantile(self, q: Union[float, Iterable[float]]) -> Union[float, np.ndarray]:
+        """Quantile(s) with PromQL ``histogram_quantile`` interpolation.
+
+        Values falling in the ``+Inf`` bucket are reported as the highest
+        finite upper bound, exactly as Prometheus does.
+        """
+        scalar = np.ndim(q) == 0
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        out = np.full(qs.shape, np.nan)
+        total = self.total
+        if total <= 0 or not len(self):
+            return float(out[0]) if scalar else out
+
+        cum = np.cumsum(self.counts)
+        uppers = self._finite_upper_bounds()
+        lowers = self.lower_bounds
+        valid = (qs >= 0) & (qs <= 1)
+        rank = qs[valid] * total
+        b = np.minimum(np.searchsorted(cum, rank, side="left"), len(cum) - 1)
+        prev_cum = np.where(b > 0, cum[b - 1], 0.0)
+        in_bucket = self.counts[b]
+        frac = np.divide(rank - prev_cum, in_bucket, out=np.ones_like(rank), where=in_bucket > 0)
+        res = lowers[b] + (uppers[b] - lowers[b]) * frac
+        res = np.where(np.isinf(self.upper_bounds[b]), uppers[b], res)
+        out[valid] = res
+        out[qs < 0] = -np.inf
+        out[qs > 1] = np.inf
+        return float(out[0]) if scalar else out
+
+    def cdf(self, x: Union[float, Iterable[float]]) -> Union[float, np.ndarray]:
+        """Fraction of observations ``<= x``, linear within each bucket."""
+        scalar = np.ndim(x) == 0
+        xs = np.atleast_1d(np.asarray(x, dtype=float))
+        total = self.total
+        if total <= 0:
+            out = np.full(xs.shape, np.nan)
+            return float(out[0]) if scalar else out
+        finite = np.isfinite(self.upper_bounds)
+        edges = np.concatenate(([self.lower_bounds[0]], self.upper_bounds[finite]))
+        cum = np.concatenate(([0.0], np.cumsum(self.counts)[finite])) / total
+        out = np.interp(xs, edges, cum, left=0.0, right=cum[-1])
+        out = np.where(xs == np.inf, 1.0, out)
+        return float(out[0]) if scalar else out
+
+    def mean(self) -> float:
+        """Mean using bucket midpoints (``+Inf`` bucket at the last finite bound)."""
+        total = self.total
+        if total <= 0:
+            return np.nan
+        mids = (self.lower_bounds + self._finite_upper_bounds()) / 2
+        return float((mids * self.counts).sum() / total)
+
+    # -- combination --------------------------------------------------------
+
+    def merge(self, other: "HistogramDistribution") -> "HistogramDistribution":
+        """Combine two distributions (e.g. two runs or two instances).
+
+        Identical bucket layouts are summed exactly; different layouts are
+        re-binned onto the union of bounds by interpolating each CDF.
+        """
+        if np.array_equal(self.upper_bounds, other.upper_bounds):
+            return HistogramDistribution(self.upper_bounds, self.counts + other.counts)
+        uppers = np.union1d(self.upper_bounds, other.upper_bounds)
+        cum = np.zeros_like(uppers)
+        for d in (self, other):
+            if d.total > 0:
+                cum += np.nan_to_num(np.asarray(d.cdf(uppers))) * d.total
+        return HistogramDistribution.from_cumulative(uppers, cum)
+
+    __add__ = merge
+
+    @staticmethod
+    def merge_all(dists: Iterable["HistogramDistribution"]) -> Optional["HistogramDistribution"]:
+        merged = None
+        for d in dists:
+            merged = d if merged is None else merged.merge(d)
+        return merged
+
+    # -- plotting -----------------------------------------------------------
+
+    def density(self, inf_bucket_factor: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Piecewise-constant probability density as ``(x, y)`` step arrays.
+
+        The arrays trace the outline of the histogram (two points per bucket
+        edge) and integrate to 1, so they can be fed directly to a plotly
+        ``Scatter`` trace.  The open-ended ``+Inf`` bucket is drawn up to
+        ``inf_bucket_factor`` times the last finite bound.
+        """
+        total = self.total
+        if total <= 0:
+            return np.array([]), np.array([])
+        lowers = self.lower_bounds
+        uppers = self.upper_bounds.copy()
+        inf = ~np.isfinite(uppers)
+        uppers[inf] = np.maximum(lowers[inf] * inf_bucket_factor, lowers[inf])
+        width = uppers - lowers
+        dens = np.divide(self.counts / total, width, out=np.zeros_like(width), where=width > 0)
+        x = np.stack([lowers, uppers], axis=1).ravel()
+        y = np.repeat(dens, 2)
+        return x, y
+
+
+def distributions_p_table(
+    distributions_by_metric: Dict[str, Dict[str, HistogramDistribution]],
+    quantiles: Optional[List[float]] = None,
+) -> pd.DataFrame:
+    """Percentile table from already-fetched distributions (no extra queries).
+
+    *distributions_by_metric* maps ``metric -> {run -> distribution}``, e.g.
+    ``{"E2E": custom_query_range_by_run(..., samples_generator_histogram_distribution)}``.
+    The output has the same layout as
+    ``data_source.prometheus.get_histograms_p_tables_by_run``.
+    """
+    if quantiles is None:
+        quantiles = [0.1, 0.25, 0.5, 0.75, 0.90, 0.95, 0.99]
+    cols = [f"P{int(p * 100)}" for p in quantiles]
+    rows = []
+    for metric, by_run in distributions_by_metric.items():
+        for run_label, dist in by_run.items():
+            values = dist.quantile(quantiles)
+            rows.append({"Run": run_label, "Metric": metric, **dict(zip(cols, map(float, values)))})
+    return pd.DataFrame(rows, columns=["Run", "Metric"] + cols)
+
+
+def histogram_quantile_matrix(q: float, upper_bounds: Iterable[float], cumulative: np.ndarray) -> np.ndarray:
+    """PromQL ``histogram_quantile`` evaluated for many steps at once.
+
+    Parameters
+    ----------
+    q
+        Quantile in ``[0, 1]`` (values outside give ``±inf`` as in PromQL).
+    upper_bounds
+        Sorted bucket upper bounds, ``+Inf`` last.
+    cumulative
+        ``(n_buckets, n_steps)`` cumulative bucket values (counts or rates).
+        A NaN bucket is treated as absent for that step.
+
+    Returns
+    -------
+    ``(n_steps,)`` array, NaN where PromQL returns no value.
+    """
+    uppers = np.asarray(list(upper_bounds), dtype=float)
+    cum = np.asarray(cumulative, dtype=float)
+    if cum.ndim == 1:
+        cum = cum[:, None]
+    n = cum.shape[1]
+    if np.isnan(q):
+        return np.full(n, np.nan)
+    if q < 0 or q > 1:
+        return np.full(n, -np.inf if q < 0 else np.inf)
+    if uppers.size < 2 or not np.isinf(uppers[-1]):
+        return np.full(n, np.nan)
+
+    gaps = np.isnan(cum).any(axis=0)
+    out = np.full(n, np.nan)
+    for j in np.flatnonzero(gaps):
+        present = ~np.isnan(cum[:, j])
+        out[j] = histogram_quantile_matrix(q, uppers[present], cum[present, j])[0]
+
+    full = ~gaps
+    if not full.any():
+        return out
+    cum = np.maximum.accumulate(cum[:, full], axis=0)
+    total = cum[-1]
+    rank = q * total
+    # First bucket whose cumulative value reaches the rank, searched among
+    # the finite buckets only (landing in +Inf reports the last finite bound).
+    b = np.minimum((cum[:-1] < rank).sum(axis=0), uppers.size - 1)
+    cols = np.arange(b.size)
+    prev = np.where(b > 0, cum[np.maximum(b - 1, 0), cols], 0.0)
+    start = np.where(b > 0, uppers[np.maximum(b - 1, 0)], 0.0)
+    end = uppers[b]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res = start + (end - start) * ((rank - prev) / (cum[b, cols] - prev))
+    res = np.where(b == uppers.size - 1, uppers[-2], res)
+    res = np.where((b == 0) & (uppers[0] <= 0), uppers[0], res)
+    res = np.where(total > 0, res, np.nan)
+    out[full] = res
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Streaming accumulation of per-step bucket deltas
+# ---------------------------------------------------------------------------
+
+def iter_histogram_steps(prom_results) -> Iterator[Tuple[float, np.ndarray, np.ndarray]]:
+    """Walk a ``sum by (le)`` range result one evaluation step at a time.
+
+    Yields ``(timestamp, upper_bounds, cumulative)`` where *cumulative*
+    holds the value of every ``le`` series at that step (NaN when a series
+    has no point there).  Only one cursor per bucket series is kept, so
+    nothing beyond the raw API payload is materialized.
+    """
+    series = [
+        (parse_le(s["metric"]["le"]), s.get("values") or [])
+        for s in prom_results or []
+        if "le" in s.get("metric", {})
+    ]
+    series.sort(key=lambda x: x[0])
+    uppers = np.asarray([u for u, _ in series], dtype=float)
+    cursors = [0] * len(series)
+    while True:
+        heads = [
+            float(values[c][0]) for (_, values), c in zip(series, cursors) if c < len(values)
+        ]
+        if not heads:
+            return
+        ts = min(heads)
+        cum = np.full(len(series), np.nan)
+        for i, (_, values) in enumerate(series):
+            c = cursors[i]
+            if c < len(values) and float(values[c][0]) == ts:
+                cum[i] = float(values[c][1])
+                cursors[i] = c + 1
+        yield ts, uppers, cum
+
+
+class HistogramAccumulator:
+    """Running per-bucket counts fed one evaluation step at a time.
+
+    Memory is O(buckets) no matter how long the window is.  Each step adds
+    the per-bucket deltas of that step, weighted according to *weighting*:
+
+    - ``"volume"`` (default): steps contribute proportionally to the number
+      of requests they observed -- equivalent to one big ``increase()``.
+    - ``"uniform"``: every step contributes the same total weight, so quiet
+      periods count as much as busy ones.
+    - a callable ``(timestamp, volume) -> weight`` applied to the step's
+      normalized distribution.
+    """
+
+    def __init__(self, weighting: Union[str, Callable[[float, float], float]] = "volume"):
+        if isinstance(weighting, str) and weighting not in ("volume", "uniform"):
+            raise ValueError(f"unknown weighting {weighting!r}")
+        self.weighting = weighting
+        self.upper_bounds: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+        self.steps = 0
+
+    def reset(self) -> None:
+        if self.counts is not None:
+            self.counts[:] = 0.0
+        self.steps = 0
+
+    def add_step(self, timestamp: float, upper_bounds: np.ndarray, cumulative: np.ndarray) -> None:
+        """Add one step of cumulative (over ``le``) bucket values."""
+        if self.upper_bounds is None:
+            self.upper_bounds = np.asarray(upper_bounds, dtype=float)
+            self.counts = np.zeros(len(self.upper_bounds))
+        elif len(upper_bounds) != len(self.upper_bounds):
+            raise ValueError("bucket layout changed between steps")
+
+        cum = np.maximum.accumulate(np.nan_to_num(np.asarray(cumulative, dtype=float)))
+        deltas = np.diff(cum, prepend=0.0)
+        volume = cum[-1] if cum.size else 0.0
+        if volume <= 0:
+            return
+
+        if self.weighting == "volume":
+            weight = 1.0
+        elif self.weighting == "uniform":
+            weight = 1.0 / volume
+        else:
+            weight = float(self.weighting(timestamp, volume)) / volume
+        self.counts += deltas * weight
+        self.steps += 1
+
+    def distribution(self) -> HistogramDistribution:
+        if self.upper_bounds is None:
+            return HistogramDistribution([], [])
+        return HistogramDistribution(self.upper_bounds, self.counts)
+
+
+def _counter_step_deltas(prom_results) -> Iterator[Tuple[float, np.ndarray, np.ndarray]]:
+    """Turn raw cumulative ``*_bucket`` counters into per-step increases.
+
+    Counter resets (value lower than on the previous step) restart from the
+    new value, as ``increase()`` does.
+    """
+    prev: Optional[np.ndarray] = None
+    for ts, uppers, cum in iter_histogram_steps(prom_results):
+        if prev is not None:
+            delta = cum - prev
+            delta = np.where(delta < 0, cum, delta)
+            yield ts, uppers, delta
+        prev = np.where(np.isnan(cum), prev if prev is not None else np.nan, cum)
+
+
+def stream_histogram(
+    prom_results,
+    weighting: Union[str, Callable[[float, float], float]] = "volume",
+    counters: bool = False,
+) -> HistogramDistribution:
+    """Accumulate a range result step by step into one distribution.
+
+    *prom_results* is either a ``sum by (le) (rate(..._bucket[...]))`` range
+    result (default) or, with ``counters=True``, the raw cumulative
+    ``sum by (le) (..._bucket)`` counters, in which case per-step increases
+    are computed locally.
+    """
+    acc = HistogramAccumulator(weighting)
+    steps = _counter_step_deltas(prom_results) if counters else iter_histogram_steps(prom_results)
+    for ts, uppers, cum in steps:
+        acc.add_step(ts, uppers, cum)
+    return acc.distribution()
+
+
+def histogram_time_slices(
+    prom_results,
+    slice_seconds: int = 60,
+    weighting: Union[str, Callable[[float, float], float]] = "volume",
+    counters: bool = False,
+) -> List[Tuple[datetime, HistogramDistribution]]:
+    """Split a range result into consecutive fixed-width time slices.
+
+    Returns ``[(slice_start, distribution), ...]`` in time order, where each
+    distribution accumulates the steps whose timestamp falls in
+    ``[slice_start, slice_start + slice_seconds)``.  Slices are aligned to
+    multiples of *slice_seconds* since the epoch.
+    """
+    out: List[Tuple[datetime, HistogramDistribution]] = []
+    acc = HistogramAccumulator(weighting)
+    current: Optional[float] = None
+    steps = _counter_step_deltas(prom_results) if counters else iter_histogram_steps(prom_results)
+    for ts, uppers, cum in steps:
+        slice_start = ts // slice_seconds * slice_seconds
+        if current is not None and slice_start != current:
+            out.append((datetime.fromtimestamp(current), acc.distribution()))
+            acc = HistogramAccumulator(weighting)
+        current = slice_start
+        acc.add_step(ts, uppers, cum)
+    if current is not None:
+        out.append((datetime.fromtimestamp(current), acc.distribution()))
+    return out
+
+
+def histogram_heatmap_frame(
+    slices: List[Tuple[datetime, HistogramDistribution]],
+    normalize: bool = True,
+) -> pd.DataFrame:
+    """Convert time slices into a (time x bucket upper bound) frame.
+
+    With ``normalize=True`` each row holds the fraction of the slice's
+    requests in every bucket, which keeps the heatmap readable while load
+    ramps up.  Columns are the bucket upper bounds (``inf`` for ``+Inf``).
+    """
+    if not slices:
+        return pd.DataFrame()
+    uppers = next((d.upper_bounds for _, d in slices if len(d)), np.array([]))
+    rows = []
+    for _, dist in slices:
+        counts = dist.counts if len(dist) == len(uppers) else np.zeros(len(uppers))
+        if normalize:
+            total = counts.sum()
+            counts = counts / total if total > 0 else np.full(len(uppers), np.nan)
+        rows.append(counts)
+    frame = pd.DataFrame(rows, index=[ts for ts, _ in slices], columns=uppers)
+    frame.index.name = "timestamp"
+    return frame
@@ -0,0 +1,215 @@
+"""
+Convert Prometheus ``matrix`` results into long-form DataFrames.
+
+A range query returns one ``{"metric": {...}, "values": [[ts, "v"], ...]}``
+entry per series.  :func:`matrix_to_frame` keeps *all* of them in a single
+frame with one column per label, so one query can serve every variant,
+accelerator or namespace and callers filter with :func:`select_series`
+instead of issuing one query per label combination.
+"""
+
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _local_utc_offsets(seconds: np.ndarray) -> np.ndarray:
+    """Local UTC offset (in seconds) in effect at each unix timestamp.
+
+    Offsets only change at DST transitions, which happen on quarter-hour
+    boundaries, so they are computed once per distinct quarter hour rather
+    than once per point.
+    """
+    if not seconds.size:
+        return np.zeros(0)
+    quarters = np.floor(seconds / 900).astype(np.int64)
+    uniq, inverse = np.unique(quarters, return_inverse=True)
+    offsets = np.fromiter(
+        (
+            (datetime.fromtimestamp(q * 900) - datetime.fromtimestamp(q * 900, timezone.utc).replace(tzinfo=None)).total_seconds()
+            for q in uniq.tolist()
+        ),
+        dtype=np.float64,
+        count=uniq.size,
+    )
+    return offsets[inverse]
+
+
+def to_local_datetime64(seconds: np.ndarray) -> np.ndarray:
+    """Unix seconds → naive local ``datetime64[ns]``.
+
+    Matches ``datetime.fromtimestamp`` (naive local time, millisecond
+    precision as returned by Prometheus), which is what the rest of the
+    analysis code and ``prometheus_api_client`` assume.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    millis = np.round((seconds + _local_utc_offsets(seconds)) * 1000).astype("int64")
+    return millis.astype("datetime64[ms]").astype("datetime64[ns]")
+
+
+def as_local_datetime64(values) -> np.ndarray:
+    """Normalize timestamps of any flavour to naive local ``datetime64[ns]``.
+
+    Unix seconds (GuideLLM ``request_start_time``) and tz-aware values
+    (``pd.to_datetime(..., utc=True)``) are converted to local time like
+    :func:`to_local_datetime64`; naive datetimes (Prometheus frames) are
+    already local and kept as they are.  Missing values become ``NaT``.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        seconds = s.to_numpy(dtype=np.float64)
+    else:
+        ts = pd.to_datetime(s)
+        if ts.dt.tz is None:
+            return ts.to_numpy(dtype="datetime64[ns]")
+        # Aware → unix seconds (NaT becomes NaN).
+        seconds = (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64)
+    out = np.full(seconds.size, np.datetime64("NaT"), dtype="datetime64[ns]")
+    ok = ~np.isnan(seconds)
+    out[ok] = to_local_datetime64(seconds[ok])
+    return out
+
+
+def decode_values(values: Optional[List[list]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a Prometheus ``values`` array in bulk.
+
+    ``[[ts, "v"], ...]`` → ``(timestamps, values)`` where *timestamps* is a
+    naive local ``datetime64[ns]`` array and *values* a ``float64`` array.
+    The ``"NaN"``, ``"+Inf"`` and ``"-Inf"`` strings decode to ``nan`` and
+    ``±inf``.
+    """
+    seconds, floats = decode_values_raw(values)
+    return to_local_datetime64(seconds), floats
+
+
+def decode_values_raw(values: Optional[List[list]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Like :func:`decode_values` but keeps timestamps as float unix seconds."""
+    values = values or []
+    n = len(values)
+    seconds = np.fromiter((v[0] for v in values), dtype=np.float64, count=n)
+    floats = np.fromiter((v[1] for v in values), dtype=np.float64, count=n)
+    return seconds, floats
+
+
+def matrix_to_frame(
+    result: Optional[List[dict]],
+    labels: Optional[List[str]] = None,
+    drop_name: bool = True,
+) -> pd.DataFrame:
+    """Flatten a Prometheus matrix result into ``(timestamp, labels..., value)``.
+
+    Parameters
+    ----------
+    result
+        ``custom_query_range`` output.
+    labels
+        Label columns to keep.  Defaults to every label present in any
+        series (``__name__`` excluded unless ``drop_name=False``).  Series
+        lacking a label get ``""``, matching PromQL semantics.
+
+    Returns
+    -------
+    DataFrame sorted by labels then timestamp, with ``timestamp`` as naive
+    local ``datetime64[ns]`` and ``value`` as ``float64`` (``"NaN"`` and
+    ``"+Inf"`` strings are decoded to ``nan``/``inf``).
+    """
+    result = [s for s in (result or []) if s.get("values")]
+    if labels is None:
+        keys = set()
+        for s in result:
+            keys.update(s.get("metric", {}).keys())
+        if drop_name:
+            keys.discard("__name__")
+        labels = sorted(keys)
+    if not result:
+        return pd.DataFrame(columns=["timestamp", *labels, "value"])
+
+    lengths = np.fromiter((len(s["values"]) for s in result), dtype=np.int64, count=len(result))
+    if len(result) == 1:
+        timestamps, values = decode_values(result[0]["values"])
+    else:
+        timestamps, values = decode_values(list(itertools.chain.from_iterable(s["values"] for s in result)))
+
+    frame = pd.DataFrame({"timestamp": timestamps})
+    for label in labels:
+        per_series = np.asarray([s.get("metric", {}).get(label, "") for s in result], dtype=object)
+        frame[label] = np.repeat(per_series, lengths)
+    frame["value"] = values
+    return frame
+
+
+def varying_labels(frame: pd.DataFrame) -> List[str]:
+    """Label columns whose value differs between series of *frame*."""
+    return [c for c in frame.columns if c not in ("timestamp", "value") and frame[c].nunique(dropna=False) > 1]
+
+
+def select_series(frame: pd.DataFrame, **labels: str) -> pd.DataFrame:
+    """Filter a long-form frame by exact label values.
+
+    ``select_series(df, variant_name="decode", accelerator_type="L40S")``
+    returns the matching rows as ``(timestamp, value)`` plus any label
+    column that still distinguishes several series.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    for key, val in labels.items():
+        if key not in frame.columns:
+            return frame.iloc[0:0][["timestamp", "value"]]
+        mask &= (frame[key] == val).to_numpy()
+    out = frame[mask]
+    keep = varying_labels(out)
+    return out[["timestamp", *keep, "value"]].reset_index(drop=True)
+
+
+def total_over_series(frame: pd.DataFrame) -> pd.DataFrame:
+    """Sum every series per timestamp, returning ``(timestamp, value)``.
+
+    Equivalent to wrapping the query in ``sum(...)``; used when several
+    series (e.g. one per accelerator) must be combined into one total.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=["timestamp", "value"])
+    return frame.groupby("timestamp", as_index=False, sort=True)["value"].sum(min_count=1)
+
+
+def _benchmark_decode(n: int = 100_000, repeat: int = 5) -> pd.DataFrame:
+    """Micro-benchmark: per-point list comprehensions vs :func:`decode_values`."""
+    import json
+
+    rng = np.random.default_rng(0)
+    raw = rng.random(n).astype(str)
+    raw[::1000] = "NaN"
+    raw[1::1000] = "+Inf"
+    values = json.loads(json.dumps([[1_700_000_000 + 10 * i, v] for i, v in enumerate(raw.tolist())]))
+
+    def _legacy():
+        ts = [datetime.fromtimestamp(float(v[0])) for v in values]
+        vals = [float(v[1]) for v in values]
+        return pd.DataFrame({"timestamp": ts, "value": vals})
+
+    def _vectorized():
+        ts, vals = decode_values(values)
+        return pd.DataFrame({"timestamp": ts, "value": vals})
+
+    legacy, vectorized = _legacy(), _vectorized()
+    assert np.array_equal(legacy["timestamp"].to_numpy("datetime64[ns]"), vectorized["timestamp"].to_numpy("datetime64[ns]"))
+    assert np.array_equal(legacy["value"].to_numpy(), vectorized["value"].to_numpy(), equal_nan=True)
+
+    rows = []
+    for name, fn in (("list comprehension", _legacy), ("decode_values", _vectorized)):
+        best = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        rows.append({"method": name, "points": n, "best_ms": best * 1e3})
+    out = pd.DataFrame(rows)
+    out["speedup"] = out["best_ms"].iloc[0] / out["best_ms"]
+    return out
+
+
+if __name__ == "__main__":
+    print(_benchmark_decode().to_string(index=False))
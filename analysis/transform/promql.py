@@ -0,0 +1,876 @@
+"""
+Local evaluation of the PromQL subset used by the analysis helpers.
+
+This lets the helpers in ``data_source.prometheus`` run unchanged against
+raw samples stored on disk (see ``data_source.prometheus_archive``) instead
+of a live Prometheus.  Supported:
+
+- vector selectors with ``=``, ``!=``, ``=~``, ``!~`` matchers, ``offset``;
+- range selectors ``v[5m]`` and subqueries ``(expr)[30m:]`` / ``[30m:1m]``;
+- ``rate``, ``increase``, ``delta`` (with Prometheus' extrapolation and
+  counter-reset handling), ``irate``, ``idelta`` and the ``*_over_time``
+  family, ``histogram_quantile``, ``abs``/``ceil``/``floor``/``round``,
+  ``clamp_min``/``clamp_max``, ``vector``, ``scalar``, ``time``;
+- ``sum``/``avg``/``min``/``max``/``count``/``stddev``/``stdvar``/
+  ``quantile`` with ``by``/``without``;
+- arithmetic, comparison (with ``bool``) and ``and``/``or``/``unless``
+  operators with one-to-one ``on``/``ignoring`` matching.
+
+Timestamps are integer milliseconds.  An instant vector evaluated over a
+grid of ``n`` steps is a ``{labels: (n,) float array}`` dict, NaN marking
+steps where the series has no value.
+
+:func:`extrapolated_rate` also accepts a ``(n_samples, n_series)`` value
+matrix sharing one timestamp array, which ``transform.histogram`` uses for
+bucket matrices.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from transform.histogram import histogram_quantile_matrix, parse_le
+
+Labels = Tuple[Tuple[str, str], ...]
+Vector = Dict[Labels, np.ndarray]
+# (labels, timestamps_ms, values) as returned by a SeriesStore
+RawSeries = Tuple[Dict[str, str], np.ndarray, np.ndarray]
+
+DEFAULT_LOOKBACK_MS = 5 * 60 * 1000
+DEFAULT_SUBQUERY_STEP_MS = 60 * 1000
+
+_DURATION_MS = {"ms": 1, "s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000, "y": 31_536_000_000}
+
+
+class PromQLError(ValueError):
+    """Raised for queries outside the supported subset."""
+
+
+def parse_duration_ms(text: str) -> int:
+    parts = re.findall(r"(\d+)(ms|[smhdwy])", text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise PromQLError(f"invalid duration: {text!r}")
+    return sum(int(n) * _DURATION_MS[u] for n, u in parts)
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+@dataclass
+class NumberLiteral:
+    value: float
+
+
+@dataclass
+class StringLiteral:
+    value: str
+
+
+@dataclass
+class Selector:
+    name: Optional[str]
+    matchers: List[Tuple[str, str, str]]
+    range_ms: Optional[int] = None
+    offset_ms: int = 0
+
+
+@dataclass
+class Subquery:
+    expr: object
+    range_ms: int
+    step_ms: Optional[int]
+    offset_ms: int = 0
+
+
+@dataclass
+class Call:
+    func: str
+    args: List[object]
+
+
+@dataclass
+class Aggregation:
+    op: str
+    expr: object
+    param: Optional[object] = None
+    grouping: List[str] = field(default_factory=list)
+    without: bool = False
+
+
+@dataclass
+class Unary:
+    op: str
+    expr: object
+
+
+@dataclass
+class Binary:
+    op: str
+    lhs: object
+    rhs: object
+    return_bool: bool = False
+    on: Optional[List[str]] = None
+    ignoring: List[str] = field(default_factory=list)
+
+
+_AGGREGATIONS = {"sum", "avg", "min", "max", "count", "stddev", "stdvar", "quantile", "group"}
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|\#[^\n]*)
+  | (?P<duration>\d+(?:ms|[smhdwy])(?:\d+(?:ms|[smhdwy]))*(?![a-zA-Z0-9_]))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?![a-zA-Z0-9_:.]))
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<ident>:?[a-zA-Z_][a-zA-Z0-9_:]*)
+  | (?P<op>==|!=|>=|<=|=~|!~|[-+*/%^(){}\[\],:=<>])
+""", re.VERBOSE)
+
+# Binary operator precedence, lowest first.
+_PRECEDENCE = [("or",), ("and", "unless"), ("==", "!=", "<=", "<", ">=", ">"), ("+", "-"), ("*", "/", "%"), ("^",)]
+_COMPARISONS = {"==", "!=", "<=", "<", ">=", ">"}
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(query):
+        m = _TOKEN_RE.match(query, pos)
+        if not m:
+            raise PromQLError(f"unexpected character at {pos}: {query[pos:pos + 20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind != "ws":
+            tokens.append((kind, m.group()))
+    tokens.append(("eof", ""))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, query: str):
+        self.tokens = _tokenize(query)
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def next(self) -> Tuple[str, str]:
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def expect(self, value: str) -> None:
+        kind, text = self.next()
+        if text != value:
+            raise PromQLError(f"expected {value!r}, got {text!r}")
+
+    def accept(self, value: str) -> bool:
+        if self.peek()[1] == value and self.peek()[0] in ("op", "ident"):
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self):
+        expr = self.binary(0)
+        if self.peek()[0] != "eof":
+            raise PromQLError(f"unexpected {self.peek()[1]!r}")
+        return expr
+
+    def binary(self, level: int):
+        if level == len(_PRECEDENCE):
+            return self.unary()
+        lhs = self.binary(level + 1)
+        while self.peek()[1] in _PRECEDENCE[level] and self.peek()[0] in ("op", "ident"):
+            op = self.next()[1]
+            return_bool = self.accept("bool")
+            on, ignoring = None, []
+            if self.accept("on"):
+                on = self.label_list()
+            elif self.accept("ignoring"):
+                ignoring = self.label_list()
+            if self.peek()[1] in ("group_left", "group_right"):
+                raise PromQLError("group_left/group_right matching is not supported")
+            # ``^`` is right-associative, everything else left-associative.
+            rhs = self.binary(level if op == "^" else level + 1)
+            lhs = Binary(op, lhs, rhs, return_bool, on, ignoring)
+        return lhs
+
+    def unary(self):
+        if self.peek()[1] in ("-", "+") and self.peek()[0] == "op":
+            op = self.next()[1]
+            expr = self.unary()
+            return expr if op == "+" else Unary("-", expr)
+        return self.postfix(self.primary())
+
+    def postfix(self, expr):
+        while True:
+            if self.peek()[1] == "[":
+                self.next()
+                range_ms = parse_duration_ms(self.next()[1])
+                if self.accept(":"):
+                    step_ms = None if self.peek()[1] == "]" else parse_duration_ms(self.next()[1])
+                    self.expect("]")
+                    expr = Subquery(expr, range_ms, step_ms)
+                else:
+                    self.expect("]")
+                    if not isinstance(expr, Selector) or expr.range_ms is not None:
+                        raise PromQLError("range can only follow an instant vector selector")
+                    expr.range_ms = range_ms
+            elif self.peek()[1] == "offset" and self.peek()[0] == "ident":
+                self.next()
+                offset = parse_duration_ms(self.next()[1])
+                if not isinstance(expr, (Selector, Subquery)):
+                    raise PromQLError("offset must follow a selector or subquery")
+                expr.offset_ms = offset
+            else:
+                return expr
+
+    def label_list(self) -> List[str]:
+        self.expect("(")
+        labels = []
+        while self.peek()[1] != ")":
+            labels.append(self.next()[1])
+            if not self.accept(","):
+                break
+        self.expect(")")
+        return labels
+
+    def primary(self):
+        kind, text = self.peek()
+        if kind == "number":
+            self.next()
+            return NumberLiteral(float(text))
+        if kind == "string":
+            self.next()
+            return StringLiteral(bytes(text[1:-1], "utf-8").decode("unicode_escape"))
+        if text == "(":
+            self.next()
+            expr = self.binary(0)
+            self.expect(")")
+            return expr
+        if text == "{":
+            return self.selector(None)
+        if kind != "ident":
+            raise PromQLError(f"unexpected {text!r}")
+        if text.lower() in ("inf", "nan") and self.peek(1)[1] != "(":
+            self.next()
+            return NumberLiteral(float(text))
+        if text in _AGGREGATIONS and self.peek(1)[1] in ("(", "by", "without"):
+            return self.aggregation()
+        if self.peek(1)[1] == "(":
+            self.next()
+            self.expect("(")
+            args = []
+            while self.peek()[1] != ")":
+                args.append(self.binary(0))
+                if not self.accept(","):
+                    break
+            self.expect(")")
+            return Call(text, args)
+        self.next()
+        return self.selector(text)
+
+    def selector(self, name: Optional[str]) -> Selector:
+        matchers = []
+        if self.accept("{"):
+            while self.peek()[1] != "}":
+                label = self.next()[1]
+                op = self.next()[1]
+                if op not in ("=", "!=", "=~", "!~"):
+                    raise PromQLError(f"invalid matcher operator {op!r}")
+                kind, value = self.next()
+                if kind != "string":
+                    raise PromQLError(f"matcher value must be a string, got {value!r}")
+                matchers.append((label, op, bytes(value[1:-1], "utf-8").decode("unicode_escape")))
+                if not self.accept(","):
+                    break
+            self.expect("}")
+        if name is None and not matchers:
+            raise PromQLError("vector selector must contain at least one matcher")
+        return Selector(name, matchers)
+
+    def aggregation(self) -> Aggregation:
+        op = self.next()[1]
+        grouping, without = [], False
+        if self.peek()[1] in ("by", "without"):
+            without = self.next()[1] == "without"
+            grouping = self.label_list()
+        self.expect("(")
+        args = [self.binary(0)]
+        while self.accept(","):
+            args.append(self.binary(0))
+        self.expect(")")
+        if self.peek()[1] in ("by", "without"):
+            without = self.next()[1] == "without"
+            grouping = self.label_list()
+        param = args[0] if len(args) == 2 else None
+        return Aggregation(op, args[-1], param, grouping, without)
+
+
+def parse(query: str):
+    """Parse *query* into an expression tree (raises :class:`PromQLError`)."""
+    return _Parser(query).parse()
+
+
+# ---------------------------------------------------------------------------
+# Range-vector math
+# ---------------------------------------------------------------------------
+
+def _windows(ts: np.ndarray, eval_ts: np.ndarray, range_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample index bounds ``[left, right)`` of the left-open window ``(t - range, t]``."""
+    left = np.searchsorted(ts, eval_ts - range_ms, side="right")
+    right = np.searchsorted(ts, eval_ts, side="right")
+    return left, right
+
+
+def counter_corrections(values: np.ndarray) -> np.ndarray:
+    """Cumulative amount to add to each sample to undo counter resets.
+
+    Works on ``(n,)`` or ``(n, k)`` arrays (resets detected per column).
+    """
+    values = np.asarray(values, dtype=float)
+    drops = np.zeros_like(values)
+    drops[1:] = np.where(values[1:] < values[:-1], values[:-1], 0.0)
+    return np.cumsum(drops, axis=0)
+
+
+def extrapolated_rate(
+    ts: np.ndarray,
+    values: np.ndarray,
+    eval_ts: np.ndarray,
+    range_ms: int,
+    is_counter: bool = True,
+    is_rate: bool = True,
+) -> np.ndarray:
+    """Prometheus ``rate``/``increase``/``delta`` at each of *eval_ts*.
+
+    *values* is ``(n_samples,)`` or ``(n_samples, k)`` sharing *ts*; the
+    result is ``(n_eval,)`` or ``(n_eval, k)``.  Windows with fewer than two
+    samples give NaN.  The extrapolation to the window edges follows
+    Prometheus' ``extrapolatedRate``.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    eval_ts = np.asarray(eval_ts, dtype=np.int64)
+    if not ts.size:
+        return np.full((eval_ts.size, *values.shape[1:]), np.nan)
+    col = (lambda a: a[:, None]) if values.ndim == 2 else (lambda a: a)
+
+    left, right = _windows(ts, eval_ts, range_ms)
+    count = right - left
+    first = np.clip(left, 0, ts.size - 1)
+    last = np.clip(right - 1, 0, ts.size - 1)
+
+    adjusted = values + counter_corrections(values) if is_counter else values
+    result = adjusted[last] - adjusted[first]
+
+    first_t, last_t = ts[first], ts[last]
+    sampled = (last_t - first_t) / 1000.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_interval = sampled / (count - 1)
+        to_start = col((first_t - (eval_ts - range_ms)) / 1000.0)
+        to_end = col((eval_ts - last_t) / 1000.0)
+        if is_counter:
+            first_value = values[first]
+            to_zero = col(sampled) * (first_value / result)
+            use_zero = (result > 0) & (first_value >= 0) & (to_zero < to_start)
+            to_start = np.where(use_zero, to_zero, to_start)
+        threshold = col(avg_interval * 1.1)
+        half = col(avg_interval / 2)
+        interval = (
+            col(sampled)
+            + np.where(to_start < threshold, to_start, half)
+            + np.where(to_end < threshold, to_end, half)
+        )
+        out = result * interval / col(sampled)
+    if is_rate:
+        out = out / (range_ms / 1000.0)
+    return np.where(col(count >= 2), out, np.nan)
+
+
+def _instant_rate(ts, values, eval_ts, range_ms, is_rate: bool) -> np.ndarray:
+    left, right = _windows(ts, eval_ts, range_ms)
+    last = np.clip(right - 1, 0, max(ts.size - 1, 0))
+    prev = np.clip(right - 2, 0, max(ts.size - 1, 0))
+    ok = (right - left) >= 2
+    if not ts.size:
+        return np.full(eval_ts.size, np.nan)
+    diff = values[last] - values[prev]
+    if is_rate:
+        diff = np.where(diff < 0, values[last], diff)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff = diff / ((ts[last] - ts[prev]) / 1000.0)
+    return np.where(ok, diff, np.nan)
+
+
+def _over_time(func: str, ts, values, eval_ts, range_ms, param: Optional[np.ndarray] = None) -> np.ndarray:
+    left, right = _windows(ts, eval_ts, range_ms)
+    count = (right - left).astype(float)
+    empty = count == 0
+    if func == "count_over_time":
+        return np.where(empty, np.nan, count)
+    if func in ("present_over_time", "last_over_time"):
+        last = values[np.clip(right - 1, 0, max(ts.size - 1, 0))] if ts.size else np.full(eval_ts.size, np.nan)
+        return np.where(empty, np.nan, 1.0 if func == "present_over_time" else last)
+    if func in ("sum_over_time", "avg_over_time"):
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        total = csum[right] - csum[left]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = total if func == "sum_over_time" else total / count
+        return np.where(empty, np.nan, out)
+
+    reducers: Dict[str, Callable[[np.ndarray, float], float]] = {
+        "min_over_time": lambda w, p: w.min(),
+        "max_over_time": lambda w, p: w.max(),
+        "stddev_over_time": lambda w, p: w.std(),
+        "stdvar_over_time": lambda w, p: w.var(),
+        "quantile_over_time": _quantile,
+    }
+    if func not in reducers:
+        raise PromQLError(f"unsupported function {func}")
+    reduce = reducers[func]
+    out = np.full(eval_ts.size, np.nan)
+    for i, (lo, hi) in enumerate(zip(left, right)):
+        if hi > lo:
+            out[i] = reduce(values[lo:hi], param[i] if param is not None else np.nan)
+    return out
+
+
+def _quantile(values: np.ndarray, q: float) -> float:
+    """PromQL ``quantile``: linear interpolation between closest ranks."""
+    if np.isnan(q):
+        return np.nan
+    if q < 0 or q > 1:
+        return -np.inf if q < 0 else np.inf
+    return float(np.quantile(values, q))
+
+
+# ---------------------------------------------------------------------------
+# Evaluator
+# ---------------------------------------------------------------------------
+
+def labels_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, v) for k, v in labels.items() if v != ""))
+
+
+def _drop_name(key: Labels) -> Labels:
+    return tuple((k, v) for k, v in key if k != "__name__")
+
+
+def match_labels(labels: Dict[str, str], name: Optional[str], matchers: List[Tuple[str, str, str]]) -> bool:
+    if name is not None and labels.get("__name__") != name:
+        return False
+    for label, op, value in matchers:
+        actual = labels.get(label, "")
+        if op == "=" and actual != value:
+            return False
+        if op == "!=" and actual == value:
+            return False
+        if op == "=~" and not re.fullmatch(value, actual):
+            return False
+        if op == "!~" and re.fullmatch(value, actual):
+            return False
+    return True
+
+
+class MemorySeriesStore:
+    """In-memory :class:`Evaluator` store of ``(labels, ts_ms, values)`` series."""
+
+    def __init__(self, series: Iterable[RawSeries]):
+        self.series = [(dict(labels), np.asarray(ts, dtype=np.int64), np.asarray(v, dtype=float)) for labels, ts, v in series]
+
+    def select(self, name: Optional[str], matchers: List[Tuple[str, str, str]], start_ms: int, end_ms: int) -> List[RawSeries]:
+        out = []
+        for labels, ts, values in self.series:
+            if match_labels(labels, name, matchers):
+                lo, hi = np.searchsorted(ts, start_ms, side="left"), np.searchsorted(ts, end_ms, side="right")
+                if hi > lo:
+                    out.append((labels, ts[lo:hi], values[lo:hi]))
+        return out
+
+
+class Evaluator:
+    """Evaluate parsed PromQL over a :class:`MemorySeriesStore`-like store.
+
+    The store only needs ``select(name, matchers, start_ms, end_ms)``
+    returning ``(labels, timestamps_ms, values)`` tuples sorted by time.
+    """
+
+    def __init__(self, store, lookback_ms: int = DEFAULT_LOOKBACK_MS, subquery_step_ms: int = DEFAULT_SUBQUERY_STEP_MS):
+        self.store = store
+        self.lookback_ms = lookback_ms
+        self.subquery_step_ms = subquery_step_ms
+
+    def query_range(self, query: str, start_ms: int, end_ms: int, step_ms: int) -> Tuple[np.ndarray, Union[Vector, np.ndarray]]:
+        """Evaluate *query* at ``start, start + step, ..., end``.
+
+        Returns ``(eval_ts, value)`` where *value* is a :data:`Vector` or,
+        for scalar expressions, an ``(n,)`` array.
+        """
+        eval_ts = np.arange(start_ms, end_ms + 1, step_ms, dtype=np.int64)
+        value = self.eval(parse(query), eval_ts)
+        if isinstance(value, list):
+            raise PromQLError("range vector cannot be evaluated as a range query")
+        return eval_ts, value
+
+    def query_instant(self, query: str, time_ms: int) -> Union[Vector, np.ndarray, List[RawSeries]]:
+        """Evaluate *query* at one instant.
+
+        A range-vector expression (``sel[5m]``, subquery) returns its raw
+        samples in ``(t - range, t]`` as ``(labels, ts, values)`` tuples,
+        like the Prometheus API's ``matrix`` result.
+        """
+        expr = parse(query)
+        eval_ts = np.array([time_ms], dtype=np.int64)
+        if isinstance(expr, Subquery) or (isinstance(expr, Selector) and expr.range_ms is not None):
+            out = []
+            for labels, ts, values in self._matrix(expr, eval_ts):
+                keep = ts > time_ms - expr.range_ms
+                if keep.any():
+                    out.append((labels, ts[keep], values[keep]))
+            return out
+        return self.eval(expr, eval_ts)
+
+    # -- dispatch -----------------------------------------------------------
+
+    def eval(self, expr, eval_ts: np.ndarray):
+        if isinstance(expr, NumberLiteral):
+            return np.full(eval_ts.size, expr.value)
+        if isinstance(expr, StringLiteral):
+            raise PromQLError("string literals are only valid as function arguments")
+        if isinstance(expr, Selector):
+            if expr.range_ms is not None:
+                return self._matrix(expr, eval_ts)
+            return self._instant_selector(expr, eval_ts)
+        if isinstance(expr, Subquery):
+            return self._matrix(expr, eval_ts)
+        if isinstance(expr, Unary):
+            value = self.eval(expr.expr, eval_ts)
+            if isinstance(value, dict):
+                return {_drop_name(k): -v for k, v in value.items()}
+            return -value
+        if isinstance(expr, Call):
+            return self._call(expr, eval_ts)
+        if isinstance(expr, Aggregation):
+            return self._aggregate(expr, eval_ts)
+        if isinstance(expr, Binary):
+            return self._binary(expr, eval_ts)
+        raise PromQLError(f"unsupported expression {expr!r}")
+
+    def _instant_selector(self, sel: Selector, eval_ts: np.ndarray) -> Vector:
+        at = eval_ts - sel.offset_ms
+        out: Vector = {}
+        for labels, ts, values in self.store.select(sel.name, sel.matchers, int(at[0]) - self.lookback_ms, int(at[-1])):
+            idx = np.searchsorted(ts, at, side="right") - 1
+            safe = np.clip(idx, 0, ts.size - 1)
+            fresh = (idx >= 0) & (ts[safe] > at - self.lookback_ms)
+            out[labels_key(labels)] = np.where(fresh, values[safe], np.nan)
+        return out
+
+    def _matrix(self, expr, eval_ts: np.ndarray) -> List[RawSeries]:
+        """Samples backing a range vector, covering every window over *eval_ts*."""
+        if isinstance(expr, Selector):
+            if expr.range_ms is None:
+                raise PromQLError("expected a range vector")
+            return [
+                (labels, ts + expr.offset_ms, values)
+                for labels, ts, values in self.store.select(
+                    expr.name, expr.matchers,
+                    int(eval_ts[0]) - expr.offset_ms - expr.range_ms, int(eval_ts[-1]) - expr.offset_ms,
+                )
+            ]
+        if isinstance(expr, Subquery):
+            step = expr.step_ms or self.subquery_step_ms
+            # First step-aligned timestamp at or after the window start, as
+            # the Prometheus engine does; flooring would add a point the
+            # left-open range excludes.
+            start = int(eval_ts[0]) - expr.offset_ms - expr.range_ms
+            start = -(-start // step) * step
+            inner_ts = np.arange(start, int(eval_ts[-1]) - expr.offset_ms + 1, step, dtype=np.int64)
+            value = self.eval(expr.expr, inner_ts)
+            if not isinstance(value, dict):
+                value = {(): value}
+            out = []
+            for key, values in value.items():
+                present = ~np.isnan(values)
+                if present.any():
+                    out.append((dict(key), inner_ts[present] + expr.offset_ms, values[present]))
+            return out
+        raise PromQLError("expected a range vector")
+
+    # -- functions ------------------------------------------------------------
+
+    def _call(self, call: Call, eval_ts: np.ndarray):
+        func, args = call.func, call.args
+        if func == "time":
+            return eval_ts / 1000.0
+        if func == "vector":
+            return {(): self._scalar(args[0], eval_ts)}
+        if func == "scalar":
+            value = self.eval(args[0], eval_ts)
+            if len(value) != 1:
+                return np.full(eval_ts.size, np.nan)
+            return next(iter(value.values()))
+        if func == "histogram_quantile":
+            return self._histogram_quantile(self._scalar(args[0], eval_ts), self.eval(args[1], eval_ts))
+        if func in ("rate", "increase", "delta", "irate", "idelta") or func.endswith("_over_time"):
+            param = self._scalar(args[0], eval_ts) if func == "quantile_over_time" else None
+            arg = args[-1]
+            range_ms = arg.range_ms
+            out: Vector = {}
+            for labels, ts, values in self._matrix(arg, eval_ts):
+                if func in ("rate", "increase", "delta"):
+                    res = extrapolated_rate(ts, values, eval_ts, range_ms, is_counter=func != "delta", is_rate=func == "rate")
+                elif func in ("irate", "idelta"):
+                    res = _instant_rate(ts, values, eval_ts, range_ms, is_rate=func == "irate")
+                else:
+                    res = _over_time(func, ts, values, eval_ts, range_ms, param)
+                if not np.isnan(res).all():
+                    key = _drop_name(labels_key(labels))
+                    out[key] = res
+            return out
+        unary = {"abs": np.abs, "ceil": np.ceil, "floor": np.floor, "exp": np.exp, "ln": np.log, "sqrt": np.sqrt}
+        if func in unary:
+            return {_drop_name(k): unary[func](v) for k, v in self.eval(args[0], eval_ts).items()}
+        if func in ("clamp_min", "clamp_max", "round"):
+            value = self.eval(args[0], eval_ts)
+            if func == "round":
+                to = self._scalar(args[1], eval_ts) if len(args) > 1 else 1.0
+                return {_drop_name(k): np.floor(v / to + 0.5) * to for k, v in value.items()}
+            bound = self._scalar(args[1], eval_ts)
+            clamp = np.maximum if func == "clamp_min" else np.minimum
+            return {_drop_name(k): np.where(np.isnan(v), np.nan, clamp(v, bound)) for k, v in value.items()}
+        raise PromQLError(f"unsupported function {func}")
+
+    def _scalar(self, expr, eval_ts: np.ndarray) -> np.ndarray:
+        value = self.eval(expr, eval_ts)
+        if isinstance(value, dict):
+            raise PromQLError("expected a scalar argument")
+        return value
+
+    def _histogram_quantile(self, q: np.ndarray, vector: Vector) -> Vector:
+        groups: Dict[Labels, List[Tuple[float, np.ndarray]]] = {}
+        for key, values in vector.items():
+            labels = dict(key)
+            le = labels.pop("le", None)
+            if le is None:
+                continue
+            labels.pop("__name__", None)
+            groups.setdefault(labels_key(labels), []).append((parse_le(le), values))
+        out: Vector = {}
+        for key, buckets in groups.items():
+            merged: Dict[float, np.ndarray] = {}
+            for upper, values in buckets:
+                merged[upper] = values if upper not in merged else np.nansum([merged[upper], values], axis=0)
+            uppers = np.array(sorted(merged))
+            cum = np.stack([merged[u] for u in uppers])
+            if np.all(q == q[0]):
+                res = histogram_quantile_matrix(float(q[0]), uppers, cum)
+            else:
+                res = np.array([histogram_quantile_matrix(float(qi), uppers, cum[:, [i]])[0] for i, qi in enumerate(q)])
+            if not np.isnan(res).all():
+                out[key] = res
+        return out
+
+    # -- aggregation ----------------------------------------------------------
+
+    def _aggregate(self, agg: Aggregation, eval_ts: np.ndarray) -> Vector:
+        vector = self.eval(agg.expr, eval_ts)
+        if not isinstance(vector, dict):
+            raise PromQLError(f"{agg.op} expects an instant vector")
+        groups: Dict[Labels, List[np.ndarray]] = {}
+        for key, values in vector.items():
+            if agg.without:
+                drop = set(agg.grouping) | {"__name__"}
+                group = tuple((k, v) for k, v in key if k not in drop)
+            else:
+                group = tuple((k, v) for k, v in key if k in agg.grouping)
+            groups.setdefault(group, []).append(values)
+        param = self._scalar(agg.param, eval_ts) if agg.param is not None else None
+
+        out: Vector = {}
+        for group, members in groups.items():
+            stacked = np.stack(members)
+            present = ~np.isnan(stacked)
+            n = present.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if agg.op == "sum":
+                    res = np.nansum(stacked, axis=0)
+                elif agg.op == "avg":
+                    res = np.nansum(stacked, axis=0) / n
+                elif agg.op == "count":
+                    res = n.astype(float)
+                elif agg.op == "group":
+                    res = np.ones(eval_ts.size)
+                elif agg.op == "min":
+                    res = np.nanmin(np.where(present, stacked, np.inf), axis=0)
+                elif agg.op == "max":
+                    res = np.nanmax(np.where(present, stacked, -np.inf), axis=0)
+                elif agg.op in ("stddev", "stdvar"):
+                    mean = np.nansum(stacked, axis=0) / n
+                    var = np.nansum(np.where(present, (stacked - mean) ** 2, 0.0), axis=0) / n
+                    res = np.sqrt(var) if agg.op == "stddev" else var
+                elif agg.op == "quantile":
+                    res = np.array([
+                        _quantile(stacked[present[:, i], i], param[i]) if n[i] else np.nan
+                        for i in range(eval_ts.size)
+                    ])
+                else:
+                    raise PromQLError(f"unsupported aggregation {agg.op}")
+            out[group] = np.where(n > 0, res, np.nan)
+        return out
+
+    # -- binary operators -----------------------------------------------------
+
+    def _binary(self, expr: Binary, eval_ts: np.ndarray):
+        lhs, rhs = self.eval(expr.lhs, eval_ts), self.eval(expr.rhs, eval_ts)
+        op = expr.op
+        if op in ("and", "or", "unless"):
+            if not (isinstance(lhs, dict) and isinstance(rhs, dict)):
+                raise PromQLError(f"{op} requires vectors on both sides")
+            return self._set_op(op, lhs, rhs, expr)
+
+        lhs_vec, rhs_vec = isinstance(lhs, dict), isinstance(rhs, dict)
+        if not lhs_vec and not rhs_vec:
+            res = _apply(op, lhs, rhs)
+            return res.astype(float) if op in _COMPARISONS else res
+        if lhs_vec and rhs_vec:
+            rhs_by_sig = {}
+            for key, values in rhs.items():
+                sig = _signature(key, expr)
+                if sig in rhs_by_sig:
+                    raise PromQLError("many-to-many matching not allowed: duplicate series on the right-hand side")
+                rhs_by_sig[sig] = values
+            pairs = [
+                (key, values, rhs_by_sig[_signature(key, expr)])
+                for key, values in lhs.items() if _signature(key, expr) in rhs_by_sig
+            ]
+        elif lhs_vec:
+            pairs = [(key, values, rhs) for key, values in lhs.items()]
+        else:
+            pairs = [(key, lhs, values) for key, values in rhs.items()]
+
+        out: Vector = {}
+        for key, a, b in pairs:
+            res = _apply(op, a, b)
+            if op in _COMPARISONS:
+                both = ~(np.isnan(a) | np.isnan(b))
+                if expr.return_bool:
+                    res = np.where(both, res.astype(float), np.nan)
+                    key = _drop_name(key)
+                else:
+                    res = np.where(both & res, a if lhs_vec else b, np.nan)
+            else:
+                key = _drop_name(key)
+                if expr.on is not None and lhs_vec and rhs_vec:
+                    key = tuple((k, v) for k, v in key if k in expr.on)
+            if not np.isnan(res).all():
+                out[key] = res
+        return out
+
+    @staticmethod
+    def _set_op(op: str, lhs: Vector, rhs: Vector, expr: Binary) -> Vector:
+        rhs_present: Dict[Labels, np.ndarray] = {}
+        for key, values in rhs.items():
+            sig = _signature(key, expr)
+            rhs_present[sig] = rhs_present.get(sig, False) | ~np.isnan(values)
+        out: Vector = {}
+        if op == "and":
+            for key, values in lhs.items():
+                mask = rhs_present.get(_signature(key, expr))
+                if mask is not None:
+                    res = np.where(mask, values, np.nan)
+                    if not np.isnan(res).all():
+                        out[key] = res
+        elif op == "unless":
+            for key, values in lhs.items():
+                mask = rhs_present.get(_signature(key, expr), False)
+                res = np.where(mask, np.nan, values)
+                if not np.isnan(res).all():
+                    out[key] = res
+        else:
+            lhs_present: Dict[Labels, np.ndarray] = {}
+            for key, values in lhs.items():
+                out[key] = values
+                sig = _signature(key, expr)
+                lhs_present[sig] = lhs_present.get(sig, False) | ~np.isnan(values)
+            for key, values in rhs.items():
+                res = np.where(lhs_present.get(_signature(key, expr), False), np.nan, values)
+                if not np.isnan(res).all():
+                    out[key] = res
+        return out
+
+
+def _signature(key: Labels, expr: Binary) -> Labels:
+    if expr.on is not None:
+        return tuple((k, v) for k, v in key if k in expr.on)
+    drop = set(expr.ignoring) | {"__name__"}
+    return tuple((k, v) for k, v in key if k not in drop)
+
+
+def _apply(op: str, a, b):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if op == "+":
+            return a + b
+        if op == "-":
+            return a - b
+        if op == "*":
+            return a * b
+        if op == "/":
+            return np.true_divide(a, b)
+        if op == "%":
+            return np.fmod(a, b)
+        if op == "^":
+            return np.power(a, b)
+        if op == "==":
+            return a == b
+        if op == "!=":
+            return a != b
+        if op == ">":
+            return a > b
+        if op == "<":
+            return a < b
+        if op == ">=":
+            return a >= b
+        if op == "<=":
+            return a <= b
+    raise PromQLError(f"unsupported operator {op}")
+
+
+# ---------------------------------------------------------------------------
+# Prometheus API result shapes
+# ---------------------------------------------------------------------------
+
+def format_value(value: float) -> str:
+    if np.isnan(value):
+        return "NaN"
+    if np.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def to_matrix_result(eval_ts: np.ndarray, value: Union[Vector, np.ndarray]) -> List[dict]:
+    """``/api/v1/query_range`` ``result`` list for an evaluated expression."""
+    if not isinstance(value, dict):
+        value = {(): value}
+    seconds = (eval_ts / 1000.0).tolist()
+    out = []
+    for key in sorted(value):
+        values = value[key]
+        present = np.flatnonzero(~np.isnan(values))
+        if present.size:
+            out.append({
+                "metric": dict(key),
+                "values": [[seconds[i], format_value(values[i])] for i in present.tolist()],
+            })
+    return out
+
+
+def to_vector_result(time_ms: int, value: Union[Vector, np.ndarray]) -> list:
+    """``/api/v1/query`` ``result`` for an expression evaluated at one instant."""
+    t = time_ms / 1000.0
+    if not isinstance(value, dict):
+        return [t, format_value(value[0])]
+    return [
+        {"metric": dict(key), "value": [t, format_value(values[0])]}
+        for key, values in sorted(value.items()) if not np.isnan(values[0])
+    ]
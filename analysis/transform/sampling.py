@@ -1,21 +1,33 @@
 import math
 import random
+import numpy as np
 import pandas as pd
 
+from transform.histogram import HistogramDistribution, stream_histogram
+from transform.matrix import decode_values_raw
+
 def samples_generator_flat(results):
-    samples = []
+    arrays = []
     for result in results or []:
-        values = result.get("values") or result.get("value") or []
-        for pair in values:
-            # pair is typically [timestamp, value] or (ts, val)
-            try:
-                val = float(pair[1])
-                if not pd.isna(val):
-                    samples.append(val)
-            except Exception:
-                # skip malformed entries
-                continue
-    return samples
+        values = result.get("values") or ([result["value"]] if result.get("value") else [])
+        try:
+            _, vals = decode_values_raw(values)
+        except (TypeError, ValueError, IndexError):
+            # skip malformed entries
+            vals = np.fromiter(_valid_floats(values), dtype=float)
+        arrays.append(vals)
+    if not arrays:
+        return []
+    samples = np.concatenate(arrays)
+    return samples[~np.isnan(samples)].tolist()
+
+def _valid_floats(values):
+    for pair in values:
+        # pair is typically [timestamp, value] or (ts, val)
+        try:
+            yield float(pair[1])
+        except Exception:
+            continue
 
 def histogram_to_samples_global(
         prom_results,
@@ -43,12 +55,12 @@ def histogram_to_samples_global(
     total_rates = 0
     for series in prom_results:
         le = series["metric"]["le"]
-        values = [float(v) for _, v in series["values"]]
+        _, values = decode_values_raw(series["values"])
 
-        if not values:
+        if not values.size:
             continue
 
-        avg_rate = sum(values) / len(values)
+        avg_rate = float(values.mean())
         upper = math.inf if le == "+Inf" else float(le)
         buckets.append((upper, avg_rate))
         total_rates += avg_rate
@@ -87,3 +99,26 @@ def samples_generator_histogram_synthetic(max_samples):
     def f(r):
         return histogram_to_samples_global(r, max_samples)
     return f
+
+def samples_generator_histogram_distribution(results):
+    """
+    Keep a Prometheus cumulative histogram (sum by le) as an exact
+    bucketed distribution instead of drawing synthetic samples.
+
+    Returns
+    -------
+    HistogramDistribution
+    """
+    return HistogramDistribution.from_prometheus(results)
+
+samples_generator_histogram_distribution.returns_distribution = True
+
+def samples_generator_histogram_streaming(weighting="volume", counters=False):
+    """
+    Like samples_generator_histogram_distribution, but accumulates per-step
+    bucket deltas so each step can be weighted (see HistogramAccumulator).
+    """
+    def f(r):
+        return stream_histogram(r, weighting=weighting, counters=counters)
+    f.returns_distribution = True
+    return f
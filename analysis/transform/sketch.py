@@ -0,0 +1,224 @@
+"""
+Mergeable quantile sketches (DDSketch) for per-request latencies.
+
+A :class:`DDSketch` maps every positive value *x* to the logarithmic bucket
+``ceil(log_gamma(x))`` with ``gamma = (1 + a) / (1 - a)``; the quantile
+estimate returned for a bucket is within relative error *a* of every value
+that fell in it.  Sketches of the same accuracy merge exactly (bucket
+counts add up), so run-level and cross-run percentiles come from merging
+per-instance sketches instead of concatenating request frames.  A sketch
+of latencies spanning six orders of magnitude at 1% accuracy is ~700
+buckets, independent of the number of requests.
+
+Quantiles use the lower rank ``floor(q * (n - 1))`` as in the reference
+DDSketch, so the estimate is within *a* of the order statistic
+``pandas.Series.quantile(q, interpolation="lower")``; :func:`accuracy_report`
+measures the error against the default linear interpolation too.
+"""
+
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class DDSketch:
+    """Log-bucketed counts with bounded relative quantile error.
+
+    Parameters
+    ----------
+    relative_accuracy
+        Maximum relative error *a* of quantile estimates (``0 < a < 1``).
+    min_value
+        Values at or below it (including 0 and negatives) go to a zero
+        bucket and are reported as 0.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.counts = np.zeros(0)
+        self.zero_count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], relative_accuracy: float = 0.01) -> "DDSketch":
+        sketch = cls(relative_accuracy)
+        sketch.add(values)
+        return sketch
+
+    def _grow(self, lo: int, hi: int) -> None:
+        """Make the dense bucket array cover indices ``[lo, hi]``."""
+        if not self.counts.size:
+            self.offset, self.counts = lo, np.zeros(hi - lo + 1)
+            return
+        new_lo, new_hi = min(lo, self.offset), max(hi, self.offset + self.counts.size - 1)
+        if (new_lo, new_hi) != (self.offset, self.offset + self.counts.size - 1):
+            counts = np.zeros(new_hi - new_lo + 1)
+            counts[self.offset - new_lo:self.offset - new_lo + self.counts.size] = self.counts
+            self.offset, self.counts = new_lo, counts
+
+    def add(self, values: Iterable[float]) -> "DDSketch":
+        """Add observations (NaN is ignored)."""
+        x = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=float).ravel()
+        x = x[~np.isnan(x)]
+        if not x.size:
+            return self
+        self.min, self.max = min(self.min, float(x.min())), max(self.max, float(x.max()))
+        positive = x[x > self.min_value]
+        self.zero_count += float(x.size - positive.size)
+        if positive.size:
+            idx = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+            lo, hi = int(idx.min()), int(idx.max())
+            self._grow(lo, hi)
+            self.counts += np.bincount(idx - self.offset, minlength=self.counts.size)
+        return self
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        """Add *other*'s counts into this sketch (same accuracy required)."""
+        if not math.isclose(self.gamma, other.gamma):
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        if other.counts.size:
+            self._grow(other.offset, other.offset + other.counts.size - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + other.counts.size] += other.counts
+        self.zero_count += other.zero_count
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @staticmethod
+    def merge_all(sketches: Iterable["DDSketch"]) -> Optional["DDSketch"]:
+        """Merge into a new sketch; ``None`` for an empty iterable."""
+        out = None
+        for s in sketches:
+            if out is None:
+                out = DDSketch(s.relative_accuracy, s.min_value)
+            out.merge(s)
+        return out
+
+    # -- queries ------------------------------------------------------------
+
+    @property
+    def count(self) -> float:
+        return float(self.counts.sum() + self.zero_count)
+
+    def __len__(self) -> int:
+        return int(self.count)
+
+    def __repr__(self) -> str:
+        return f"DDSketch(a={self.relative_accuracy:g}, count={self.count:g}, buckets={self.counts.size})"
+
+    def quantile(self, q: Union[float, Iterable[float]]) -> Union[float, np.ndarray]:
+        """Estimated quantile(s); NaN when the sketch is empty."""
+        scalar = np.isscalar(q)
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        n = self.count
+        if n == 0:
+            out = np.full(qs.shape, np.nan)
+            return float(out[0]) if scalar else out
+
+        rank = np.floor(np.clip(qs, 0, 1) * (n - 1))
+        cum = np.cumsum(self.counts) + self.zero_count
+        pos = np.searchsorted(cum, rank, side="right")
+        values = 2 * self.gamma ** (self.offset + np.minimum(pos, self.counts.size - 1)) / (self.gamma + 1)
+        values = np.where(rank < self.zero_count, 0.0, values)
+        # The exact extremes are known: never report beyond them.
+        out = np.clip(values, self.min, self.max)
+        return float(out[0]) if scalar else out
+
+    # -- serialization ------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        nz = np.flatnonzero(self.counts)
+        lo, hi = (int(nz[0]), int(nz[-1]) + 1) if nz.size else (0, 0)
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "offset": self.offset + lo,
+            "counts": self.counts[lo:hi].tolist(),
+            "zero_count": self.zero_count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DDSketch":
+        sketch = cls(d["relative_accuracy"], d.get("min_value", 1e-9))
+        sketch.offset = int(d["offset"])
+        sketch.counts = np.asarray(d["counts"], dtype=float)
+        sketch.zero_count = float(d["zero_count"])
+        sketch.min = d["min"] if d["min"] is not None else math.inf
+        sketch.max = d["max"] if d["max"] is not None else -math.inf
+        return sketch
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, s: str) -> "DDSketch":
+        return cls.from_dict(json.loads(s))
+
+
+def accuracy_report(
+    values: Union[np.ndarray, pd.Series],
+    quantiles: Optional[List[float]] = None,
+    relative_accuracy: float = 0.01,
+    parts: int = 1,
+) -> pd.DataFrame:
+    """Sketch estimates against exact quantiles of *values*.
+
+    With ``parts > 1`` the values are split into that many chunks, sketched
+    separately and merged, exercising the merge path as in cross-instance
+    aggregation.
+
+    Returns
+    -------
+    quantile | exact | exact_lower | sketch | rel_error | rel_error_lower | within_bound
+        ``rel_error`` is against the linear-interpolation quantile
+        (``Series.quantile``), ``rel_error_lower`` against the order
+        statistic the sketch guarantees; ``within_bound`` checks the latter.
+        An exact match counts as zero error (also when the quantile is 0),
+        and an order statistic in the zero bucket (``<= min_value``) is
+        within bound when reported as 0.
+    """
+    if quantiles is None:
+        quantiles = [0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99, 0.999]
+    x = pd.Series(np.asarray(values, dtype=float)).dropna()
+    sketch = DDSketch.merge_all(
+        DDSketch.from_values(chunk, relative_accuracy) for chunk in np.array_split(x.to_numpy(), max(parts, 1))
+    )
+    est = sketch.quantile(quantiles)
+    exact = x.quantile(quantiles).to_numpy()
+    lower = x.quantile(quantiles, interpolation="lower").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.where(est == exact, 0.0, np.abs(est - exact) / np.abs(exact))
+        rel_lower = np.where(est == lower, 0.0, np.abs(est - lower) / np.abs(lower))
+    zero_bucket = (lower <= sketch.min_value) & (est == 0)
+    return pd.DataFrame({
+        "quantile": quantiles,
+        "exact": exact,
+        "exact_lower": lower,
+        "sketch": est,
+        "rel_error": rel,
+        "rel_error_lower": rel_lower,
+        "within_bound": (rel_lower <= relative_accuracy * (1 + 1e-9)) | zero_bucket,
+    })
+
+
+def sketches_to_frame(sketches: Dict[str, DDSketch], quantiles: List[float]) -> pd.DataFrame:
+    """One row per sketch: ``key | count | P..``."""
+    rows = []
+    for key, sketch in sketches.items():
+        values = sketch.quantile(quantiles)
+        rows.append({"key": key, "count": sketch.count, **{f"P{format(q * 100, 'g')}": v for q, v in zip(quantiles, values)}})
+    return pd.DataFrame(rows)
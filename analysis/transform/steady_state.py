@@ -0,0 +1,162 @@
+"""
+Steady-state detection for binned benchmark series.
+
+Two classic building blocks, both on evenly binned series (e.g. completed
+requests per 10s and median TTFT per 10s):
+
+- :func:`binary_segmentation` finds shifts in the mean (load steps,
+  saturation) of one or more standardized series, splitting recursively
+  while the reduction in squared error beats a BIC-style penalty;
+- :func:`mser_truncation` (MSER-m) picks the warm-up length that minimizes
+  the standard error of the mean of what remains; applied to a reversed
+  segment it trims the drain at the end.
+
+:func:`steady_segments` combines them: segment, trim every segment at both
+ends, and drop what is still a ramp.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def _standardize(y: np.ndarray) -> np.ndarray:
+    """Scale by a robust noise estimate (MAD of first differences)."""
+    y = np.asarray(y, dtype=float)
+    diffs = np.diff(y)
+    sigma = 1.4826 * np.median(np.abs(diffs - np.median(diffs))) / np.sqrt(2) if diffs.size else 0.0
+    if not np.isfinite(sigma) or sigma == 0:
+        sigma = np.std(y) or 1.0
+    return (y - np.mean(y)) / sigma
+
+
+def _fill_nan(y: np.ndarray) -> np.ndarray:
+    """Forward/backward fill NaN bins (e.g. no completed request in a bin)."""
+    y = np.asarray(y, dtype=float).copy()
+    ok = ~np.isnan(y)
+    if not ok.any():
+        return np.zeros_like(y)
+    idx = np.where(ok, np.arange(y.size), 0)
+    np.maximum.accumulate(idx, out=idx)
+    y = y[idx]
+    first = np.flatnonzero(ok)[0]
+    y[:first] = y[first]
+    return y
+
+
+def binary_segmentation(
+    series: Sequence[np.ndarray],
+    min_size: int = 6,
+    penalty: float = 3.0,
+    max_changes: int = 20,
+) -> List[int]:
+    """Change points (segment start indices, excluding 0) of mean shifts.
+
+    Parameters
+    ----------
+    series
+        Equal-length 1-D arrays; each is NaN-filled and standardized, and
+        their squared-error costs are added.
+    min_size
+        Minimum segment length in bins.
+    penalty
+        Multiplier of ``log(n)`` a split must reduce the (standardized)
+        squared error by.
+    """
+    Y = np.column_stack([_standardize(_fill_nan(y)) for y in series])
+    n = Y.shape[0]
+    beta = penalty * np.log(max(n, 2))
+    cs = np.vstack([np.zeros((1, Y.shape[1])), np.cumsum(Y, axis=0)])
+    cs2 = np.concatenate([[0.0], np.cumsum((Y ** 2).sum(axis=1))])
+
+    def cost(a, b):
+        """Squared error around the mean of ``Y[a:b]`` (*a* or *b* may be arrays)."""
+        s = cs[b] - cs[a]
+        return (cs2[b] - cs2[a]) - (s ** 2).sum(axis=-1) / (b - a)
+
+    changes: List[int] = []
+    stack = [(0, n)]
+    while stack and len(changes) < max_changes:
+        a, b = stack.pop()
+        if b - a < 2 * min_size:
+            continue
+        splits = np.arange(a + min_size, b - min_size + 1)
+        gain = cost(a, b) - cost(a, splits) - cost(splits, b)
+        best = int(np.argmax(gain))
+        if gain[best] > beta:
+            k = int(splits[best])
+            changes.append(k)
+            stack.extend([(a, k), (k, b)])
+    return sorted(changes)
+
+
+def mser_truncation(y: np.ndarray, batch: int = 5, max_fraction: float = 0.5) -> int:
+    """MSER-*batch* warm-up length (in original points) of series *y*.
+
+    Batch means of *batch* points are formed; the truncation point *d*
+    minimizes ``var(tail) / (m - d)`` over ``d <= max_fraction * m``.
+    """
+    y = _fill_nan(y)
+    m = y.size // batch
+    if m < 4:
+        return 0
+    z = y[: m * batch].reshape(m, batch).mean(axis=1)
+    # Suffix sums give mean and variance of z[d:] for every d at once.
+    rs = np.cumsum(z[::-1])[::-1]
+    rs2 = np.cumsum((z ** 2)[::-1])[::-1]
+    d = np.arange(int(max_fraction * m) + 1)
+    k = m - d
+    mean = rs[d] / k
+    stat = (rs2[d] / k - mean ** 2) / k
+    return int(np.argmin(stat)) * batch
+
+
+def _trend(z: np.ndarray) -> float:
+    """Change over the segment of the least-squares line through *z*."""
+    x = np.arange(z.size) - (z.size - 1) / 2
+    return float(np.dot(x, z - z.mean()) / np.dot(x, x) * (z.size - 1)) if z.size > 1 else 0.0
+
+
+def _trim(z: np.ndarray, batch: int, max_trim: float) -> int:
+    """MSER truncation of standardized *z*, kept only if the cut-off part differs.
+
+    MSER alone happily trims pure noise; the cut is accepted when the mean
+    of the trimmed points is more than 3 standard errors from the rest.
+    """
+    d = mser_truncation(z, batch, max_trim)
+    if d == 0 or d >= z.size:
+        return 0
+    se = np.sqrt(1 / d + 1 / (z.size - d))
+    return d if abs(z[:d].mean() - z[d:].mean()) > 3 * se else 0
+
+
+def steady_segments(
+    series: Sequence[np.ndarray],
+    min_size: int = 6,
+    penalty: float = 3.0,
+    batch: int = 5,
+    max_trim: float = 0.3,
+    max_trend: float = 2.0,
+) -> List[Tuple[int, int]]:
+    """``[(start, end)]`` bin ranges (end exclusive) of steady periods.
+
+    Each mean-shift segment is trimmed at the start (warm-up) and at the
+    end (drain) by the largest MSER truncation over *series* (at most
+    *max_trim* of the segment at each end).  Segments left shorter than
+    *min_size*, or still drifting by more than *max_trend* noise standard
+    deviations end to end (ramps between steps), are dropped.
+    """
+    n = len(series[0])
+    standardized = [_standardize(_fill_nan(y)) for y in series]
+    bounds = [0, *binary_segmentation(series, min_size, penalty), n]
+    out = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        head = max(_trim(z[a:b], batch, max_trim) for z in standardized)
+        tail = max(_trim(z[a:b][::-1], batch, max_trim) for z in standardized)
+        start, end = a + head, b - tail
+        if end - start < min_size:
+            continue
+        if max(abs(_trend(z[start:end])) for z in standardized) > max_trend:
+            continue
+        out.append((start, end))
+    return out
@@ -0,0 +1,436 @@
+"""
+Dependency-tracked store of computed tables and figures.
+
+Replaces the notebook's ``STORE``/``LOAD`` flags with their hand-named
+pickle and Parquet files.  Calling a table builder through an
+:class:`ArtifactStore` keys the result by
+
+- the function's qualified name,
+- its arguments (time ranges, model, namespace, quantiles, ...), and
+- a hash of its source code *and* of every function of this code base it
+  references, transitively, together with the module-level constants
+  those functions read (``LATENCY_METRICS``, ``HISTOGRAM_METRICS``, ...),
+
+so a result is reused only while nothing it depends on has changed, and
+editing ``prometheus.py`` only recomputes the tables whose code changed::
+
+    ARTIFACTS = ArtifactStore(OUTPUT_FOLDER / "artifacts")
+    latency_df = ARTIFACTS(get_histograms_p_tables_by_run, prom, TIME_RANGES, metrics, MODEL_NAME, NAMESPACE)
+
+    cost_table = ARTIFACTS.wrap(get_cost_efficiency_table)   # or as a decorator
+    cost_efficiency_df = cost_table(prom, TIME_RANGES, MODEL_NAME, NAMESPACE, VARIANT_NAME)
+
+Builders reading files (the GuideLLM reports) go through
+:meth:`ArtifactStore.with_inputs`, which also keys on the size and mtime
+of those files::
+
+    gw = ARTIFACTS.with_inputs(run_config_files(GUIDELLM_RESULTS), gateway_tables, GUIDELLM_RESULTS)
+
+DataFrames are stored as Parquet, plotly figures as JSON, and dicts, lists
+and tuples of them (e.g. ``{run: (df, scaling_events)}``) as a directory
+of those plus a ``meta.json`` describing the structure.  Anything else is
+computed but not persisted, and so is a value whose write fails (e.g. a
+column Parquet cannot encode): the computed value is still returned.
+
+The Prometheus client argument (``_prom``/``prom``) is not part of the key:
+the data is identified by the query arguments and time ranges, so an
+offline session (``offline=True``, no client) reuses what an online one
+stored.
+"""
+
+import dataclasses
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import shutil
+import sys
+import time
+import types
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Only functions defined under this directory are followed when hashing
+# sources; library code is not tracked (clear the store after upgrading).
+_CODE_ROOT = Path(__file__).resolve().parent.parent
+META = "meta.json"
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactMissing(KeyError):
+    """Raised by an offline store for an artifact that was never computed."""
+
+
+# ---------------------------------------------------------------------------
+# Source hashing
+# ---------------------------------------------------------------------------
+
+def _own_code(obj: Any) -> bool:
+    try:
+        path = inspect.getsourcefile(obj)
+    except TypeError:
+        return False
+    return path is not None and _CODE_ROOT in Path(path).resolve().parents
+
+
+def _referenced_names(code: types.CodeType) -> Iterable[str]:
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _referenced_names(const)
+
+
+def _dependencies(fn: Callable) -> Tuple[list, Dict[str, str]]:
+    """What *fn* refers to by name in this code base.
+
+    Returns the functions and classes, and the module-level constants
+    (``{"module.NAME": canonical form}``) of its own module and of the
+    modules of this code base it accesses as ``module.NAME``.
+    """
+    fn = inspect.unwrap(fn)
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        return [], {}
+    own_scope = getattr(fn, "__globals__", {})
+    scope = dict(own_scope)
+    if fn.__closure__:
+        scope.update({n: c.cell_contents for n, c in zip(code.co_freevars, fn.__closure__) if _cell_set(c)})
+    names = set(_referenced_names(code))
+    modules = [scope[n] for n in names if isinstance(scope.get(n), types.ModuleType) and _own_code(scope[n])]
+    out, constants = [], {}
+    for name in sorted(names):
+        candidates = [(own_scope.get("__name__", ""), scope.get(name))] + [(m.__name__, getattr(m, name, None)) for m in modules]
+        for module, obj in candidates:
+            if (inspect.isfunction(obj) or inspect.isclass(obj)) and _own_code(obj):
+                out.append(obj)
+            elif obj is not None and _is_constant(obj) and _own_module(module):
+                constants[f"{module}.{name}"] = json.dumps(canonical(obj), sort_keys=True)
+    return out, constants
+
+
+def _is_constant(obj: Any) -> bool:
+    """Data a function may read from module scope (not code, modules or clients)."""
+    if inspect.ismodule(obj) or inspect.isclass(obj) or callable(obj):
+        return False
+    return isinstance(obj, (bool, int, float, str, bytes, tuple, list, dict, set, frozenset, np.ndarray, np.generic))
+
+
+def _own_module(name: str) -> bool:
+    module = sys.modules.get(name)
+    return module is not None and _own_code(module)
+
+
+def _cell_set(cell) -> bool:
+    try:
+        cell.cell_contents
+        return True
+    except ValueError:
+        return False
+
+
+def source_hash(fn: Callable) -> str:
+    """Hash of *fn*'s source and of the sources it depends on in this code base."""
+    seen: Dict[int, str] = {}
+    constants: Dict[str, str] = {}
+    stack = [fn]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        try:
+            seen[id(obj)] = f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', '')}\n{inspect.getsource(obj)}"
+        except (OSError, TypeError):
+            # No source file (e.g. defined in a console): fall back to the bytecode.
+            code = getattr(inspect.unwrap(obj), "__code__", None)
+            body = f"{code.co_code.hex()}{code.co_consts!r}" if code is not None else ""
+            seen[id(obj)] = f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}\n{body}"
+        if inspect.isclass(obj):
+            stack.extend(m for m in vars(obj).values() if inspect.isfunction(m))
+        elif callable(obj):
+            deps, consts = _dependencies(obj)
+            stack.extend(deps)
+            constants.update(consts)
+    parts = sorted(seen.values()) + [f"{name}={value}" for name, value in sorted(constants.items())]
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Argument canonicalization
+# ---------------------------------------------------------------------------
+
+def canonical(value: Any) -> Any:
+    """JSON-able form of an argument that is equal exactly when the argument is."""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, (timedelta, pd.Timedelta)):
+        return {"timedelta": pd.Timedelta(value).isoformat()}
+    if isinstance(value, Path):
+        return {"path": str(value)}
+    if isinstance(value, np.generic):
+        return canonical(value.item())
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonical(v) for v in value), key=json.dumps)
+    if isinstance(value, dict):
+        return {"dict": sorted(([canonical(k), canonical(v)] for k, v in value.items()), key=json.dumps)}
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        return {"frame": digest.hexdigest()}
+    if isinstance(value, np.ndarray):
+        return {"array": hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest(), "dtype": str(value.dtype)}
+    if inspect.isfunction(value) or inspect.ismethod(value) or isinstance(value, functools.partial):
+        target = value.func if isinstance(value, functools.partial) else value
+        extra = [canonical(value.args), canonical(value.keywords)] if isinstance(value, functools.partial) else []
+        return {"callable": source_hash(target), "args": extra}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {type(value).__qualname__: canonical(dataclasses.asdict(value))}
+    # Clients, contexts and other stateful objects: identified by type only.
+    return {"object": f"{type(value).__module__}.{type(value).__qualname__}"}
+
+
+def files_fingerprint(paths: Iterable[Union[str, Path]]) -> str:
+    """Hash of the path, size and mtime of each file (``missing`` when absent)."""
+    digest = hashlib.sha1()
+    for path in sorted(str(p) for p in paths):
+        try:
+            st = Path(path).stat()
+            digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        except OSError:
+            digest.update(f"{path}\0missing\n".encode())
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+
+def _is_figure(value: Any) -> bool:
+    return type(value).__module__.startswith("plotly.") and hasattr(value, "to_plotly_json")
+
+
+def _persistable(value: Any) -> bool:
+    if isinstance(value, pd.DataFrame) or _is_figure(value):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_persistable(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _persistable(v) for k, v in value.items())
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _dump(value: Any, directory: Path, counter: list) -> Any:
+    """Write frames/figures of *value* to *directory*; return its structure."""
+    if isinstance(value, pd.DataFrame):
+        name = f"{len(counter)}.parquet"
+        counter.append(name)
+        value.to_parquet(directory / name)
+        return {"frame": name}
+    if _is_figure(value):
+        import plotly.io as pio
+        name = f"{len(counter)}.json"
+        counter.append(name)
+        (directory / name).write_text(pio.to_json(value))
+        return {"figure": name}
+    if isinstance(value, (list, tuple)):
+        return {type(value).__name__: [_dump(v, directory, counter) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": {k: _dump(v, directory, counter) for k, v in value.items()}}
+    return {"json": value}
+
+
+def _restore(node: dict, directory: Path) -> Any:
+    (kind, payload), = node.items()
+    if kind == "frame":
+        return pd.read_parquet(directory / payload)
+    if kind == "figure":
+        import plotly.io as pio
+        return pio.from_json((directory / payload).read_text())
+    if kind == "list":
+        return [_restore(v, directory) for v in payload]
+    if kind == "tuple":
+        return tuple(_restore(v, directory) for v in payload)
+    if kind == "dict":
+        return {k: _restore(v, directory) for k, v in payload.items()}
+    return payload
+
+
+class ArtifactStore:
+    """Directory of results keyed by function, arguments and source hash.
+
+    Parameters
+    ----------
+    root
+        Store directory (one sub-directory per function, one per key).
+    ignore
+        Parameter names left out of the key (the Prometheus client).
+    offline
+        Never compute: a missing artifact raises :class:`ArtifactMissing`
+        (the notebook's old ``LOAD``-only mode).
+    enabled
+        ``False`` computes everything and stores nothing.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        ignore: Iterable[str] = ("_prom", "prom"),
+        offline: bool = False,
+        enabled: bool = True,
+    ):
+        self.root = Path(root)
+        self.ignore = set(ignore)
+        self.offline = offline
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __repr__(self) -> str:
+        return f"ArtifactStore({str(self.root)!r}, hits={self.stats['hits']}, misses={self.stats['misses']})"
+
+    # -- keys ---------------------------------------------------------------
+
+    @staticmethod
+    def name_of(fn: Callable) -> str:
+        fn = inspect.unwrap(fn)
+        return f"{fn.__module__}.{fn.__qualname__}".replace("<", "").replace(">", "")
+
+    def key(self, fn: Callable, /, *args, **kwargs) -> str:
+        """Key of ``fn(*args, **kwargs)``: arguments bound to parameter names, plus the source hash."""
+        try:
+            bound = inspect.signature(fn).bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in self.ignore}
+        except (TypeError, ValueError):
+            arguments = {"args": args, "kwargs": kwargs}
+        payload = json.dumps([self.name_of(fn), canonical(arguments), source_hash(fn)], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def input_key(self, files: Iterable[Union[str, Path]], fn: Callable, /, *args, **kwargs) -> str:
+        """:meth:`key` of ``fn(*args, **kwargs)`` combined with :func:`files_fingerprint` of *files*."""
+        payload = json.dumps([self.key(fn, *args, **kwargs), files_fingerprint(files)])
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _dir(self, name: str, key: str) -> Path:
+        return self.root / name / key[:20]
+
+    # -- load / save --------------------------------------------------------
+
+    def load(self, name: str, key: str) -> Any:
+        """Stored value, or ``None`` when absent."""
+        directory = self._dir(name, key)
+        meta = directory / META
+        if not self.enabled or not meta.exists():
+            return None
+        return _restore(json.loads(meta.read_text())["value"], directory)
+
+    def latest(self, fn: Callable) -> Any:
+        """Most recently stored value of *fn* for any arguments, or ``None``.
+
+        For sessions without the inputs (the GuideLLM reports of another
+        machine) that want the last tables computed from them.
+        """
+        entries = self.entries() if self.root.exists() else pd.DataFrame(columns=["name"])
+        entries = entries[entries["name"] == self.name_of(fn)]
+        if entries.empty:
+            return None
+        row = entries.iloc[-1]
+        return self.load(row["name"], row["key"])
+
+    def save(self, name: str, key: str, value: Any, description: Optional[dict] = None) -> bool:
+        """Persist *value*; ``False`` when its type cannot be stored or the write fails.
+
+        A failed write (e.g. a column Parquet cannot encode) is logged, never
+        raised: the caller already holds the computed value.
+        """
+        if not self.enabled or value is None or not _persistable(value):
+            return False
+        directory = self._dir(name, key)
+        tmp = directory.with_name(f".{directory.name}.{time.time_ns()}")
+        try:
+            tmp.mkdir(parents=True)
+            structure = _dump(value, tmp, [])
+            (tmp / META).write_text(json.dumps({
+                "name": name, "key": key, "created": time.time(), "value": structure, **(description or {}),
+            }, default=str))
+            shutil.rmtree(directory, ignore_errors=True)
+            tmp.rename(directory)
+        except (OSError, ValueError, TypeError, NotImplementedError) as exc:
+            # pyarrow errors (ArrowInvalid, ArrowTypeError, ...) derive from these.
+            logger.warning("%s: result not stored (%s: %s)", name, type(exc).__name__, exc)
+            return False
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return True
+
+    # -- calling ------------------------------------------------------------
+
+    def __call__(self, fn: Callable, /, *args, **kwargs) -> Any:
+        """``fn(*args, **kwargs)``, from the store when nothing it depends on changed."""
+        return self._cached(fn, self.key(fn, *args, **kwargs), args, kwargs)
+
+    def with_inputs(self, files: Iterable[Union[str, Path]], fn: Callable, /, *args, **kwargs) -> Any:
+        """Like calling the store, but also recomputed when any of *files* changes.
+
+        For builders reading local files (GuideLLM reports) whose arguments
+        are only paths: the key adds each file's size and mtime, so the
+        inputs are not read, let alone hashed, on a hit.
+        """
+        return self._cached(fn, self.input_key(files, fn, *args, **kwargs), args, kwargs)
+
+    def _cached(self, fn: Callable, key: str, args: tuple, kwargs: dict) -> Any:
+        name = self.name_of(fn)
+        value = self.load(name, key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+        if self.offline:
+            raise ArtifactMissing(f"{name}: no stored artifact for these arguments (offline store)")
+        self.stats["misses"] += 1
+        value = fn(*args, **kwargs)
+        self.save(name, key, value)
+        return value
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Decorator form: ``cached = store.wrap(get_gap_window_table)``."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self(fn, *args, **kwargs)
+        return wrapper
+
+    # -- housekeeping -------------------------------------------------------
+
+    def entries(self) -> pd.DataFrame:
+        """``name | key | created | bytes`` of every stored artifact."""
+        rows = []
+        for meta in self.root.glob(f"*/*/{META}"):
+            info = json.loads(meta.read_text())
+            size = sum(p.stat().st_size for p in meta.parent.iterdir())
+            rows.append({"name": info["name"], "key": info["key"], "created": datetime.fromtimestamp(info["created"]),
+                         "bytes": size})
+        return pd.DataFrame(rows, columns=["name", "key", "created", "bytes"]).sort_values(["name", "created"], ignore_index=True)
+
+    def prune(self, older_than: Optional[timedelta] = None, name: Optional[str] = None) -> int:
+        """Delete artifacts (of function *name*, created before now - *older_than*); returns the count."""
+        entries = self.entries()
+        if name is not None:
+            entries = entries[entries["name"] == name]
+        if older_than is not None:
+            entries = entries[entries["created"] < datetime.now() - older_than]
+        for row in entries.itertuples():
+            shutil.rmtree(self._dir(row.name, row.key), ignore_errors=True)
+        return len(entries)
@@ -1,3 +1,5 @@
+import re
+
 
 def step_to_xperiod(step: str) -> int:
     units = {
@@ -9,6 +11,30 @@ def step_to_xperiod(step: str) -> int:
     value, unit = int(step[:-1]), step[-1]
     return value * units[unit]
 
+_DURATION_UNITS = {
+    "ms": 0.001,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+    "y": 31536000,
+}
+
+def duration_to_seconds(duration) -> float:
+    """Parse a Prometheus duration (``"15s"``, ``"1m30s"``, ``"500ms"``) or a number of seconds."""
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    text = str(duration).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|[smhdwy])", text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise ValueError(f"invalid duration: {duration!r}")
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
 def hex_with_opacity(hex_color: str, alpha: float) -> str:
     hex_color = hex_color.lstrip("#")
     r, g, b = (int(hex_color[i:i+2], 16) for i in (0, 2, 4))